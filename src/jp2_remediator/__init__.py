@@ -1,6 +1,7 @@
 import logging
 from logging.handlers import TimedRotatingFileHandler
 import os
+import threading
 from datetime import datetime
 
 LOG_FILE_BACKUP_COUNT = int(os.getenv('LOG_FILE_BACKUP_COUNT', '30'))
@@ -8,8 +9,28 @@ LOG_ROTATION = "midnight"
 
 timestamp = datetime.today().strftime('%Y-%m-%d')
 
+# Names of loggers that already have their handlers, guarded for concurrent readers
+_configured_loggers = set()
+_configure_lock = threading.Lock()
 
-def configure_logger(name):  # pragma: no cover
+
+class FileLoggerAdapter(logging.LoggerAdapter):
+    """Logger adapter that prefixes messages with the file being processed."""
+
+    def process(self, msg, kwargs):
+        return f"{self.extra['file_path']} - {msg}", kwargs
+
+
+def configure_logger(name):
+    # Handlers are registered once per process and logger name
+    with _configure_lock:
+        if name not in _configured_loggers:
+            _add_handlers(name)
+            _configured_loggers.add(name)
+    return logging.getLogger(name)
+
+
+def _add_handlers(name):  # pragma: no cover
     log_level = os.getenv("APP_LOG_LEVEL", "WARNING")
     log_dir = os.getenv("LOG_DIR", "logs/")
     # create log directory if it doesn't exist
@@ -38,4 +59,3 @@ def configure_logger(name):  # pragma: no cover
         logger.addHandler(file_handler)
 
     logger.setLevel(log_level)
-    return logger
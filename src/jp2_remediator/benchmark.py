@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from importlib import metadata
+from jp2_remediator import corpus
+from jp2_remediator.box_reader import VALIDATION_NONE, VALIDATION_POLICIES
+from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.processor import Processor
+from jp2_remediator.result import STAGES
+
+BENCHMARK_PATHS = ("file", "directory", "bucket")
+BENCHMARK_BUCKET = "benchmark-bucket"
+# Target median wall time of a `main.py file` run on one small file without validation,
+# from process start to exit, as launched per file by job schedulers
+STARTUP_TARGET_SECONDS = 0.4
+# Modules the CLI imports only on the code paths that need them
+LAZY_MODULES = ("boto3", "botocore", "s3transfer", "jpylyzer", "asyncio", "http.server")
+# Prints which of the modules given as arguments a bare import of the CLI loads
+_IMPORT_CHECK = "import sys, jp2_remediator.main; print(' '.join(m for m in sys.argv[1:] if m in sys.modules))"
+
+
+def _max_rss_mib(who):
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+    max_rss = resource.getrusage(who).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+class LocalS3Client:
+    """In-process stand-in for a boto3 S3 client, backed by a local directory of objects."""
+
+    def __init__(self, root, page_size=1000):
+        self.root = root
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._uploads = {}
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken="0"):
+        # Continuation tokens are the index of the next key
+        keys = sorted(
+            os.path.relpath(os.path.join(root, name), self.root).replace(os.sep, "/")
+            for root, _, files in os.walk(self.root) for name in files
+        )
+        keys = [key for key in keys if key.startswith(Prefix)]
+        start = int(ContinuationToken)
+        page = {"Contents": [{"Key": key} for key in keys[start:start + self.page_size]]}
+        if start + self.page_size < len(keys):
+            page.update(IsTruncated=True, NextContinuationToken=str(start + self.page_size))
+        return page
+
+    def download_file(self, Bucket, Key, Filename):
+        shutil.copyfile(self._path(Key), Filename)
+
+    def upload_file(self, Filename, Bucket, Key):
+        shutil.copyfile(Filename, self._path(Key))
+
+    def upload_fileobj(self, Fileobj, Bucket, Key):
+        with open(self._path(Key), "wb") as file:
+            shutil.copyfileobj(Fileobj, file)
+
+    def get_object(self, Bucket, Key, Range=None):
+        size = os.path.getsize(self._path(Key))
+        start, end = 0, size - 1
+        if Range is not None:
+            first, _, last = Range.removeprefix("bytes=").partition("-")
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        with open(self._path(Key), "rb") as file:
+            file.seek(start)
+            body = file.read(max(end - start + 1, 0))
+        return {"Body": io.BytesIO(body), "ContentRange": f"bytes {start}-{end}/{size}"}
+
+    def create_multipart_upload(self, Bucket, Key):
+        with self._lock:
+            upload_id = str(len(self._uploads))
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, PartNumber, UploadId, Body):
+        self._uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": str(PartNumber)}
+
+    def upload_part_copy(self, Bucket, Key, PartNumber, UploadId, CopySource, CopySourceRange):
+        body = self.get_object(Bucket, CopySource["Key"], Range=CopySourceRange)["Body"].read()
+        self._uploads[UploadId][PartNumber] = body
+        return {"CopyPartResult": {"ETag": str(PartNumber)}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self._uploads.pop(UploadId)
+        with open(self._path(Key), "wb") as file:
+            for part in MultipartUpload["Parts"]:
+                file.write(parts[part["PartNumber"]])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._uploads.pop(UploadId, None)
+
+
+class BenchmarkCollector:
+    """Report sink aggregating RemediationResult bytes, actions and stage timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes_read = 0
+        self.actions = {}
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+
+    def write(self, result):
+        with self._lock:
+            self.files += 1
+            self.bytes_read += result.bytes_read
+            self.actions[result.action] = self.actions.get(result.action, 0) + 1
+            for stage, seconds in result.timings.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+
+def run_benchmark(path, corpus_dir, factory, workers=1, ranged=False):
+    """
+    Run one benchmark over a corpus directory and measure it.
+    :param path: One of BENCHMARK_PATHS: 'file' (Processor.process_files), 'directory'
+        (Processor.process_directory) or 'bucket' (Processor.process_s3_bucket on a LocalS3Client).
+    :param corpus_dir: Directory of JP2 files, modified copies are written next to them.
+    :param factory: BoxReaderFactory used by the Processor.
+    :param workers: Number of worker processes.
+    :param ranged: Use ranged header reads on the bucket path.
+    :return: Dictionary of measurements.
+    """
+    if path not in BENCHMARK_PATHS:
+        raise ValueError(f"Unknown benchmark path: {path}")
+    collector = BenchmarkCollector()
+    processor = Processor(factory, workers=workers, report=collector)
+    file_paths = sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir))
+
+    # Per-file progress output is not part of the measurement
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if path == "file":
+            processor.process_files(file_paths)
+        elif path == "directory":
+            processor.process_directory(corpus_dir)
+        else:
+            processor.process_s3_bucket(BENCHMARK_BUCKET, ranged=ranged, s3_client=LocalS3Client(corpus_dir))
+    seconds = time.perf_counter() - start
+
+    return {
+        "path": path,
+        "workers": workers,
+        "ranged": ranged if path == "bucket" else None,
+        "files": collector.files,
+        "seconds": round(seconds, 6),
+        "files_per_second": round(collector.files / seconds, 3) if seconds else None,
+        "bytes_read": collector.bytes_read,
+        "actions": collector.actions,
+        "stage_seconds": {stage: round(value, 6) for stage, value in collector.stage_seconds.items()},
+        "max_rss_mib": round(_max_rss_mib(resource.RUSAGE_SELF), 3),
+        "max_child_rss_mib": round(_max_rss_mib(resource.RUSAGE_CHILDREN), 3),
+    }
+
+
+def measure_startup(runs=5, validation=VALIDATION_NONE, scratch_dir=None):
+    """
+    Time `main.py file` runs on one small synthetic file, each in a fresh interpreter, from process start to exit.
+    :param runs: Number of runs.
+    :param validation: jpylyzer validation policy of the runs.
+    :param scratch_dir: Directory for the file and the log directory of the runs (default: system temp).
+    :return: Dictionary of the run times, their median compared to STARTUP_TARGET_SECONDS, and the
+        LAZY_MODULES a bare import of the CLI loads, which should be none.
+    """
+    # The package may run from a source tree rather than an installed distribution
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory(dir=scratch_dir) as run_dir:
+        [file_path] = corpus.generate_corpus(run_dir, 1, variants=(corpus.VARIANT_CORRECT,))
+        command = [sys.executable, "-m", "jp2_remediator.main", "file", file_path, "--validation", validation]
+        seconds = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=run_dir, env=env, check=True, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+            seconds.append(time.perf_counter() - start)
+        imported = subprocess.run(
+            [sys.executable, "-c", _IMPORT_CHECK, *LAZY_MODULES], cwd=run_dir, env=env, check=True,
+            capture_output=True, text=True,
+        ).stdout.split()
+    median = statistics.median(seconds) if seconds else None
+    return {
+        "runs": [round(value, 6) for value in seconds],
+        "median_seconds": round(median, 6) if median is not None else None,
+        "target_seconds": STARTUP_TARGET_SECONDS,
+        "meets_target": median is not None and median <= STARTUP_TARGET_SECONDS,
+        "eager_imports": imported,
+    }
+
+
+def run_suite(count, size=corpus.DEFAULT_FILE_SIZE, variants=corpus.VARIANTS, paths=BENCHMARK_PATHS,
+              workers=1, header_only=False, validation=VALIDATION_NONE, ranged=False, scratch_dir=None,
+              startup_runs=0):
+    """
+    Generate a fresh synthetic corpus for every path and benchmark the paths in turn.
+    With startup_runs, the CLI startup is also measured, see measure_startup.
+    :return: JSON-serializable dictionary of the environment, configuration and results.
+    """
+    try:
+        version = metadata.version("jp2_remediator")
+    except metadata.PackageNotFoundError:
+        version = None
+    factory = BoxReaderFactory(header_only=header_only, validation=validation)
+    results = []
+    for path in paths:
+        with tempfile.TemporaryDirectory(dir=scratch_dir) as corpus_dir:
+            corpus.generate_corpus(corpus_dir, count, size, variants)
+            results.append(run_benchmark(path, corpus_dir, factory, workers=workers, ranged=ranged))
+    startup = measure_startup(startup_runs, validation, scratch_dir) if startup_runs else None
+    return {
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "count": count,
+            "size": size,
+            "variants": list(variants),
+            "workers": workers,
+            "header_only": header_only,
+            "validation": validation,
+        },
+        "results": results,
+        "startup": startup,
+    }
+
+
+def main(argv=None):
+    """Command line entry point: python -m jp2_remediator.benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark JP2 remediation on a synthetic corpus")
+    parser.add_argument("--count", type=int, default=200, help="Number of files per path (default: 200)")
+    parser.add_argument(
+        "--size", type=int, default=corpus.DEFAULT_FILE_SIZE,
+        help=f"Size of each file in bytes (default: {corpus.DEFAULT_FILE_SIZE})"
+    )
+    parser.add_argument(
+        "--variants", nargs="+", choices=corpus.VARIANTS, default=list(corpus.VARIANTS),
+        help="Corpus variants, cycled through (default: all)"
+    )
+    parser.add_argument(
+        "--paths", nargs="+", choices=BENCHMARK_PATHS, default=list(BENCHMARK_PATHS),
+        help="Processing paths to benchmark (default: all)"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (default: 1)")
+    parser.add_argument("--header-only", action="store_true", help="Read only the JP2 header boxes")
+    parser.add_argument(
+        "--validation", choices=VALIDATION_POLICIES, default=VALIDATION_NONE,
+        help="jpylyzer validation policy (default: none, synthetic codestreams are not valid)"
+    )
+    parser.add_argument("--ranged", action="store_true", help="Use ranged header reads on the bucket path")
+    parser.add_argument(
+        "--startup-runs", type=int, default=5,
+        help=f"Number of `main.py file` runs timing the CLI startup, against a target of "
+             f"{STARTUP_TARGET_SECONDS}s (default: 5, 0 skips)"
+    )
+    parser.add_argument("--scratch-dir", help="Directory for the generated corpus (default: system temp)")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run_suite(
+        args.count, args.size, args.variants, args.paths, workers=args.workers, header_only=args.header_only,
+        validation=args.validation, ranged=args.ranged, scratch_dir=args.scratch_dir, startup_runs=args.startup_runs,
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
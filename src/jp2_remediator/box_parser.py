@@ -0,0 +1,224 @@
+from typing import NamedTuple
+
+# ISO/IEC 15444-1:2019(E) Annex I box types used by the remediator
+JP2H = b"\x6a\x70\x32\x68"  # 'jp2h' JP2 header superbox
+COLR = b"\x63\x6f\x6c\x72"  # 'colr' colour specification box
+JP2C = b"\x6a\x70\x32\x63"  # 'jp2c' contiguous codestream box
+
+# ICC.1:2022 Section 7.2 profile header is 128 bytes, followed by the tag count
+ICC_HEADER_LENGTH = 128
+ICC_TAG_ENTRY_LENGTH = 12
+
+# ICC.1:2022 Section 10 tag types whose encoded length follows from their own fields
+CURV = b"\x63\x75\x72\x76"  # 'curv' curveType, 12 + 2n bytes
+PARA = b"\x70\x61\x72\x61"  # 'para' parametricCurveType, 12 + 4 bytes per parameter
+# ICC.1:2022 Table 68 number of s15Fixed16Number parameters per parametric curve function type
+PARAMETRIC_CURVE_PARAMETERS = (1, 3, 4, 5, 7)
+
+
+class Box(NamedTuple):
+    # A box header located in a buffer (ISO/IEC 15444-1:2019(E) Figure I.4).
+    box_type: bytes
+    offset: int  # byte position of LBox
+    header_length: int  # 8, or 16 when XLBox is present
+    length: int  # total box length including the header
+
+    @property
+    def type_position(self):
+        # Byte position of the TBox field, e.g. where 'colr' is written.
+        return self.offset + 4
+
+    @property
+    def content_offset(self):
+        return self.offset + self.header_length
+
+    @property
+    def end(self):
+        return self.offset + self.length
+
+
+class TagEntry(NamedTuple):
+    # An ICC tag table entry (ICC.1:2022 Table 24).
+    signature: bytes
+    entry_position: int  # byte position of the 12-byte entry in the buffer
+    offset: int  # tag data offset, relative to the start of the profile
+    size: int  # tag data size
+
+
+class TagData(NamedTuple):
+    # The type header of ICC tag data (ICC.1:2022 Section 10.1).
+    type_signature: bytes
+    length: int | None  # encoded length, None when the type does not declare it
+    count: int  # curv entry count n, or para function type
+
+
+def read_box_header(data, offset, end=None):
+    """
+    Read the box header starting at offset.
+    :param data: Buffer holding the boxes.
+    :param offset: Byte position of LBox.
+    :param end: End of the enclosing box or file, defaults to len(data).
+    :return: A Box, or None if the header is truncated or malformed.
+    """
+    if end is None:
+        end = len(data)
+    if offset + 8 > min(end, len(data)):
+        return None
+
+    length = int.from_bytes(data[offset:offset + 4], byteorder="big")
+    box_type = bytes(data[offset + 4:offset + 8])
+    header_length = 8
+
+    if length == 1:
+        # XLBox: 8-byte extended length follows TBox
+        if offset + 16 > min(end, len(data)):
+            return None
+        length = int.from_bytes(data[offset + 8:offset + 16], byteorder="big")
+        header_length = 16
+    elif length == 0:
+        # Box extends to the end of the enclosing box or file
+        length = end - offset
+
+    if length < header_length:
+        return None
+    return Box(box_type, offset, header_length, length)
+
+
+def iter_boxes(data, offset=0, end=None):
+    """
+    Iterate over consecutive boxes by following their lengths.
+    Stops at the first truncated or malformed box header.
+    """
+    if end is None:
+        end = len(data)
+    while offset < end:
+        box = read_box_header(data, offset, end)
+        if box is None:
+            return
+        yield box
+        offset = box.end
+
+
+def find_header_boxes(data):
+    """
+    Walk the top-level boxes up to and including the 'jp2h' superbox.
+    Reading stops there, so the codestream in 'jp2c' is never scanned.
+    :return: Tuple (jp2h Box or None, list of child Boxes of 'jp2h').
+    """
+    for box in iter_boxes(data):
+        if box.box_type == JP2H:
+            return box, list(iter_boxes(data, box.content_offset, min(box.end, len(data))))
+        if box.box_type == JP2C:
+            break
+    return None, []
+
+
+def parse_icc_tag_table(data, profile_offset):
+    """
+    Parse the ICC tag table by its declared tag count.
+    :param data: Buffer holding the ICC profile.
+    :param profile_offset: Byte position of the start of the ICC profile.
+    :return: List of TagEntry, empty if the table cannot be read.
+    """
+    count_position = profile_offset + ICC_HEADER_LENGTH
+    if profile_offset < 0 or count_position + 4 > len(data):
+        return []
+
+    # Bound the table by the profile size field when it is plausible
+    profile_size = int.from_bytes(data[profile_offset:profile_offset + 4], byteorder="big")
+    table_end = len(data)
+    if profile_size >= count_position + 4 - profile_offset:
+        table_end = min(table_end, profile_offset + profile_size)
+
+    tag_count = int.from_bytes(data[count_position:count_position + 4], byteorder="big")
+    entries = []
+    entry_position = count_position + 4
+    for _ in range(tag_count):
+        if entry_position + ICC_TAG_ENTRY_LENGTH > table_end:
+            break
+        entry = data[entry_position:entry_position + ICC_TAG_ENTRY_LENGTH]
+        entries.append(TagEntry(
+            bytes(entry[0:4]),
+            entry_position,
+            int.from_bytes(entry[4:8], byteorder="big"),
+            int.from_bytes(entry[8:12], byteorder="big"),
+        ))
+        entry_position += ICC_TAG_ENTRY_LENGTH
+    return entries
+
+
+def read_tag_data(data, position):
+    """
+    Read the 12-byte type header of ICC tag data and compute the encoded length of
+    types that declare it: 'curv' from its entry count and 'para' from its function type.
+    :param data: Buffer holding the ICC profile.
+    :param position: Byte position of the tag data.
+    :return: A TagData, or None if the type header is truncated.
+    """
+    if position < 0 or position + 12 > len(data):
+        return None
+    type_signature = bytes(data[position:position + 4])
+    if type_signature == PARA:
+        function_type = int.from_bytes(data[position + 8:position + 10], byteorder="big")
+        length = None
+        if function_type < len(PARAMETRIC_CURVE_PARAMETERS):
+            length = 12 + 4 * PARAMETRIC_CURVE_PARAMETERS[function_type]
+        return TagData(type_signature, length, function_type)
+    count = int.from_bytes(data[position + 8:position + 12], byteorder="big")
+    if type_signature == CURV:
+        return TagData(type_signature, 12 + 2 * count, count)
+    return TagData(type_signature, None, count)
+
+
+def icc_profile(data, profile_offset):
+    """
+    Return the ICC profile starting at profile_offset, as declared by its size field.
+    :param data: Buffer holding the ICC profile.
+    :param profile_offset: Byte position of the start of the ICC profile.
+    :return: The profile bytes, or None if the size field is implausible or exceeds the buffer.
+    """
+    if profile_offset < 0 or profile_offset + 4 > len(data):
+        return None
+    profile_size = int.from_bytes(data[profile_offset:profile_offset + 4], byteorder="big")
+    if profile_size < ICC_HEADER_LENGTH + 4 or profile_offset + profile_size > len(data):
+        return None
+    return bytes(data[profile_offset:profile_offset + profile_size])
+
+
+def header_length_needed(data):
+    """
+    Number of leading bytes needed to cover the signature, 'ftyp' and 'jp2h' boxes.
+    :param data: Leading bytes of the file read so far.
+    :return: Byte count, larger than len(data) when more bytes must be read.
+    """
+    offset = 0
+    while True:
+        if offset + 16 > len(data):
+            # Enough for the next box header, including a possible XLBox
+            return offset + 16
+        box = read_box_header(data, offset)
+        if box is None or box.box_type == JP2C:
+            # Malformed header, or codestream reached without a 'jp2h' box
+            return offset
+        if box.box_type == JP2H:
+            return box.end
+        offset = box.end
+
+
+def read_header_bytes(read_chunk, initial_size):
+    """
+    Read the leading bytes covering the signature, 'ftyp' and 'jp2h' boxes,
+    growing the read window until the 'jp2h' box is complete or the input ends.
+    :param read_chunk: Callable returning up to the given number of following bytes.
+    :param initial_size: Size of the first read.
+    :return: The leading bytes read.
+    """
+    data = read_chunk(initial_size)
+    needed = header_length_needed(data)
+    while needed > len(data):
+        chunk = read_chunk(max(needed - len(data), initial_size))
+        if not chunk:
+            break
+        data += chunk
+        needed = header_length_needed(data)
+    return data
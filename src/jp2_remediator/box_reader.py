@@ -1,15 +1,93 @@
 import datetime
-from jp2_remediator import configure_logger
-from jpylyzer import boxvalidator
+import logging
+import os
+import shutil
+import time
+from jp2_remediator import configure_logger, FileLoggerAdapter
+from jp2_remediator import box_parser
+from jp2_remediator import patcher
+from jp2_remediator.result import RemediationResult
+
+# Initial read window for header-only reads, grown as the box lengths require
+HEADER_READ_SIZE = 4096
+# Chunk size used when copying the unread remainder of a file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# ICC.1:2022 Section 9.2 tone reproduction curve tags, reported by name
+TRC_TAGS = {
+    b"\x72\x54\x52\x43": "rTRC",  # redTRCTag
+    b"\x67\x54\x52\x43": "gTRC",  # greenTRCTag
+    b"\x62\x54\x52\x43": "bTRC",  # blueTRCTag
+    b"\x6b\x54\x52\x43": "kTRC",  # grayTRCTag
+}
+
+# Validation policies: skip jpylyzer, validate only the header boxes up to 'jp2h',
+# validate the whole file, or validate the whole file only when it will be rewritten
+VALIDATION_NONE = "none"
+VALIDATION_HEADER_ONLY = "header-only"
+VALIDATION_FULL = "full"
+VALIDATION_FULL_ON_MODIFY = "full-on-modify"
+VALIDATION_POLICIES = (VALIDATION_NONE, VALIDATION_HEADER_ONLY, VALIDATION_FULL, VALIDATION_FULL_ON_MODIFY)
+
+VALIDATOR_OPTIONS = {
+    "validationFormat": "jp2",
+    "verboseFlag": True,
+    "nullxmlFlag": False,
+    "packetmarkersFlag": False,
+}
+
+
+def modified_file_path(file_path):
+    # Returns the path of the '_modified_' copy of a file or S3 key, keeping its extension.
+    timestamp = datetime.datetime.now().strftime("%Y%m%d")  # use "%Y%m%d_%H%M%S" for more precision
+    root, extension = os.path.splitext(file_path)
+    return f"{root}_modified_{timestamp}{extension}"
 
 
 class BoxReader:
-    def __init__(self, file_path):
+    def __init__(self, file_path, header_only=False, in_place=False, validation=VALIDATION_FULL, trc_cache=None,
+                 dry_run=False):
         # Initializes BoxReader with a file path.
+        # With header_only, only the leading boxes up to 'jp2h' are read into memory.
+        # With in_place, changed bytes are patched into the file instead of writing a copy.
+        # validation is one of VALIDATION_POLICIES.
+        # trc_cache is an optional TrcAnalysisCache shared by readers of files with identical ICC profiles.
+        # With dry_run, the file is audited from its header boxes and never written.
+        if validation not in VALIDATION_POLICIES:
+            raise ValueError(f"Unknown validation policy: {validation}")
+        if dry_run:
+            # Audits read only the header boxes, validating the codestream would read the whole file
+            header_only = True
+            in_place = False
+            if validation in (VALIDATION_FULL, VALIDATION_FULL_ON_MODIFY):
+                validation = VALIDATION_HEADER_ONLY
+        self.dry_run = dry_run
+        self.header_only = header_only
+        self.in_place = in_place
+        self.validation = validation
+        self.trc_cache = trc_cache
+        self.logger = FileLoggerAdapter(configure_logger(__name__), {"file_path": file_path})
+        self.load(file_path)
+
+    def load(self, file_path):
+        # Resets the per-file state and reads file_path, so a configured reader is reused
+        # for many files instead of being constructed per file, see engine.RemediationEngine.
         self.file_path = file_path
-        self.file_contents = self.read_file(file_path)
+        self.logger.extra["file_path"] = file_path
+        if self.in_place and patcher.recover_in_place(file_path):
+            self.logger.warning(f"Rolled back an interrupted in-place patch: {file_path}")
+        self.result = RemediationResult(file_path)
+        # First 'colr' box found by check_boxes, and the findings logged while checking the ICC profile
+        self.colr_box = None
+        self.findings = []
+        start = time.perf_counter()
+        if self.header_only:
+            self.file_contents = self.read_header(file_path)
+        else:
+            self.file_contents = self.read_file(file_path)
+        self.result.timings["read"] = time.perf_counter() - start
+        self.result.bytes_read = len(self.file_contents or b"")
         self.validator = None
-        self.logger = configure_logger(__name__)
 
     def read_file(self, file_path):
         # Reads the file content from the given path.
@@ -20,59 +98,85 @@ class BoxReader:
             self.logger.error(f"Error reading file {file_path}: {e}")
             return None
 
+    def read_header(self, file_path):
+        # Reads the leading bytes covering the signature, 'ftyp' and 'jp2h' boxes,
+        # growing the read window until the 'jp2h' box is complete or the file ends.
+        try:
+            with open(file_path, "rb") as file:
+                return box_parser.read_header_bytes(file.read, HEADER_READ_SIZE)
+        except IOError as e:
+            self.logger.error(f"Error reading file {file_path}: {e}")
+            return None
+
     def initialize_validator(self):
         # Initializes the jpylyzer BoxValidator for JP2 file validation.
-        options = {
-            "validationFormat": "jp2",
-            "verboseFlag": True,
-            "nullxmlFlag": False,
-            "packetmarkersFlag": False,
-        }
-        self.validator = boxvalidator.BoxValidator(options, "JP2", self.file_contents)
+        # jpylyzer is imported by the first file validated, runs without validation never load it.
+        from jpylyzer import boxvalidator
+        file_contents = self.file_contents
+        if self.header_only:
+            # jpylyzer validates the whole file, including the codestream
+            file_contents = self.read_file(self.file_path)
+            self.result.bytes_read += len(file_contents or b"")
+        self.validator = boxvalidator.BoxValidator(VALIDATOR_OPTIONS, "JP2", file_contents)
         self.validator.validate()
         return self.validator
 
-    def find_box_position(self, box_hex):
-        # Finds the position of the specified box in the file.
-        return self.file_contents.find(box_hex)
+    def validate_header_boxes(self):
+        # Validates only the top-level boxes up to and including 'jp2h' with jpylyzer,
+        # which covers the 'colr' box and ICC profile without reading the codestream.
+        from jpylyzer import boxvalidator
+        is_valid = True
+        for box in box_parser.iter_boxes(self.file_contents):
+            if box.box_type == box_parser.JP2C:
+                break
+            validator = boxvalidator.BoxValidator(
+                VALIDATOR_OPTIONS, box.box_type, bytes(self.file_contents[box.content_offset:box.end])
+            )
+            is_valid = validator.validate()._isValid() and is_valid
+            if box.box_type == box_parser.JP2H:
+                break
+        return is_valid
 
     def check_boxes(self):
-        # Checks for presence of 'jp2h' and 'colr' boxes in file contents.
-        jp2h_position = self.find_box_position(b"\x6a\x70\x32\x68")  # search hex for 'jp2h'
-        if jp2h_position != -1:
+        # Checks for presence of 'jp2h' and 'colr' boxes in the JP2 header.
+        jp2h_box, jp2h_children = box_parser.find_header_boxes(self.file_contents)
+        if jp2h_box is not None:
+            jp2h_position = jp2h_box.type_position
             self.logger.debug(f"'jp2h' found at byte position: {jp2h_position}")
         else:
             self.logger.debug("'jp2h' not found in the file.")
 
-        colr_position = self.find_box_position(b"\x63\x6f\x6c\x72")  # search hex for 'colr'
-        if colr_position != -1:
-            self.logger.debug(f"'colr' found at byte position: {colr_position}")
+        # ISO/IEC 15444-1:2019(E) Section I.5.3.3, the first 'colr' box is used
+        self.colr_box = next((box for box in jp2h_children if box.box_type == box_parser.COLR), None)
+        if self.colr_box is not None:
+            self.logger.debug(f"'colr' found at byte position: {self.colr_box.type_position}")
         else:
             self.logger.debug("'colr' not found in the file.")
 
-        header_offset_position = self.process_colr_box(colr_position)
+        header_offset_position = self.process_colr_box(self.colr_box)
 
         return header_offset_position
 
-    def process_colr_box(self, colr_position):
-        # Processes the 'colr' box to determine header offset position.
-        if colr_position != -1:
-            self.logger.debug(f"'colr' found at byte position: {colr_position}")
-            meth_byte_position = colr_position + 4
+    def process_colr_box(self, colr_box):
+        # Processes the 'colr' Box, or None, to determine header offset position.
+        if colr_box is not None:
+            self.logger.debug(f"'colr' found at byte position: {colr_box.type_position}")
+            meth_byte_position = colr_box.content_offset
             # ISO/IEC 15444-1:2019(E) Figure I.10 colr specification box
-            # byte position of METH value after 'colr'
+            # METH is the first byte of the box contents, after LBox, TBox and XLBox if present
             meth_value = self.file_contents[meth_byte_position]
+            self.result.meth = meth_value
             self.logger.debug(f"'meth' value: {meth_value} at byte position: {meth_byte_position}")
 
             if meth_value == 1:
                 header_offset_position = meth_byte_position + 7
                 # ISO/IEC 15444-1:2019(E) Table I.11 colr specification box,
-                # if meth is 1 then color profile starts at byte position 7 after 'colr'
+                # if meth is 1 then color profile starts at byte position 7 after METH
                 self.logger.debug(f"'meth' is 1, setting header_offset_position to: {header_offset_position}")
             elif meth_value == 2:
                 header_offset_position = meth_byte_position + 3
                 # ISO/IEC 15444-1:2019(E) Table I.11 colr specification box,
-                # if meth is 2 then color profile (ICC profile) starts at byte position 3 after 'colr'
+                # if meth is 2 then color profile (ICC profile) starts at byte position 3 after METH
                 self.logger.debug(f"""'meth' is 2, setting header_offset_position to: {
                     header_offset_position} (start of ICC profile)""")
             else:
@@ -84,101 +188,249 @@ class BoxReader:
 
         return header_offset_position
 
-    def process_trc_tag(self, trc_hex, trc_name, new_contents, header_offset_position):
-        # Processes the TRC tag and modifies contents if necessary.
-        trc_position = new_contents.find(trc_hex)
-        if trc_position == -1:
-            self.logger.debug(f"'{trc_name}' not found in the file.")
-            return new_contents
-
-        self.logger.debug(f"'{trc_name}' found at byte position: {trc_position}")
-        trc_tag_entry = new_contents[trc_position:trc_position + 12]
-        # 12-byte tag entry length
-
-        if len(trc_tag_entry) != 12:
-            self.logger.debug(f"Could not extract the full 12-byte '{trc_name}' tag entry.")
-            return new_contents
-
-        trc_tag_signature = trc_tag_entry[0:4]
-        # ICC.1:2022 Table 24 tag signature, e.g. 'rTRC'
-        trc_tag_offset = int.from_bytes(trc_tag_entry[4:8], byteorder='big')
-        # ICC.1:2022 Table 24 tag offset
-        trc_tag_size = int.from_bytes(trc_tag_entry[8:12], byteorder='big')
-        # ICC.1:2022 Table 24 tag size
-        self.logger.debug(f"'{trc_name}' Tag Signature: {trc_tag_signature}")
-        self.logger.debug(f"'{trc_name}' Tag Offset: {trc_tag_offset}")
-        self.logger.debug(f"'{trc_name}' Tag Size: {trc_tag_size}")
+    def icc_profile_length(self, contents, header_offset_position):
+        # Returns the length of the ICC profile as declared by its size field, within the contents read.
+        available = len(contents) - header_offset_position
+        profile_size = int.from_bytes(contents[header_offset_position:header_offset_position + 4], byteorder="big")
+        if profile_size < box_parser.ICC_HEADER_LENGTH + 4:
+            return available
+        return min(profile_size, available)
 
-        if header_offset_position is None:
-            self.logger.debug(f"Cannot calculate 'curv_{trc_name}_position' due to an unrecognized 'meth' value.")
-            return new_contents
-
-        curv_trc_position = trc_tag_offset + header_offset_position  # start of curv profile data
-        curv_profile = new_contents[curv_trc_position: curv_trc_position + 12]  # 12-byte curv profile data length
-
-        if len(curv_profile) < 12:
-            self.logger.debug(f"Could not read the full 'curv' profile data for {trc_name}.")
-            return new_contents
-
-        curv_signature = curv_profile[0:4].decode("utf-8")  # ICC.1:2022 Table 35 tag signature
-        curv_reserved = int.from_bytes(curv_profile[4:8], byteorder="big")  # ICC.1:2022 Table 35 reserved 0's
-        curv_trc_gamma_n = int.from_bytes(curv_profile[8:12], byteorder="big")  # # ICC.1:2022 Table 35 n value
-
-        self.logger.debug(f"'curv' Profile Signature for {trc_name}: {curv_signature}")
-        self.logger.debug(f"'curv' Reserved Value: {curv_reserved}")
-        self.logger.debug(f"'curv_{trc_name}_gamma_n' Value: {curv_trc_gamma_n}")
-        curv_trc_field_length = curv_trc_gamma_n * 2 + 12  # ICC.1:2022 Table 35 2n field length
-        self.logger.debug(f"'curv_{trc_name}_field_length': {curv_trc_field_length}")
-
-        # Check if the curv_trc_gamma_n is not 1, if not then skip processing of file
-        if curv_trc_gamma_n != 1:
-            self.logger.warning(f"""Warning: In file '{self.file_path}', 'curv_{trc_name}_gamma_n' value is {
-                curv_trc_gamma_n
-                }, expected 1. Modification may be required.""")
-            return new_contents
-
-        if trc_tag_size != curv_trc_field_length:
-            self.logger.warning(f"""'{trc_name}' Tag Size ({trc_tag_size}) does not match 'curv_{
-                trc_name}_field_length' ({curv_trc_field_length}). Modifying the size...""")
-            new_trc_size_bytes = curv_trc_field_length.to_bytes(4, byteorder='big')
-            new_contents[trc_position + 8: trc_position + 12] = new_trc_size_bytes
-        return new_contents
+    def check_tag_entry(self, entry, contents, header_offset_position, profile_length, tag_count):
+        # Checks a tag table entry against the profile bounds and the encoded length of its type.
+        # Returns the (position, bytes) patch of the tag size field, or None.
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        trc_name = TRC_TAGS.get(entry.signature)
+        name = trc_name or entry.signature.decode("latin-1")
+        if debug and trc_name is not None:
+            self.logger.debug(f"'{trc_name}' found at byte position: {entry.entry_position}")
+            self.logger.debug(f"'{trc_name}' Tag Signature: {entry.signature}")
+            # ICC.1:2022 Table 24 tag signature, offset and size
+            self.logger.debug(f"'{trc_name}' Tag Offset: {entry.offset}")
+            self.logger.debug(f"'{trc_name}' Tag Size: {entry.size}")
+
+        # ICC.1:2022 Section 7.3.5 tag data follows the tag table and lies within the profile
+        table_end = box_parser.ICC_HEADER_LENGTH + 4 + box_parser.ICC_TAG_ENTRY_LENGTH * tag_count
+        tag_data = None
+        if table_end <= entry.offset <= profile_length - 12:
+            tag_data = box_parser.read_tag_data(contents, header_offset_position + entry.offset)
+        if tag_data is None or tag_data.length is None:
+            if entry.offset < table_end or entry.offset + entry.size > profile_length:
+                self.record_finding("tag_bounds", name, entry.offset, entry.size, profile_length)
+            elif tag_data is None and debug and trc_name is not None:
+                self.logger.debug(f"Could not read the full 'curv' profile data for {trc_name}.")
+            elif tag_data is not None and tag_data.type_signature == box_parser.PARA:
+                self.record_finding("para_function", name, tag_data.count)
+            return None
+
+        type_name = tag_data.type_signature.decode("latin-1")
+        if tag_data.type_signature == box_parser.CURV and trc_name is not None:
+            self.result.trc_tags[trc_name] = {"offset": entry.offset, "size": entry.size, "n": tag_data.count}
+            if debug:
+                self.logger.debug(f"'curv_{trc_name}_gamma_n' Value: {tag_data.count}")
+                self.logger.debug(f"'curv_{trc_name}_field_length': {tag_data.length}")
+            # A curv count other than 1 is a sampled curve, flagged for review
+            if tag_data.count != 1:
+                self.record_finding("gamma_n", trc_name, tag_data.count)
+        elif trc_name is not None:
+            self.result.trc_tags[trc_name] = {"offset": entry.offset, "size": entry.size, "n": None}
+
+        if entry.offset + tag_data.length > profile_length:
+            # Truncated tag data, a larger size would overlap whatever follows
+            self.record_finding("tag_bounds", name, entry.offset, tag_data.length, profile_length)
+            return None
+        if entry.size != tag_data.length:
+            self.record_finding("tag_size", name, entry.size, tag_data.length, type_name)
+            return entry.entry_position + 8, tag_data.length.to_bytes(4, byteorder="big")
+        return None
+
+    def record_finding(self, kind, *values):
+        # Logs a finding through its warn_<kind> method and keeps it for the ICC cache.
+        self.findings.append([kind, *values])
+        getattr(self, f"warn_{kind}")(*values)
+
+    def warn_gamma_n(self, trc_name, curv_trc_gamma_n):
+        # Warns that a curv count other than 1 needs review.
+        self.result.flagged = True
+        self.logger.warning(f"""'curv_{trc_name}_gamma_n' value is {
+            curv_trc_gamma_n
+            }, expected 1. Modification may be required.""")
+
+    def warn_tag_size(self, trc_name, trc_tag_size, curv_trc_field_length, type_name="curv"):
+        # Warns that a tag size is corrected to the encoded length of its type.
+        self.logger.warning(f"""'{trc_name}' Tag Size ({trc_tag_size}) does not match '{type_name}_{
+            trc_name}_field_length' ({curv_trc_field_length}). Modifying the size...""")
+
+    def warn_tag_bounds(self, tag_name, tag_offset, tag_size, profile_length):
+        # Warns that tag data lies outside the profile, which cannot be fixed safely.
+        self.result.flagged = True
+        self.logger.warning(f"""'{tag_name}' data at offset {
+            tag_offset} ({tag_size} bytes) lies outside the ICC profile ({profile_length} bytes).""")
+
+    def warn_para_function(self, tag_name, function_type):
+        # Warns about a parametric curve function type unknown to ICC.1:2022.
+        self.result.flagged = True
+        self.logger.warning(f"""'{tag_name}' 'para' function type {
+            function_type} is unknown.""")
+
+    def warn_profile_size(self, profile_size, box_length):
+        # Warns that the ICC profile size field is corrected to the 'colr' box contents.
+        self.logger.warning(f"""ICC profile size ({profile_size}) does not match the 'colr' box ({
+            box_length}). Modifying the size...""")
+
+    def check_profile_size(self, contents, header_offset_position):
+        # Checks the ICC profile size field against the 'colr' box holding the profile (meth 2).
+        # Returns the (position, bytes) patch of the size field, or None.
+        colr_box = self.colr_box
+        if colr_box is None or self.result.meth != 2 or colr_box.end > len(contents):
+            return None
+        box_length = colr_box.end - header_offset_position
+        profile_size = int.from_bytes(contents[header_offset_position:header_offset_position + 4], byteorder="big")
+        if profile_size == box_length or box_length < box_parser.ICC_HEADER_LENGTH + 4:
+            return None
+        self.record_finding("profile_size", profile_size, box_length)
+        return header_offset_position, box_length.to_bytes(4, byteorder="big")
 
     def process_all_trc_tags(self, header_offset_position):
-        # Function to process 'TRC' tags (rTRC, gTRC, bTRC).
-        new_file_contents = bytearray(self.file_contents)
-        trc_tags = {
-            b"\x72\x54\x52\x43": "rTRC",  # search hex for 'rTRC'
-            b"\x67\x54\x52\x43": "gTRC",  # search hex for 'gTRC'
-            b"\x62\x54\x52\x43": "bTRC",  # search hex for 'bTRC'
-        }
+        # Checks every tag of the ICC tag table in one pass, the TRC tags (rTRC, gTRC, bTRC, kTRC)
+        # included, and the profile size field, then applies all fixes together.
+        new_file_contents = self.editable_contents()
+        if header_offset_position is None:
+            return new_file_contents
+        if self.result.meth == 1:
+            # ISO/IEC 15444-1:2019(E) Table I.11, an enumerated colourspace has no ICC profile
+            self.logger.debug("'meth' is 1, no ICC profile to check.")
+            return new_file_contents
+
+        patches = []
+        size_patch = self.check_profile_size(new_file_contents, header_offset_position)
+        if size_patch is not None:
+            patches.append(size_patch)
+
+        # With a cache, an ICC profile seen before costs one hash and a lookup,
+        # unless its size field is corrected, which depends on the 'colr' box
+        profile = cache_key = None
+        if self.trc_cache is not None and size_patch is None:
+            profile = box_parser.icc_profile(self.file_contents, header_offset_position)
+        if profile is not None:
+            cache_key = self.trc_cache.key(profile)
+            analysis = self.trc_cache.get(cache_key)
+            if analysis is not None:
+                return self.apply_trc_analysis(analysis, new_file_contents, header_offset_position)
 
-        for trc_hex, trc_name in trc_tags.items():
-            new_file_contents = self.process_trc_tag(trc_hex, trc_name, new_file_contents, header_offset_position)
+        findings_start = len(self.findings)
+        # ICC.1:2022 Section 7.3 tag table, read by its declared tag count
+        tag_entries = box_parser.parse_icc_tag_table(new_file_contents, header_offset_position)
+        profile_length = self.icc_profile_length(new_file_contents, header_offset_position)
+        if size_patch is not None:
+            profile_length = int.from_bytes(size_patch[1], byteorder="big")
+        table_patches = []
+        for entry in tag_entries:
+            patch = self.check_tag_entry(
+                entry, new_file_contents, header_offset_position, profile_length, len(tag_entries)
+            )
+            if patch is not None:
+                table_patches.append(patch)
+
+        for position, new_bytes in patches + table_patches:
+            new_file_contents[position:position + len(new_bytes)] = new_bytes
+
+        # The analysis only depends on the profile bytes, which bound every tag checked
+        if cache_key is not None:
+            self.trc_cache.put(cache_key, {
+                "trc_tags": {name: dict(values) for name, values in self.result.trc_tags.items()},
+                "findings": self.findings[findings_start:],
+                "patches": [[position - header_offset_position, new_bytes.hex()]
+                            for position, new_bytes in table_patches],
+            })
 
         return new_file_contents
 
+    def editable_contents(self):
+        # Returns the mutable copy of the contents that TRC tag fixes are written to.
+        return bytearray(self.file_contents)
+
+    def contents_changed(self, new_file_contents):
+        # Returns True if the processed contents differ from the contents read.
+        return new_file_contents != self.file_contents
+
+    def apply_trc_analysis(self, analysis, new_contents, header_offset_position):
+        # Applies a cached analysis of an identical ICC profile, logging the same warnings.
+        for trc_name, values in analysis["trc_tags"].items():
+            self.result.trc_tags[trc_name] = dict(values)
+        for kind, *values in analysis["findings"]:
+            self.record_finding(kind, *values)
+        for offset, new_bytes in analysis["patches"]:
+            position = header_offset_position + offset
+            patch = bytes.fromhex(new_bytes)
+            new_contents[position:position + len(patch)] = patch
+        return new_contents
+
     def write_modified_file(self, new_file_contents):
         # Writes modified file contents to new file if changes were made.
-        if new_file_contents != self.file_contents:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d")  # use "%Y%m%d_%H%M%S" for more precision
-            new_file_path = self.file_path.replace(".jp2", f"_modified_{timestamp}.jp2")
+        # Returns the path written, or None if no changes were made.
+        if new_file_contents != self.file_contents and self.in_place:
+            patches = patcher.diff_patches(self.file_contents, new_file_contents)
+            patcher.apply_in_place(self.file_path, patches)
+            self.logger.info(f"Patched {len(patches)} byte range(s) in place: {self.file_path}")
+            return self.file_path
+        elif new_file_contents != self.file_contents:
+            new_file_path = modified_file_path(self.file_path)
             with open(new_file_path, "wb") as new_file:
                 new_file.write(new_file_contents)
+                if self.header_only:
+                    # Copy the unread remainder of the file, e.g. the codestream, in chunks
+                    with open(self.file_path, "rb") as source_file:
+                        source_file.seek(len(self.file_contents))
+                        shutil.copyfileobj(source_file, new_file, COPY_CHUNK_SIZE)
+                        self.result.bytes_read += source_file.tell() - len(self.file_contents)
             self.logger.info(f"New JP2 file created with modifications: {new_file_path}")
+            return new_file_path
         else:
             self.logger.info(f"No modifications needed. No new file created: {self.file_path}")
+            return None
 
     def read_jp2_file(self):
         # Main function to read, validate, and modify JP2 files.
+        # Returns a RemediationResult saying whether the file was changed and where it was written.
+        result = self.result
         if not self.file_contents:
-            return
+            result.error = "File could not be read"
+            return result
 
-        self.initialize_validator()
-        is_valid = self.validator._isValid()
-        self.logger.info(f"Is file valid? {is_valid}")
+        start = time.perf_counter()
+        if self.validation == VALIDATION_FULL:
+            self.initialize_validator()
+            result.is_valid = self.validator._isValid()
+            self.logger.info(f"Is file valid? {result.is_valid}")
+        elif self.validation == VALIDATION_HEADER_ONLY:
+            result.is_valid = self.validate_header_boxes()
+            self.logger.info(f"Is file header valid? {result.is_valid}")
+        result.timings["validate"] = time.perf_counter() - start
 
+        start = time.perf_counter()
         header_offset_position = self.check_boxes()
+        result.timings["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
         new_file_contents = self.process_all_trc_tags(header_offset_position)
+        result.modified = self.contents_changed(new_file_contents)
+        result.timings["patch"] = time.perf_counter() - start
+
+        if self.dry_run:
+            # Audits stop after the TRC analysis, modified only says the file would change
+            if result.modified:
+                self.logger.info(f"Dry run, file would be modified: {self.file_path}")
+            return result
+
+        if self.validation == VALIDATION_FULL_ON_MODIFY and result.modified:
+            start = time.perf_counter()
+            self.initialize_validator()
+            result.is_valid = self.validator._isValid()
+            self.logger.info(f"Is file valid? {result.is_valid}")
+            result.timings["validate"] += time.perf_counter() - start
 
-        self.write_modified_file(new_file_contents)
+        start = time.perf_counter()
+        result.output_path = self.write_modified_file(new_file_contents)
+        result.timings["write"] = time.perf_counter() - start
+        return result
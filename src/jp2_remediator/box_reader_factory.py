@@ -1,12 +1,64 @@
-from jp2_remediator.box_reader import BoxReader
+from jp2_remediator.box_reader import BoxReader, VALIDATION_FULL
+from jp2_remediator.buffer_reader import BUFFER_NAME, BufferBoxReader
+from jp2_remediator.mapped_reader import MappedBoxReader
 
 
 class BoxReaderFactory:
 
+    def __init__(self, header_only=False, in_place=False, validation=VALIDATION_FULL, trc_cache=None,
+                 dry_run=False, memory_map=False):
+        """
+        Create a factory for BoxReader instances.
+        :param header_only: Read only the JP2 header boxes instead of the whole file.
+        :param in_place: Patch changed bytes into the original file instead of writing a copy.
+        :param validation: jpylyzer validation policy, one of box_reader.VALIDATION_POLICIES.
+        :param trc_cache: Optional TrcAnalysisCache shared by all readers, each worker process gets its own.
+        :param dry_run: Audit files from their header boxes without writing anything.
+        :param memory_map: Memory-map whole files instead of reading them, unless only headers are read.
+        """
+        self.header_only = header_only
+        self.in_place = in_place
+        self.validation = validation
+        self.trc_cache = trc_cache
+        self.dry_run = dry_run
+        self.memory_map = memory_map
+
     def get_reader(self, file_path):
         """
         Create a BoxReader instance for a given file path.
         :param file_path: The path to the file to be read.
         :return: A BoxReader instance.
         """
-        return BoxReader(file_path)
+        if self.memory_map and not self.header_only and not self.dry_run:
+            return MappedBoxReader(
+                file_path, in_place=self.in_place, validation=self.validation, trc_cache=self.trc_cache
+            )
+        return BoxReader(
+            file_path, header_only=self.header_only, in_place=self.in_place, validation=self.validation,
+            trc_cache=self.trc_cache, dry_run=self.dry_run
+        )
+
+    def get_s3_reader(self, s3, bucket_name, key):
+        """
+        Create a BoxReader that reads the header of an S3 object with Range requests.
+        :param s3: boto3 S3 client.
+        :param bucket_name: Name of the S3 bucket.
+        :param key: Key of the JP2 object.
+        :return: An S3BoxReader instance.
+        """
+        # botocore is only imported by bucket runs
+        from jp2_remediator.s3_reader import S3BoxReader
+        return S3BoxReader(
+            s3, bucket_name, key, validation=self.validation, trc_cache=self.trc_cache, dry_run=self.dry_run
+        )
+
+    def get_buffer_reader(self, source, name=BUFFER_NAME):
+        """
+        Create a BoxReader over JP2 bytes in memory or a file object, which writes nothing.
+        :param source: bytes, bytearray or memoryview of the whole file, or a binary file object.
+        :param name: Name of the buffer in log messages and in its RemediationResult.
+        :return: A BufferBoxReader instance, its patches are set once read_jp2_file returns.
+        """
+        return BufferBoxReader(
+            source, name, validation=self.validation, trc_cache=self.trc_cache, dry_run=self.dry_run
+        )
@@ -0,0 +1,150 @@
+import time
+from jp2_remediator import box_parser
+from jp2_remediator import patcher
+from jp2_remediator.box_reader import (
+    BoxReader, COPY_CHUNK_SIZE, HEADER_READ_SIZE, VALIDATION_FULL, VALIDATION_FULL_ON_MODIFY, VALIDATION_HEADER_ONLY,
+    VALIDATION_NONE, VALIDATOR_OPTIONS
+)
+
+# Name reported for buffers that are not given one, e.g. in log messages and results
+BUFFER_NAME = "<buffer>"
+# Types holding the whole file, other sources are read as file objects
+BUFFER_TYPES = (bytes, bytearray, memoryview)
+# Validation policies that do not need the whole file, the only ones available when streaming
+STREAM_VALIDATION_POLICIES = (VALIDATION_NONE, VALIDATION_HEADER_ONLY)
+
+
+class BufferBoxReader(BoxReader):
+    """
+    BoxReader over JP2 bytes in memory or a readable file object, which never touches the filesystem.
+    Only the header boxes are copied to be patched, and changes are kept as a list of patches.
+    """
+
+    def __init__(self, source, name=BUFFER_NAME, validation=VALIDATION_NONE, trc_cache=None, dry_run=False):
+        """
+        Read a JP2 buffer.
+        :param source: bytes, bytearray or memoryview of the whole file, or a binary file object
+            positioned at the start of the file, of which only the header boxes are read
+            unless the whole file is validated.
+        :param name: Name of the buffer in log messages and in its RemediationResult.
+        :param validation: jpylyzer validation policy, one of box_reader.VALIDATION_POLICIES.
+        :param trc_cache: Optional TrcAnalysisCache shared by readers.
+        :param dry_run: Audit the buffer from its header boxes.
+        """
+        self.source = source
+        self.patches = []
+        header_only = not isinstance(source, BUFFER_TYPES) and validation not in (
+            VALIDATION_FULL, VALIDATION_FULL_ON_MODIFY
+        )
+        super().__init__(name, header_only=header_only, validation=validation, trc_cache=trc_cache, dry_run=dry_run)
+
+    def read_file(self, file_path):
+        # Returns a view of the buffer, or reads the whole file object.
+        if isinstance(self.source, BUFFER_TYPES):
+            return memoryview(self.source)
+        return self.source.read()
+
+    def read_header(self, file_path):
+        # Reads the header boxes from the file object, or a view of them from the buffer.
+        if isinstance(self.source, BUFFER_TYPES):
+            view = memoryview(self.source)
+            return view[:box_parser.header_length_needed(view)]
+        return box_parser.read_header_bytes(self.source.read, HEADER_READ_SIZE)
+
+    def initialize_validator(self):
+        # jpylyzer needs bytes, views of a buffer are copied once.
+        from jpylyzer import boxvalidator
+        self.validator = boxvalidator.BoxValidator(VALIDATOR_OPTIONS, "JP2", bytes(self.file_contents))
+        self.validator.validate()
+        return self.validator
+
+    def editable_contents(self):
+        # Copies only the leading boxes up to 'jp2h', where the ICC profile lies.
+        return bytearray(self.file_contents[:box_parser.header_length_needed(self.file_contents)])
+
+    def contents_changed(self, new_file_contents):
+        # Collects the patches of the header copy.
+        self.patches = patcher.diff_patches(self.file_contents[:len(new_file_contents)], new_file_contents)
+        return bool(self.patches)
+
+    def write_modified_file(self, new_file_contents):
+        # Nothing is written, callers apply the patches, see remediate_bytes.
+        if self.patches:
+            self.logger.info(f"Patched {len(self.patches)} byte range(s) in memory: {self.file_path}")
+        else:
+            self.logger.info(f"No modifications needed: {self.file_path}")
+        return None
+
+
+def remediate(source, name=BUFFER_NAME, validation=VALIDATION_NONE, trc_cache=None, dry_run=False):
+    """
+    Remediate a JP2 buffer or file object without writing anything.
+    :param source: bytes, bytearray or memoryview of the whole file, or a binary file object, see BufferBoxReader.
+    :param name: Name of the buffer in log messages and in its RemediationResult.
+    :param validation: jpylyzer validation policy, one of box_reader.VALIDATION_POLICIES.
+    :param trc_cache: Optional TrcAnalysisCache.
+    :param dry_run: Audit the buffer from its header boxes.
+    :return: (RemediationResult, patches) tuple, patches being (offset, original bytes, new bytes) tuples
+        relative to the start of the file.
+    """
+    reader = BufferBoxReader(source, name, validation, trc_cache, dry_run)
+    result = reader.read_jp2_file()
+    return result, reader.patches
+
+
+def apply_patches(data, patches):
+    """
+    Apply patches to a copy of a buffer.
+    :param data: bytes, bytearray or memoryview the patches were computed for, or its leading bytes.
+    :param patches: List of (offset, original bytes, new bytes) tuples.
+    :return: Patched bytes.
+    :raises ValueError: If the buffer does not hold the original bytes of a patch.
+    """
+    patched = bytearray(data)
+    for offset, original_bytes, new_bytes in patches:
+        if patched[offset:offset + len(original_bytes)] != original_bytes:
+            raise ValueError(f"Buffer does not match the patch at offset {offset}")
+        patched[offset:offset + len(new_bytes)] = new_bytes
+    return bytes(patched)
+
+
+def remediate_bytes(source, name=BUFFER_NAME, validation=VALIDATION_NONE, trc_cache=None):
+    """
+    Remediate a JP2 buffer or file object in memory.
+    :param source: bytes, bytearray or memoryview of the whole file, or a binary file object, read whole.
+    :return: (RemediationResult, patched bytes) tuple, the bytes are the original ones when nothing changed.
+    """
+    if not isinstance(source, BUFFER_TYPES):
+        source = source.read()
+    result, patches = remediate(source, name, validation, trc_cache)
+    return result, apply_patches(source, patches) if patches else bytes(source)
+
+
+def remediate_stream(source, target, name=BUFFER_NAME, validation=VALIDATION_HEADER_ONLY, trc_cache=None,
+                     chunk_size=COPY_CHUNK_SIZE):
+    """
+    Remediate a JP2 read from a file object into another, e.g. from stdin to stdout, in constant memory.
+    Only the header boxes are buffered and patched, the rest of the file is copied through in chunks.
+    Input that cannot be remediated, e.g. without a 'jp2h' box, is copied through unchanged.
+    :param source: Binary file object positioned at the start of the file.
+    :param target: Binary file object the remediated file is written to.
+    :param name: Name of the stream in log messages and in its RemediationResult.
+    :param validation: 'none' or 'header-only', full validation would buffer the whole file.
+    :param trc_cache: Optional TrcAnalysisCache.
+    :param chunk_size: Size of the chunks copied after the header boxes.
+    :return: RemediationResult of the file, bytes_read counts all bytes copied.
+    :raises ValueError: If the validation policy needs the whole file.
+    """
+    if validation not in STREAM_VALIDATION_POLICIES:
+        raise ValueError(f"Validation policy not supported when streaming: {validation}")
+    reader = BufferBoxReader(source, name, validation, trc_cache)
+    result = reader.read_jp2_file()
+    start = time.perf_counter()
+    header = reader.file_contents or b""
+    target.write(apply_patches(header, reader.patches) if reader.patches else header)
+    while chunk := source.read(chunk_size):
+        target.write(chunk)
+        result.bytes_read += len(chunk)
+    target.flush()
+    result.timings["write"] = time.perf_counter() - start
+    return result
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Outcomes are committed in batches, a crash loses at most this many records, which are processed again
+COMMIT_INTERVAL = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    key TEXT PRIMARY KEY,
+    size INTEGER,
+    version TEXT,
+    action TEXT NOT NULL,
+    output_path TEXT,
+    updated REAL NOT NULL
+)
+"""
+
+
+def local_version(file_path, stat=None):
+    """
+    Return the checkpoint key, size and version (mtime in ns) of a local file.
+    :param file_path: Path of the file.
+    :param stat: Stat result of the file if already known, e.g. from os.DirEntry.stat().
+    :return: (key, size, version) tuple.
+    """
+    if stat is None:
+        stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_size, str(stat.st_mtime_ns)
+
+
+class CheckpointStore:
+    """
+    SQLite index of per-file outcomes, keyed by path or S3 URI with the size and
+    mtime or ETag the file had when it was processed.
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        Open or create a checkpoint store.
+        :param path: Path of the SQLite database.
+        :param resume: Skip files recorded as processed with an unchanged size and version.
+        """
+        self.path = path
+        self.resume = resume
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._pending = 0
+        # One connection shared by the pipeline threads, serialized by the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+
+    def should_skip(self, key, size, version):
+        """
+        Check whether a file can be skipped when resuming.
+        Failed files and files whose size or version changed are processed again.
+        :return: True if resuming and the file was already processed in its current version.
+        """
+        if not self.resume:
+            return False
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, version, action FROM checkpoints WHERE key = ?", (key,)
+            ).fetchone()
+            skip = row is not None and row[0] == size and row[1] == version and row[2] != "error"
+            if skip:
+                self.skipped += 1
+        return skip
+
+    def record(self, key, size, version, result):
+        """Record the outcome of a file, replacing any earlier record."""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                (key, size, version, result.action, result.output_path, time.time()),
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_INTERVAL:
+                self._connection.commit()
+                self._pending = 0
+
+    def record_local(self, result):
+        """
+        Record the outcome of a local file with its size and mtime after processing,
+        so files patched in place are not processed again either.
+        """
+        try:
+            key, size, version = local_version(result.file_path)
+        except OSError:
+            key, size, version = os.path.abspath(result.file_path), None, None
+        self.record(key, size, version, result)
+
+    def close(self):
+        """Commit pending records and close the database."""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,109 @@
+import os
+from jp2_remediator import box_parser
+
+# Variants of generated files:
+# meth1: 'colr' box with an enumerated sRGB colourspace, no ICC profile
+# correct: ICC profile whose curv TRC tags have n = 1 and the matching tag size (14)
+# mis-sized: curv TRC tags with n = 1 but a tag size of 16, remediated to 14
+# n-not-1: curv TRC tags with n = 2, flagged for review
+VARIANT_METH1 = "meth1"
+VARIANT_CORRECT = "correct"
+VARIANT_MIS_SIZED = "mis-sized"
+VARIANT_N_NOT_1 = "n-not-1"
+VARIANTS = (VARIANT_METH1, VARIANT_CORRECT, VARIANT_MIS_SIZED, VARIANT_N_NOT_1)
+
+# Default size of a generated file in bytes
+DEFAULT_FILE_SIZE = 64 * 1024
+
+TRC_SIGNATURES = (b"rTRC", b"gTRC", b"bTRC")
+# ISO/IEC 15444-1:2019(E) Table I.10 enumerated colourspace for sRGB
+ENUMCS_SRGB = 16
+
+
+def make_box(box_type, contents):
+    """Build a box with a 4-byte LBox."""
+    return (len(contents) + 8).to_bytes(4, "big") + box_type + contents
+
+
+def make_curv(n):
+    """Build a 'curv' tag of n entries, padded to a 4-byte boundary (ICC.1:2022 Table 35)."""
+    curv = b"curv" + bytes(4) + n.to_bytes(4, "big") + (256).to_bytes(2, "big") * n
+    return curv + bytes(-len(curv) % 4)
+
+
+def make_icc_profile(variant):
+    """
+    Build an RGB display ICC profile with a 'wtpt' tag and three curv TRC tags.
+    :param variant: VARIANT_CORRECT, VARIANT_MIS_SIZED or VARIANT_N_NOT_1.
+    :return: The profile bytes.
+    """
+    n = 2 if variant == VARIANT_N_NOT_1 else 1
+    curv = make_curv(n)
+    curv_size = 16 if variant == VARIANT_MIS_SIZED else 12 + 2 * n
+    # ICC.1:2022 Table 38 XYZType, D50 white point
+    wtpt = b"XYZ " + bytes(4) + (63190).to_bytes(4, "big") + (65536).to_bytes(4, "big") + (54061).to_bytes(4, "big")
+
+    tags = [(b"wtpt", wtpt, len(wtpt))] + [(signature, curv, curv_size) for signature in TRC_SIGNATURES]
+    offset = box_parser.ICC_HEADER_LENGTH + 4 + box_parser.ICC_TAG_ENTRY_LENGTH * len(tags)
+    tag_table = len(tags).to_bytes(4, "big")
+    tag_data = b""
+    for signature, data, size in tags:
+        tag_table += signature + (offset + len(tag_data)).to_bytes(4, "big") + size.to_bytes(4, "big")
+        tag_data += data
+
+    profile_size = box_parser.ICC_HEADER_LENGTH + len(tag_table) + len(tag_data)
+    # ICC.1:2022 Table 17 profile header: size, CMM, version, class, colour space, PCS
+    header = (
+        profile_size.to_bytes(4, "big") + bytes(4) + bytes([4, 0x20, 0, 0])
+        + b"mntr" + b"RGB " + b"XYZ " + bytes(12) + b"acsp"
+    )
+    header += bytes(box_parser.ICC_HEADER_LENGTH - len(header))
+    return header + tag_table + tag_data
+
+
+def build_jp2(variant=VARIANT_CORRECT, size=DEFAULT_FILE_SIZE):
+    """
+    Build a synthetic JP2 file with the boxes read by BoxReader.
+    The codestream is a placeholder padded to the requested size, so files
+    parse and remediate like real ones but do not pass jpylyzer validation.
+    :param variant: One of VARIANTS.
+    :param size: Approximate file size in bytes, never less than the header.
+    :return: The file bytes.
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown corpus variant: {variant}")
+    signature = make_box(b"jP  ", b"\x0d\x0a\x87\x0a")
+    ftyp = make_box(b"ftyp", b"jp2 " + bytes(4) + b"jp2 ")
+    # ISO/IEC 15444-1:2019(E) Section I.5.3.1 ihdr: height, width, components, bpc, C, UnkC, IPR
+    ihdr = make_box(b"ihdr", (64).to_bytes(4, "big") * 2 + (3).to_bytes(2, "big") + bytes([7, 7, 0, 0]))
+    if variant == VARIANT_METH1:
+        colr = make_box(box_parser.COLR, bytes([1, 0, 0]) + ENUMCS_SRGB.to_bytes(4, "big"))
+    else:
+        colr = make_box(box_parser.COLR, bytes([2, 0, 0]) + make_icc_profile(variant))
+    header = signature + ftyp + make_box(box_parser.JP2H, ihdr + colr)
+
+    # SOC marker, zero padding and EOC marker
+    codestream_length = max(size - len(header) - 8, 4)
+    codestream = b"\xff\x4f" + bytes(codestream_length - 4) + b"\xff\xd9"
+    return header + make_box(box_parser.JP2C, codestream)
+
+
+def generate_corpus(directory, count, size=DEFAULT_FILE_SIZE, variants=VARIANTS):
+    """
+    Write count synthetic JP2 files to a directory, cycling through the variants.
+    :param directory: Output directory, created if missing.
+    :param count: Number of files to write.
+    :param size: Approximate size of each file in bytes.
+    :param variants: Variants to cycle through.
+    :return: List of the written file paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    contents = {variant: build_jp2(variant, size) for variant in variants}
+    paths = []
+    for index in range(count):
+        variant = variants[index % len(variants)]
+        path = os.path.join(directory, f"{index:06d}_{variant}.jp2")
+        with open(path, "wb") as file:
+            file.write(contents[variant])
+        paths.append(path)
+    return paths
@@ -0,0 +1,50 @@
+import threading
+from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.buffer_reader import BUFFER_NAME, BUFFER_TYPES
+
+
+class RemediationEngine:
+    """
+    Long-lived remediation engine for processes handling many files. Readers are configured
+    once by the factory and reused for every file, one per thread, instead of being
+    constructed per file with their logger adapter, validation policy and cache.
+    """
+
+    __slots__ = ("factory", "_local")
+
+    def __init__(self, factory=None):
+        """
+        Create an engine.
+        :param factory: BoxReaderFactory configuring the readers, a default BoxReaderFactory if None.
+        """
+        self.factory = factory if factory is not None else BoxReaderFactory()
+        self._local = threading.local()
+
+    def process(self, source, name=BUFFER_NAME):
+        """
+        Remediate a JP2 file with the reader of the calling thread, or a JP2 buffer.
+        :param source: Path of the JP2 file, or bytes, bytearray, memoryview or a binary file object,
+            see process_buffer.
+        :param name: Name of a buffer in log messages and in its RemediationResult.
+        :return: RemediationResult of the file.
+        """
+        if isinstance(source, BUFFER_TYPES) or hasattr(source, "read"):
+            return self.process_buffer(source, name)[0]
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            # The first file of a thread creates its reader
+            reader = self._local.reader = self.factory.get_reader(source)
+        else:
+            reader.load(source)
+        return reader.read_jp2_file()
+
+    def process_buffer(self, source, name=BUFFER_NAME):
+        """
+        Remediate JP2 bytes in memory or a file object without touching the filesystem.
+        :param source: bytes, bytearray or memoryview of the whole file, or a binary file object.
+        :param name: Name of the buffer in log messages and in its RemediationResult.
+        :return: (RemediationResult, patches) tuple, see buffer_reader.remediate.
+        """
+        reader = self.factory.get_buffer_reader(source, name)
+        result = reader.read_jp2_file()
+        return result, reader.patches
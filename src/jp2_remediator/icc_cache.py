@@ -0,0 +1,105 @@
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+
+# Default number of distinct ICC profiles kept in memory
+DEFAULT_CACHE_SIZE = 1024
+# Personalizes the profile hash, changed whenever the analysis format changes so older persisted analyses are ignored
+ANALYSIS_VERSION = b"tag-table-v2"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trc_analysis (
+    profile_hash TEXT PRIMARY KEY,
+    analysis TEXT NOT NULL
+)
+"""
+
+
+class TrcAnalysisCache:
+    """
+    LRU cache of TRC tag analyses keyed by a hash of the ICC profile bytes,
+    optionally backed by a SQLite file shared between runs and worker processes.
+
+    An analysis is a dictionary with the 'trc_tags' values, the 'findings' to log again,
+    as [kind, values...] lists, and the 'patches' to apply, as [offset relative to the
+    profile, hex bytes] pairs.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, path=None):
+        """
+        Create a cache.
+        :param maxsize: Maximum number of analyses kept in memory.
+        :param path: Optional path of a SQLite file persisting the analyses.
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def __getstate__(self):
+        # Worker processes receive an empty cache and open their own connection
+        return {"maxsize": self.maxsize, "path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def key(profile):
+        """Return the cache key of the ICC profile bytes."""
+        return hashlib.blake2b(profile, digest_size=16, person=ANALYSIS_VERSION).hexdigest()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(_SCHEMA)
+            self._connection.commit()
+        return self._connection
+
+    def _remember(self, key, analysis):
+        self._entries[key] = analysis
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached analysis for a profile key, or None."""
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is not None:
+                self._entries.move_to_end(key)
+            elif self.path is not None:
+                row = self._connect().execute(
+                    "SELECT analysis FROM trc_analysis WHERE profile_hash = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    analysis = json.loads(row[0])
+                    self._remember(key, analysis)
+            if analysis is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return analysis
+
+    def put(self, key, analysis):
+        """Cache the analysis of a profile key, persisting it when a path is set."""
+        with self._lock:
+            self._remember(key, analysis)
+            if self.path is not None:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO trc_analysis VALUES (?, ?)", (key, json.dumps(analysis))
+                )
+                connection.commit()
+
+    def close(self):
+        """Close the SQLite file, if one is open."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -1,44 +1,264 @@
 import argparse
+import contextlib
+import datetime
+import sys
+from jp2_remediator import buffer_reader
+from jp2_remediator.box_reader import (
+    COPY_CHUNK_SIZE, VALIDATION_FULL, VALIDATION_FULL_ON_MODIFY, VALIDATION_HEADER_ONLY, VALIDATION_POLICIES
+)
 from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.checkpoint import CheckpointStore
+from jp2_remediator.icc_cache import DEFAULT_CACHE_SIZE, TrcAnalysisCache
+from jp2_remediator.manifest import DeadLetterWriter, read_manifest
+from jp2_remediator.metrics import Metrics
 from jp2_remediator.processor import Processor
+from jp2_remediator.report import REPORT_FORMATS, ReportWriter
+from jp2_remediator.scanner import DEFAULT_EXTENSIONS, DirectoryScanner, parse_shard
+from jp2_remediator.throttle import DEFAULT_REQUEST_RATE
+
+# Validation policies reading the whole file, which the async engine does not download
+FULL_VALIDATION_POLICIES = (VALIDATION_FULL, VALIDATION_FULL_ON_MODIFY)
+
+
+def shard_argument(text):
+    """Parse a --shard i/N argument."""
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def timestamp_argument(text):
+    """Parse an ISO 8601 date or date and time argument into a POSIX timestamp."""
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid ISO 8601 date or date and time: {text}")
+
+
+def directory_scanner(args):
+    """Create the DirectoryScanner described by the directory subcommand arguments."""
+    return DirectoryScanner(
+        extensions=args.extensions, include=args.include, exclude=args.exclude,
+        min_size=args.min_size, max_size=args.max_size,
+        modified_after=args.modified_after, modified_before=args.modified_before, shard=args.shard,
+    )
+
+
+def process_manifest(processor, args):
+    """Stream the manifest file or stdin into the processor."""
+    with open(args.manifest, encoding="utf-8") if args.manifest != "-" else contextlib.nullcontext(sys.stdin) as file:
+        processor.process_manifest(
+            read_manifest(file),
+            download_workers=args.download_workers,
+            process_workers=args.process_workers,
+            upload_workers=args.upload_workers,
+            queue_size=args.queue_size,
+            ranged=args.ranged,
+            async_engine=args.async_engine,
+            concurrency=args.concurrency,
+            per_host_limit=args.per_host_limit,
+            endpoint_url=args.endpoint_url,
+            max_request_rate=args.max_request_rate,
+            max_attempts=args.max_attempts,
+        )
+
+
+def process_stream(args):
+    """
+    Remediate a JP2 from stdin to stdout, reporting the outcome on stderr.
+    :return: Exit status, 1 if the input could not be read.
+    """
+    result = buffer_reader.remediate_stream(
+        sys.stdin.buffer, sys.stdout.buffer, name="<stdin>", validation=args.validation, chunk_size=args.chunk_size
+    )
+    if args.report:
+        with ReportWriter(args.report, args.report_format) as report:
+            report.write(result)
+    if result.error is not None:
+        print(f"Error processing stream: {result.error}", file=sys.stderr)
+        return 1
+    print(f"Stream {result.action}, {result.bytes_read} byte(s) copied", file=sys.stderr)
+    return 0
 
 
 def main():
     """Main entry point for the JP2 file processor."""
-    processor = Processor(BoxReaderFactory())
+    processor = None
 
     parser = argparse.ArgumentParser(description="JP2 file processor")
 
+    # Options shared by all input sources
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument(
+        "--header-only", action="store_true",
+        help="Read only the JP2 header boxes into memory instead of the whole file"
+    )
+    common_parser.add_argument(
+        "--mmap", action="store_true",
+        help="Memory-map whole files instead of reading them into memory, copying only the header boxes"
+    )
+    common_parser.add_argument(
+        "--validation", choices=VALIDATION_POLICIES, default=VALIDATION_FULL,
+        help="jpylyzer validation: none, header-only (boxes up to jp2h), full (default), "
+             "or full-on-modify (full validation only for files that get rewritten)"
+    )
+    common_parser.add_argument(
+        "--dry-run", "--audit", dest="dry_run", action="store_true",
+        help="Audit files from their header boxes only: report counts and the files that would be modified, "
+             "without writing or uploading anything (full validation is reduced to header-only)"
+    )
+    common_parser.add_argument(
+        "--report", help="Write one result record per file to this JSONL or CSV report (optional)"
+    )
+    common_parser.add_argument(
+        "--report-format", choices=REPORT_FORMATS,
+        help="Report format, inferred from the --report file extension by default"
+    )
+    common_parser.add_argument(
+        "--icc-cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+        help=f"Number of distinct ICC profile analyses cached in memory per process "
+             f"(default: {DEFAULT_CACHE_SIZE}, 0 disables the cache)"
+    )
+    common_parser.add_argument(
+        "--icc-cache", help="Persist ICC profile analyses in this SQLite file, shared between runs (optional)"
+    )
+    common_parser.add_argument(
+        "--checkpoint", help="Record the outcome of every file in this SQLite checkpoint store (optional)"
+    )
+    common_parser.add_argument(
+        "--resume", action="store_true",
+        help="Skip files the --checkpoint store records as processed with the same size and mtime or ETag"
+    )
+    common_parser.add_argument(
+        "--dead-letter",
+        help="Write the files that failed to this JSONL manifest, to process them again with the manifest "
+             "subcommand (optional)"
+    )
+    common_parser.add_argument(
+        "--metrics", action="store_true",
+        help="Print an end-of-run summary of counts, bytes read and per-stage timings"
+    )
+    common_parser.add_argument(
+        "--metrics-file", help="Write metrics in the Prometheus text format to this file at the end of the run"
+    )
+    common_parser.add_argument(
+        "--metrics-port", type=int,
+        help="Serve metrics in the Prometheus text format on this local port while the run lasts"
+    )
+
+    # Options for input sources on the local filesystem
+    local_parser = argparse.ArgumentParser(add_help=False)
+    local_parser.add_argument(
+        "--in-place", action="store_true",
+        help="Patch changed bytes into the original file (journaled) instead of writing a _modified_ copy"
+    )
+    local_parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of worker processes (default: 1, process files one at a time)"
+    )
+
+    # Options for S3 input sources
+    s3_parser = argparse.ArgumentParser(add_help=False)
+    s3_parser.add_argument(
+        "--ranged", action="store_true",
+        help="Fetch only the JP2 header of each object with HTTP Range requests instead of downloading it"
+    )
+    s3_parser.add_argument(
+        "--download-workers", type=int, default=8, help="Number of concurrent downloads (default: 8)"
+    )
+    s3_parser.add_argument(
+        "--process-workers", type=int, default=4, help="Number of files processed concurrently (default: 4)"
+    )
+    s3_parser.add_argument(
+        "--upload-workers", type=int, default=8, help="Number of concurrent uploads (default: 8)"
+    )
+    s3_parser.add_argument(
+        "--queue-size", type=int, default=64,
+        help="Maximum number of objects waiting between two pipeline stages (default: 64)"
+    )
+    s3_parser.add_argument(
+        "--max-request-rate", type=float, default=DEFAULT_REQUEST_RATE,
+        help=f"Maximum S3 requests per second, halved while S3 throttles and slowly restored "
+             f"(default: {DEFAULT_REQUEST_RATE:g}, 0 for no limit)"
+    )
+    s3_parser.add_argument(
+        "--max-attempts", type=int, default=8,
+        help="Attempts per S3 request on throttling, server and network errors, with jittered backoff (default: 8)"
+    )
+    s3_parser.add_argument(
+        "--async", dest="async_engine", action="store_true",
+        help="Use the asyncio engine for ranged header reads and writes (requires aiobotocore, "
+             "--validation none or header-only)"
+    )
+    s3_parser.add_argument(
+        "--concurrency", type=int, default=256,
+        help="Number of objects processed concurrently by the asyncio engine (default: 256)"
+    )
+    s3_parser.add_argument(
+        "--per-host-limit", type=int, default=64,
+        help="Maximum S3 requests in flight per bucket endpoint with --async (default: 64)"
+    )
+    s3_parser.add_argument(
+        "--endpoint-url", help="S3 endpoint for --async, e.g. a local moto server (optional)"
+    )
+
     # Create mutually exclusive subparsers for specifying input source
     subparsers = parser.add_subparsers(
         title="Input source", dest="input_source"
     )
 
-    # Subparser for processing a single JP2 file
+    # Subparser for processing one or more JP2 files
     file_parser = subparsers.add_parser(
-        "file", help="Process a single JP2 file"
+        "file", help="Process one or more JP2 files", parents=[common_parser, local_parser]
     )
     file_parser.add_argument(
-        "file", help="Path to a single JP2 file to process"
+        "file", nargs="+", help="Path to one or more JP2 files to process"
     )
     file_parser.set_defaults(
-        func=lambda args: processor.process_file(args.file)
+        func=lambda args: processor.process_files(args.file)
     )
 
     # Subparser for processing all JP2 files in a directory
     directory_parser = subparsers.add_parser(
-        "directory", help="Process all JP2 files in a directory"
+        "directory", help="Process all JP2 files in a directory", parents=[common_parser, local_parser]
     )
     directory_parser.add_argument(
         "directory", help="Path to a directory of JP2 files to process"
     )
+    directory_parser.add_argument(
+        "--extensions", nargs="+", default=list(DEFAULT_EXTENSIONS),
+        help="File extensions to process, e.g. .jp2 .jpx .jpf (default: .jp2)"
+    )
+    directory_parser.add_argument(
+        "--include", action="append", default=[],
+        help="Only process files whose relative path or name matches this glob (repeatable)"
+    )
+    directory_parser.add_argument(
+        "--exclude", action="append", default=[],
+        help="Skip files and directories whose relative path or name matches this glob (repeatable)"
+    )
+    directory_parser.add_argument("--min-size", type=int, help="Minimum file size in bytes")
+    directory_parser.add_argument("--max-size", type=int, help="Maximum file size in bytes")
+    directory_parser.add_argument(
+        "--modified-after", type=timestamp_argument,
+        help="Only process files modified at or after this ISO 8601 date or date and time"
+    )
+    directory_parser.add_argument(
+        "--modified-before", type=timestamp_argument,
+        help="Only process files modified before this ISO 8601 date or date and time"
+    )
+    directory_parser.add_argument(
+        "--shard", type=shard_argument,
+        help="Process only shard i of N (0 <= i < N), a disjoint, deterministic slice of the tree by relative path"
+    )
     directory_parser.set_defaults(
-        func=lambda args: processor.process_directory(args.directory)
+        func=lambda args: processor.process_directory(args.directory, directory_scanner(args))
     )
 
     # Subparser for processing all JP2 files in an S3 bucket
     bucket_parser = subparsers.add_parser(
-        "bucket", help="Process all JP2 files in an S3 bucket"
+        "bucket", help="Process all JP2 files in an S3 bucket", parents=[common_parser, s3_parser]
     )
     bucket_parser.add_argument(
         "bucket", help="Name of the AWS S3 bucket to process JP2 files from"
@@ -47,14 +267,106 @@ def main():
         "--prefix", help="Prefix of files in the AWS S3 bucket (optional)",
         default=""
     )
+    bucket_parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of worker processes for the processing stage (default: 1, processing in threads)"
+    )
     bucket_parser.set_defaults(
-        func=lambda args: processor.process_s3_bucket(args.bucket, args.prefix)
+        func=lambda args: processor.process_s3_bucket(
+            args.bucket, args.prefix,
+            download_workers=args.download_workers,
+            process_workers=args.process_workers,
+            upload_workers=args.upload_workers,
+            queue_size=args.queue_size,
+            ranged=args.ranged,
+            async_engine=args.async_engine,
+            concurrency=args.concurrency,
+            per_host_limit=args.per_host_limit,
+            endpoint_url=args.endpoint_url,
+            max_request_rate=args.max_request_rate,
+            max_attempts=args.max_attempts,
+        ),
+        in_place=False
+    )
+
+    # Subparser for processing the files listed in a manifest
+    manifest_parser = subparsers.add_parser(
+        "manifest", help="Process the JP2 files or s3:// URIs listed in a manifest",
+        parents=[common_parser, local_parser, s3_parser]
+    )
+    manifest_parser.add_argument(
+        "manifest", nargs="?", default="-",
+        help="Manifest file with one path or s3:// URI per line, or JSON objects with a 'path' "
+             "and optional 'size' and 'etag' (default: - for stdin)"
+    )
+    manifest_parser.set_defaults(
+        func=lambda args: process_manifest(processor, args)
+    )
+
+    # Subparser for remediating a JP2 piped through stdin and stdout
+    stream_parser = subparsers.add_parser(
+        "stream", help="Remediate a JP2 read from stdin and write it to stdout, buffering only the header boxes"
+    )
+    stream_parser.add_argument(
+        "--validation", choices=buffer_reader.STREAM_VALIDATION_POLICIES, default=VALIDATION_HEADER_ONLY,
+        help="jpylyzer validation: none or header-only (default), full validation would buffer the whole file"
+    )
+    stream_parser.add_argument(
+        "--chunk-size", type=int, default=COPY_CHUNK_SIZE,
+        help=f"Size of the chunks copied after the header boxes (default: {COPY_CHUNK_SIZE})"
+    )
+    stream_parser.add_argument("--report", help="Write the result record to this JSONL or CSV report (optional)")
+    stream_parser.add_argument(
+        "--report-format", choices=REPORT_FORMATS,
+        help="Report format, inferred from the --report file extension by default"
     )
 
     args = parser.parse_args()
 
-    if hasattr(args, "func"):
-        args.func(args)
+    if args.input_source == "stream":
+        # stdout carries the image, the other subcommands' output and options do not apply
+        sys.exit(process_stream(args))
+    elif hasattr(args, "func"):
+        if args.resume and not args.checkpoint:
+            parser.error("--resume requires --checkpoint")
+        if getattr(args, "async_engine", False) and not args.dry_run and args.validation in FULL_VALIDATION_POLICIES:
+            parser.error("--async requires --validation none or header-only")
+        checkpoint = CheckpointStore(args.checkpoint, resume=args.resume) if args.checkpoint else None
+        report = ReportWriter(args.report, args.report_format) if args.report else None
+        dead_letter = DeadLetterWriter(args.dead_letter) if args.dead_letter else None
+        metrics = None
+        if args.metrics or args.metrics_file or args.metrics_port is not None:
+            metrics = Metrics()
+            if args.metrics_port is not None:
+                metrics.serve(args.metrics_port)
+        trc_cache = None
+        if args.icc_cache_size > 0:
+            trc_cache = TrcAnalysisCache(args.icc_cache_size, args.icc_cache)
+        processor = Processor(BoxReaderFactory(
+            header_only=args.header_only, in_place=args.in_place, validation=args.validation, trc_cache=trc_cache,
+            dry_run=args.dry_run, memory_map=args.mmap
+        ), workers=args.workers, report=report, metrics=metrics, checkpoint=checkpoint, dead_letter=dead_letter)
+        try:
+            args.func(args)
+        finally:
+            if args.dry_run:
+                print(processor.audit_summary())
+            if report is not None:
+                report.close()
+            if dead_letter is not None:
+                dead_letter.close()
+                if dead_letter.count:
+                    print(f"Wrote {dead_letter.count} failed file(s) to {dead_letter.path}")
+            if checkpoint is not None:
+                checkpoint.close()
+            if trc_cache is not None:
+                trc_cache.close()
+            if metrics is not None:
+                if args.metrics:
+                    print(metrics.summary())
+                if args.metrics_file:
+                    metrics.write(args.metrics_file)
+                metrics.close()
     else:
         parser.print_help()
 
@@ -0,0 +1,80 @@
+import json
+import threading
+from typing import NamedTuple
+
+S3_SCHEME = "s3://"
+
+
+class ManifestEntry(NamedTuple):
+    """A file path or s3:// URI from a manifest, with the object size and ETag if known."""
+    path: str
+    size: int | None = None
+    etag: str | None = None
+
+
+def parse_s3_uri(uri):
+    """
+    Split an s3://bucket/key URI.
+    :return: (bucket, key) tuple.
+    :raises ValueError: If the URI has no bucket or key.
+    """
+    bucket, _, key = uri[len(S3_SCHEME):].partition("/")
+    if not uri.startswith(S3_SCHEME) or not bucket or not key:
+        raise ValueError(f"Invalid S3 URI: {uri}")
+    return bucket, key
+
+
+def read_manifest(lines):
+    """
+    Lazily parse manifest lines into ManifestEntry tuples.
+    A line is either a plain path or s3:// URI, or a JSON object with a 'path' and
+    optionally the 'size' and 'etag' of the object, used by checkpoint stores.
+    Blank lines and lines starting with '#' are skipped, malformed lines are reported and skipped.
+    :param lines: Iterable of lines, e.g. an open manifest file or sys.stdin.
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if not line.startswith("{"):
+            yield ManifestEntry(line)
+            continue
+        try:
+            record = json.loads(line)
+            yield ManifestEntry(record["path"], record.get("size"), record.get("etag"))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error reading manifest line {line_number}: {type(e).__name__}: {e}")
+
+
+class DeadLetterWriter:
+    """
+    Streams the files and objects that failed to a JSON Lines manifest, which the
+    manifest subcommand processes again, e.g. once S3 stops throttling.
+    """
+
+    def __init__(self, path):
+        """
+        Open the dead-letter manifest, replacing any earlier one.
+        :param path: Path of the manifest, not the manifest being processed.
+        """
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, result):
+        """Write the path or S3 URI of a failed RemediationResult with its error, safe to call from several threads."""
+        line = json.dumps({"path": result.file_path, "error": result.error}, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,91 @@
+import mmap
+import os
+from jp2_remediator import box_parser
+from jp2_remediator import patcher
+from jp2_remediator.box_reader import BoxReader, VALIDATION_FULL, VALIDATOR_OPTIONS, modified_file_path
+
+
+class MappedBoxReader(BoxReader):
+    """
+    BoxReader over a read-only memory map of the whole file. Boxes are located through
+    memoryview slices, only the header boxes are copied to be patched, and changes are
+    kept as a list of patches instead of a second copy of the file.
+    """
+
+    def __init__(self, file_path, in_place=False, validation=VALIDATION_FULL, trc_cache=None):
+        """
+        Map a file for reading.
+        :param file_path: Path of the JP2 file.
+        :param in_place: Patch changed bytes into the original file instead of writing a copy.
+        :param validation: jpylyzer validation policy, full validation reads the map without copying it.
+        :param trc_cache: Optional TrcAnalysisCache shared by readers.
+        """
+        self._mmap = None
+        super().__init__(file_path, in_place=in_place, validation=validation, trc_cache=trc_cache)
+
+    def load(self, file_path):
+        # Releases the map of the previous file before mapping the next one.
+        self.close()
+        self.patches = []
+        super().load(file_path)
+
+    def read_file(self, file_path):
+        # Maps the file and returns a memoryview of the map, empty files cannot be mapped.
+        try:
+            with open(file_path, "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return b""
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, ValueError) as e:
+            self.logger.error(f"Error reading file {file_path}: {e}")
+            return None
+        return memoryview(self._mmap)
+
+    def initialize_validator(self):
+        # jpylyzer slices the map itself, so the whole file is never copied.
+        from jpylyzer import boxvalidator
+        self.validator = boxvalidator.BoxValidator(VALIDATOR_OPTIONS, "JP2", self._mmap)
+        self.validator.validate()
+        return self.validator
+
+    def editable_contents(self):
+        # Copies only the leading boxes up to 'jp2h', where the ICC profile lies.
+        return bytearray(self.file_contents[:box_parser.header_length_needed(self.file_contents)])
+
+    def contents_changed(self, new_file_contents):
+        # Collects the patches of the header copy, instead of comparing whole files.
+        self.patches = patcher.diff_patches(self.file_contents[:len(new_file_contents)], new_file_contents)
+        return bool(self.patches)
+
+    def write_modified_file(self, new_file_contents):
+        # Writes the patched header followed by the rest of the map, or patches the file in place.
+        # Returns the path written, or None if no changes were made.
+        if not self.patches:
+            self.logger.info(f"No modifications needed. No new file created: {self.file_path}")
+            return None
+        if self.in_place:
+            # The map is released before the file is written
+            self.close()
+            patcher.apply_in_place(self.file_path, self.patches)
+            self.logger.info(f"Patched {len(self.patches)} byte range(s) in place: {self.file_path}")
+            return self.file_path
+        new_file_path = modified_file_path(self.file_path)
+        with open(new_file_path, "wb") as new_file:
+            new_file.write(new_file_contents)
+            new_file.write(self.file_contents[len(new_file_contents):])
+        self.logger.info(f"New JP2 file created with modifications: {new_file_path}")
+        return new_file_path
+
+    def read_jp2_file(self):
+        # Processes the file and releases the map.
+        try:
+            return super().read_jp2_file()
+        finally:
+            self.close()
+
+    def close(self):
+        # Releases the memory map, file_contents cannot be read afterwards.
+        if self._mmap is not None:
+            self.file_contents.release()
+            self._mmap.close()
+            self._mmap = None
@@ -0,0 +1,143 @@
+import bisect
+import os
+import threading
+from jp2_remediator.result import S3_STAGES, STAGES
+
+METRIC_PREFIX = "jp2_remediator"
+# Upper bounds in seconds of the stage duration histogram buckets
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+ACTIONS = ("modified", "unchanged", "flagged", "error")
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Stage duration histogram with fixed bucket bounds."""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        # Observations per bucket, the last one counting values above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+
+class Metrics:
+    """
+    Run-wide counters and stage histograms, fed from the RemediationResult of every file.
+    Results carry their own stage timings, so results merged from worker processes are
+    counted too and nothing is measured when metrics are disabled.
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.files = {action: 0 for action in ACTIONS}
+        self.flagged = 0
+        self.bytes_read = 0
+        self.histograms = {stage: Histogram(buckets) for stage in STAGES + S3_STAGES}
+        self._server = None
+
+    def record(self, result):
+        """Count a RemediationResult and observe its stage timings."""
+        with self._lock:
+            self.files[result.action] += 1
+            self.flagged += result.flagged
+            self.bytes_read += result.bytes_read
+            for stage, seconds in result.timings.items():
+                if stage not in self.histograms:
+                    self.histograms[stage] = Histogram(self.buckets)
+                self.histograms[stage].observe(seconds)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                f"# HELP {METRIC_PREFIX}_files_total Files processed, by action taken.",
+                f"# TYPE {METRIC_PREFIX}_files_total counter",
+            ]
+            lines += [f'{METRIC_PREFIX}_files_total{{action="{action}"}} {count}'
+                      for action, count in self.files.items()]
+            lines += [
+                f"# HELP {METRIC_PREFIX}_files_flagged_total Files with a curv count n != 1, modified or not.",
+                f"# TYPE {METRIC_PREFIX}_files_flagged_total counter",
+                f"{METRIC_PREFIX}_files_flagged_total {self.flagged}",
+                f"# HELP {METRIC_PREFIX}_bytes_read_total Bytes read from files and objects.",
+                f"# TYPE {METRIC_PREFIX}_bytes_read_total counter",
+                f"{METRIC_PREFIX}_bytes_read_total {self.bytes_read}",
+                f"# HELP {METRIC_PREFIX}_stage_seconds Seconds spent per file in each stage.",
+                f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+            ]
+            for stage, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Return a human-readable end-of-run summary."""
+        with self._lock:
+            total = sum(self.files.values())
+            lines = [
+                f"Run summary: {total} file(s), {self.files['modified']} modified, "
+                f"{self.files['unchanged']} skipped (unchanged), {self.flagged} flagged for review, "
+                f"{self.files['error']} failed, {self.bytes_read / (1024 * 1024):.1f} MiB read"
+            ]
+            for stage, histogram in self.histograms.items():
+                if histogram.count:
+                    lines.append(
+                        f"  {stage:<9} {histogram.count:>8} x  total {histogram.sum:10.3f} s  "
+                        f"mean {histogram.sum / histogram.count * 1000:9.3f} ms  max {histogram.max * 1000:9.3f} ms"
+                    )
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Write the metrics to a Prometheus text file, replacing it atomically."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(self.render())
+        os.replace(temp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serve the metrics over HTTP from a background thread until close() is called.
+        :param port: Port to listen on, 0 picks a free port.
+        :param host: Address to bind, local only by default.
+        :return: The address the server listens on.
+        """
+        # Only runs serving metrics import the HTTP server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are not logged to stderr
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def close(self):
+        """Stop the HTTP server, if one is running."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
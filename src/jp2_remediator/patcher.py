@@ -0,0 +1,122 @@
+import json
+import os
+
+# Write-ahead journal kept next to a file while it is being patched in place
+JOURNAL_SUFFIX = ".jp2r-journal"
+# Buffers are compared chunk by chunk, only differing chunks are scanned byte by byte
+DIFF_CHUNK_SIZE = 4096
+
+
+def diff_patches(original, modified):
+    """
+    Collect the byte ranges that differ between two buffers of equal length.
+    :param original: Original file contents.
+    :param modified: Modified file contents.
+    :return: List of (offset, original bytes, new bytes) tuples.
+    """
+    if len(original) != len(modified):
+        raise ValueError("In-place patches cannot change the file length")
+
+    patches = []
+    start = None
+    for chunk_start in range(0, len(original), DIFF_CHUNK_SIZE):
+        chunk_end = min(chunk_start + DIFF_CHUNK_SIZE, len(original))
+        if original[chunk_start:chunk_end] == modified[chunk_start:chunk_end]:
+            # Whole chunk unchanged, compared at C speed
+            if start is not None:
+                patches.append((start, bytes(original[start:chunk_start]), bytes(modified[start:chunk_start])))
+                start = None
+            continue
+        for position in range(chunk_start, chunk_end):
+            differs = original[position] != modified[position]
+            if differs and start is None:
+                start = position
+            elif not differs and start is not None:
+                patches.append((start, bytes(original[start:position]), bytes(modified[start:position])))
+                start = None
+    if start is not None:
+        patches.append((start, bytes(original[start:]), bytes(modified[start:])))
+    return patches
+
+
+def journal_path_for(file_path):
+    return file_path + JOURNAL_SUFFIX
+
+
+def _fsync_directory(path):
+    # Persist the creation or removal of a directory entry (POSIX only)
+    if not hasattr(os, "O_DIRECTORY"):  # pragma: no cover
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_patches(file_path, patches, use_new):
+    with open(file_path, "r+b") as file:
+        for offset, original_bytes, new_bytes in patches:
+            file.seek(offset)
+            file.write(new_bytes if use_new else original_bytes)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def apply_in_place(file_path, patches):
+    """
+    Write patches directly into the file, guarded by a write-ahead journal.
+    The original bytes are journaled and fsynced before the file is touched,
+    so an interrupted patch can be rolled back with recover_in_place().
+    :param file_path: Path of the file to patch.
+    :param patches: List of (offset, original bytes, new bytes) tuples.
+    """
+    if not patches:
+        return
+
+    journal_path = journal_path_for(file_path)
+    journal = {
+        "patches": [
+            {"offset": offset, "original": original_bytes.hex(), "new": new_bytes.hex()}
+            for offset, original_bytes, new_bytes in patches
+        ]
+    }
+    with open(journal_path, "w") as journal_file:
+        json.dump(journal, journal_file)
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+    _fsync_directory(journal_path)
+
+    _write_patches(file_path, patches, use_new=True)
+
+    os.remove(journal_path)
+    _fsync_directory(journal_path)
+
+
+def recover_in_place(file_path):
+    """
+    Roll back an interrupted in-place patch using its write-ahead journal.
+    :param file_path: Path of the file that may have been left half-patched.
+    :return: True if a journal was found and the original bytes were restored.
+    """
+    journal_path = journal_path_for(file_path)
+    if not os.path.exists(journal_path):
+        return False
+
+    try:
+        with open(journal_path) as journal_file:
+            journal = json.load(journal_file)
+    except ValueError:
+        # The journal was not fully written, so the file was never touched
+        journal = {"patches": []}
+
+    patches = [
+        (patch["offset"], bytes.fromhex(patch["original"]), bytes.fromhex(patch["new"]))
+        for patch in journal["patches"]
+    ]
+    if patches:
+        _write_patches(file_path, patches, use_new=False)
+
+    os.remove(journal_path)
+    _fsync_directory(journal_path)
+    return True
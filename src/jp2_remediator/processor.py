@@ -1,55 +1,402 @@
-import datetime
-import os
-import boto3
+import collections
+import functools
+import itertools
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from jp2_remediator.box_reader import VALIDATION_HEADER_ONLY
+from jp2_remediator.buffer_reader import BUFFER_NAME
+from jp2_remediator.checkpoint import local_version
+from jp2_remediator.engine import RemediationEngine
+from jp2_remediator.manifest import S3_SCHEME, parse_s3_uri
+from jp2_remediator.result import RemediationResult
+from jp2_remediator.scanner import DirectoryScanner
+from jp2_remediator.throttle import DEFAULT_REQUEST_RATE, RateLimitedClient, TokenBucket
+
+# Remediation engine of a worker process, set once by _init_worker
+_worker_engine = None
+
+
+def _init_worker(factory):
+    """Create the remediation engine of a newly started worker process, reusing its readers for every file."""
+    global _worker_engine
+    _worker_engine = RemediationEngine(factory)
+
+
+def _process_chunk(file_paths):
+    """
+    Process a chunk of JP2 files in a worker process.
+    :return: List of (file_path, RemediationResult or None, error or None) tuples.
+    """
+    results = []
+    for file_path in file_paths:
+        print(f"Processing file: {file_path}")
+        try:
+            result = _worker_engine.process(file_path)
+        except Exception as e:
+            results.append((file_path, None, f"{type(e).__name__}: {e}"))
+        else:
+            results.append((file_path, result, None))
+    return results
+
+
+def _chunked(iterable, size):
+    """Yield lists of up to size items from an iterable, consuming it lazily."""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
 
 
 class Processor:
     """Class to process JP2 files."""
 
-    def __init__(self, factory):
-        """Initialize the Processor with a BoxReader factory."""
+    def __init__(self, factory, workers=1, chunksize=16, report=None, metrics=None, checkpoint=None,
+                 dead_letter=None):
+        """
+        Initialize the Processor with a BoxReader factory.
+        :param factory: BoxReader factory, must be picklable when workers > 1.
+        :param workers: Number of worker processes for file lists and directories.
+        :param chunksize: Number of files submitted to a worker process at a time.
+        :param report: Optional ReportWriter receiving the result of every file.
+        :param metrics: Optional Metrics counting the result of every file.
+        :param checkpoint: Optional CheckpointStore recording the outcome of every file,
+            and skipping files already processed when it resumes a run. Dry runs only skip files,
+            their outcomes are not recorded.
+        :param dead_letter: Optional DeadLetterWriter receiving every file that failed.
+        """
         self.box_reader_factory = factory
+        # Reuses the factory's readers for the files processed in this process
+        self.engine = RemediationEngine(factory)
+        self.workers = workers
+        self.chunksize = chunksize
+        self.report = report
+        self.metrics = metrics
+        self.checkpoint = checkpoint
+        self.dead_letter = dead_letter
+        # Results by action of a dry run, see audit_summary
+        self.audit = collections.Counter()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _record(self, result):
+        """Write a result to the run report, metrics and dead-letter manifest, if configured."""
+        if self.report is not None:
+            self.report.write(result)
+        if self.metrics is not None:
+            self.metrics.record(result)
+        if self.dead_letter is not None and result.error is not None:
+            self.dead_letter.write(result)
+        if self._dry_run():
+            with self._lock:
+                self.audit[result.action] += 1
+            if result.modified:
+                print(f"Would modify: {result.file_path}")
+
+    def _dry_run(self):
+        """Return True if the factory's readers only audit files."""
+        return getattr(self.box_reader_factory, "dry_run", False) is True
+
+    def audit_summary(self):
+        """Return the counts of a dry run."""
+        with self._lock:
+            return (
+                f"Dry run: {sum(self.audit.values())} file(s) audited, {self.audit['modified']} would be modified, "
+                f"{self.audit['flagged']} flagged for review, {self.audit['unchanged']} unchanged, "
+                f"{self.audit['error']} failed"
+            )
+
+    def _record_local(self, result):
+        """Record the result of a local file, including its checkpoint unless it was only audited."""
+        self._record(result)
+        if self.checkpoint is not None and not self._dry_run():
+            self.checkpoint.record_local(result)
+
+    def _unprocessed(self, file_paths):
+        """Yield the file paths the checkpoint store does not skip, stat-ing them lazily."""
+        for file_path in file_paths:
+            try:
+                key, size, version = local_version(file_path)
+            except OSError:
+                # Missing files are reported by the reader
+                yield file_path
+                continue
+            if not self.checkpoint.should_skip(key, size, version):
+                yield file_path
 
     def process_file(self, file_path):
-        """Process a single JP2 file."""
+        """Process a single JP2 file and return its RemediationResult."""
         print(f"Processing file: {file_path}")
-        reader = self.box_reader_factory.get_reader(file_path)
-        reader.read_jp2_file()
-
-    def process_directory(self, directory_path):
-        """Process all JP2 files in a given directory."""
-        for root, _, files in os.walk(directory_path):
-            for file in files:
-                if file.lower().endswith(".jp2"):
-                    file_path = os.path.join(root, file)
-                    print(f"Processing file: {file_path}")
-                    reader = self.box_reader_factory.get_reader(file_path)
-                    reader.read_jp2_file()
-
-    def process_s3_bucket(self, bucket_name, prefix=""):
-        """Process all JP2 files in a given S3 bucket."""
-        s3 = boto3.client("s3")
-        response = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-
-        if "Contents" in response:
-            for obj in response["Contents"]:
-                if obj["Key"].lower().endswith(".jp2"):
-                    file_path = obj["Key"]
-                    print(f"""Processing file: {file_path} from bucket {
-                        bucket_name
-                        }""")
-                    download_path = f"/tmp/{os.path.basename(file_path)}"
-                    s3.download_file(bucket_name, file_path, download_path)
-                    reader = self.box_reader_factory.get_reader(download_path)
-                    reader.read_jp2_file()
-                    # Optionally, upload modified file back to S3
-                    timestamp = datetime.datetime.now().strftime(
-                        "%Y%m%d"
-                    )  # use "%Y%m%d_%H%M%S" for more precision
-                    s3.upload_file(
-                        download_path.replace(
-                            ".jp2", f"_modified_{timestamp}.jp2"
-                            ),
-                        bucket_name,
-                        file_path.replace(".jp2", f"_modified_{timestamp}.jp2")
-                    )
+        result = self.engine.process(file_path)
+        self._record_local(result)
+        return result
+
+    def process_buffer(self, source, name=BUFFER_NAME):
+        """
+        Remediate JP2 bytes in memory or a file object, e.g. an upload, without touching the filesystem.
+        :param source: bytes, bytearray or memoryview of the whole file, or a binary file object.
+        :param name: Name of the buffer in log messages, reports and metrics.
+        :return: (RemediationResult, patches) tuple, see buffer_reader.remediate and buffer_reader.apply_patches.
+        """
+        result, patches = self.engine.process_buffer(source, name)
+        self._record(result)
+        return result, patches
+
+    def process_files(self, file_paths):
+        """Process an iterable of JP2 file paths, in a process pool when workers > 1."""
+        if self.checkpoint is not None:
+            file_paths = self._unprocessed(file_paths)
+        self._process_paths(file_paths)
+
+    def _process_paths(self, file_paths):
+        """Process JP2 file paths that passed the checkpoint store, if any."""
+        if self.workers > 1:
+            self._process_in_pool(file_paths)
+        else:
+            for file_path in file_paths:
+                try:
+                    self.process_file(file_path)
+                except Exception as e:
+                    # A failing file is reported and recorded like in the pool, the run goes on
+                    error = f"{type(e).__name__}: {e}"
+                    print(f"Error processing file: {file_path}: {error}")
+                    self._record_local(RemediationResult(file_path, error=error))
+        if self.checkpoint is not None and self.checkpoint.skipped:
+            print(f"Skipped {self.checkpoint.skipped} file(s) already processed")
+
+    def _process_in_pool(self, file_paths):
+        """Process JP2 files in chunks across worker processes, bounding the chunks in flight."""
+        processed = 0
+        failed = []
+
+        def merge(done):
+            nonlocal processed
+            for future in done:
+                for file_path, result, error in future.result():
+                    processed += 1
+                    if error is not None:
+                        failed.append(file_path)
+                        print(f"Error processing file: {file_path}: {error}")
+                        result = RemediationResult(file_path, error=error)
+                    self._record_local(result)
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.box_reader_factory,)
+        ) as executor:
+            pending = set()
+            for chunk in _chunked(file_paths, self.chunksize):
+                pending.add(executor.submit(_process_chunk, chunk))
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    merge(done)
+            merge(wait(pending).done)
+
+        print(f"Processed {processed} file(s) with {self.workers} workers, {len(failed)} failed")
+
+    def process_directory(self, directory_path, scanner=None):
+        """
+        Process all JP2 files in a given directory, while the directory tree is scanned.
+        :param directory_path: Path of the directory.
+        :param scanner: DirectoryScanner filtering and sharding the files, all .jp2 files by default.
+        """
+        entries = (scanner or DirectoryScanner()).scan(directory_path)
+        if self.checkpoint is not None:
+            self._process_paths(self._unprocessed_entries(entries))
+        else:
+            self._process_paths(entry.path for entry in entries)
+
+    def _unprocessed_entries(self, entries):
+        """Yield the paths of scanned entries the checkpoint store does not skip, reusing their stat results."""
+        for entry in entries:
+            try:
+                key, size, version = local_version(entry.path, entry.stat())
+            except OSError:
+                # Files removed since the scan are reported by the reader
+                yield entry.path
+                continue
+            if not self.checkpoint.should_skip(key, size, version):
+                yield entry.path
+
+    def process_s3_bucket(self, bucket_name, prefix="", download_workers=8, process_workers=4,
+                          upload_workers=8, queue_size=64, ranged=False, async_engine=False, concurrency=256,
+                          per_host_limit=64, endpoint_url=None, max_request_rate=DEFAULT_REQUEST_RATE,
+                          max_attempts=8, s3_client=None):
+        """
+        Process all JP2 files in a given S3 bucket.
+        Keys are listed page by page and flow through bounded download, process
+        and upload stages that share one S3 client.
+        With ranged, only the JP2 header of each object is fetched with Range
+        requests and modified objects are streamed back, without scratch files.
+        With async_engine, headers are read and modified objects written by the
+        asyncio AsyncS3Engine instead, which requires aiobotocore.
+        Dry runs always read headers with Range requests and never upload.
+        All requests of the pipeline share one token bucket, which halves the request
+        rate whenever S3 throttles, and transient errors are retried with jittered backoff.
+        :param concurrency: Number of objects processed concurrently by the async engine.
+        :param per_host_limit: Maximum requests in flight per bucket endpoint for the async engine.
+        :param endpoint_url: Optional S3 endpoint of the async engine, e.g. a local moto server.
+        :param max_request_rate: Maximum S3 requests per second of the pipeline, None for no limit.
+        :param max_attempts: Attempts per S3 request on throttling and transient errors.
+        :param s3_client: Optional S3 client of the threaded pipeline, a boto3 client by default.
+        :return: List of keys that failed.
+        """
+        return self._run_s3(
+            bucket_name, [prefix], None,
+            download_workers=download_workers, process_workers=process_workers, upload_workers=upload_workers,
+            queue_size=queue_size, ranged=ranged, async_engine=async_engine, concurrency=concurrency,
+            per_host_limit=per_host_limit, endpoint_url=endpoint_url, max_request_rate=max_request_rate,
+            max_attempts=max_attempts, s3_client=s3_client,
+        )
+
+    def process_manifest(self, entries, **s3_options):
+        """
+        Process the files of a manifest, without traversing directories or listing buckets.
+        The first entry decides whether the manifest holds local paths or s3:// URIs of one
+        bucket, entries of another kind or bucket are reported as failed. Local paths are
+        processed like process_files, S3 objects like process_s3_bucket.
+        :param entries: Iterable of ManifestEntry, consumed lazily.
+        :param s3_options: Keyword options of process_s3_bucket, used for S3 manifests.
+        """
+        entries = iter(entries)
+        for first in entries:
+            if not first.path.startswith(S3_SCHEME):
+                self.process_files(self._manifest_paths(itertools.chain([first], entries)))
+                return
+            if getattr(self.box_reader_factory, "in_place", False) is True:
+                # Downloaded copies patched in place would be uploaded over the original keys
+                print("In-place patching is not supported for S3 objects")
+                return
+            try:
+                bucket_name, _ = parse_s3_uri(first.path)
+            except ValueError as e:
+                self._reject(first.path, e)
+                continue
+            self._run_s3(
+                bucket_name, None, self._manifest_objects(itertools.chain([first], entries), bucket_name),
+                **s3_options
+            )
+            return
+        print("No entries to process in the manifest")
+
+    def _reject(self, path, error):
+        """Report a manifest entry that cannot be processed."""
+        print(f"Error processing file: {path}: {error}")
+        self._record(RemediationResult(path, error=str(error)))
+
+    def _manifest_paths(self, entries):
+        """Yield the local paths of manifest entries, rejecting S3 URIs."""
+        for entry in entries:
+            if entry.path.startswith(S3_SCHEME):
+                self._reject(entry.path, "S3 URI in a manifest of local paths")
+            else:
+                yield entry.path
+
+    def _manifest_objects(self, entries, bucket_name):
+        """Yield (key, size, ETag) of manifest entries in bucket_name, rejecting all others."""
+        for entry in entries:
+            try:
+                entry_bucket, key = parse_s3_uri(entry.path)
+            except ValueError as e:
+                self._reject(entry.path, e)
+                continue
+            if entry_bucket != bucket_name:
+                self._reject(entry.path, f"Object outside bucket {bucket_name}")
+                continue
+            yield key, entry.size, entry.etag
+
+    def _run_s3(self, bucket_name, prefixes, objects, download_workers=8, process_workers=4, upload_workers=8,
+                queue_size=64, ranged=False, async_engine=False, concurrency=256, per_host_limit=64,
+                endpoint_url=None, max_request_rate=DEFAULT_REQUEST_RATE, max_attempts=8, s3_client=None):
+        """
+        Run an S3Pipeline, or the AsyncS3Engine, over listed prefixes or given objects.
+        The pipeline processes in a process pool when workers > 1.
+        """
+        if self._dry_run():
+            # Audits need only the header of each object
+            ranged = True
+        if async_engine:
+            # asyncio and the engine are only imported by runs that use them
+            import asyncio
+            return asyncio.run(self._run_async_engine(
+                bucket_name, prefixes[0] if prefixes else "", objects, concurrency, per_host_limit, queue_size,
+                endpoint_url, max_attempts, TokenBucket(max_request_rate) if max_request_rate else None,
+            ))
+        from jp2_remediator.s3_pipeline import S3Pipeline
+        if s3_client is None:
+            # boto3 takes longer to import than processing a file, it is only imported by bucket runs
+            import boto3
+            from botocore.config import Config
+            s3_client = boto3.client("s3", config=Config(max_pool_connections=download_workers + upload_workers + 1))
+        s3 = RateLimitedClient(
+            s3_client,
+            TokenBucket(max_request_rate) if max_request_rate else None,
+            max_attempts=max_attempts,
+        )
+        pipeline = S3Pipeline(
+            s3, self._process_local_file,
+            download_workers=download_workers,
+            process_workers=process_workers,
+            upload_workers=upload_workers,
+            queue_size=queue_size,
+            process_key=functools.partial(self._process_s3_key, s3) if ranged else None,
+            on_result=self._record,
+            checkpoint=self.checkpoint,
+            dry_run=self._dry_run(),
+        )
+        if self.workers > 1 and not ranged:
+            with ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.box_reader_factory,)
+            ) as executor:
+                self._executor = executor
+                try:
+                    failed = pipeline.run(bucket_name, prefixes, objects)
+                finally:
+                    self._executor = None
+        else:
+            failed = pipeline.run(bucket_name, prefixes, objects)
+        if s3.retries:
+            throttled = s3.limiter.throttle_count if s3.limiter is not None else 0
+            print(f"Retried {s3.retries} S3 request(s), {throttled} throttled")
+        return failed
+
+    async def _run_async_engine(self, bucket_name, prefix, objects, concurrency, per_host_limit, queue_size,
+                                endpoint_url, max_attempts=8, limiter=None):
+        """
+        Run the AsyncS3Engine with a client whose connection pool matches the per-host limit,
+        its requests sharing the limiter's rate.
+        """
+        from jp2_remediator import s3_async
+        validation = self.box_reader_factory.validation
+        if self._dry_run() and validation not in s3_async.ASYNC_VALIDATION_POLICIES:
+            # Audits reduce full validation to the header boxes, as BoxReader does
+            validation = VALIDATION_HEADER_ONLY
+        async with s3_async.create_client(per_host_limit, endpoint_url) as client:
+            engine = s3_async.AsyncS3Engine(
+                client,
+                validation=validation,
+                trc_cache=self.box_reader_factory.trc_cache,
+                concurrency=concurrency,
+                per_host_limit=per_host_limit,
+                queue_size=queue_size,
+                max_attempts=max_attempts,
+                on_result=self._record,
+                checkpoint=self.checkpoint,
+                dry_run=self._dry_run(),
+                limiter=limiter,
+            )
+            failed = await engine.run(bucket_name, prefix, objects)
+        if engine.retries:
+            throttled = limiter.throttle_count if limiter is not None else 0
+            print(f"Retried {engine.retries} S3 request(s), {throttled} throttled")
+        return failed
+
+    def _process_s3_key(self, s3, bucket_name, key):
+        """Process a JP2 object in S3 from its ranged header reads."""
+        return self.box_reader_factory.get_s3_reader(s3, bucket_name, key).read_jp2_file()
+
+    def _process_local_file(self, file_path):
+        """Process a downloaded JP2 file, in the process pool when one is running."""
+        if self._executor is None:
+            return self.engine.process(file_path)
+        [(_, result, error)] = self._executor.submit(_process_chunk, [file_path]).result()
+        if error is not None:
+            raise RuntimeError(error)
+        return result
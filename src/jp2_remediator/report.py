@@ -0,0 +1,50 @@
+import csv
+import json
+import threading
+from jp2_remediator.result import REPORT_FIELDS
+
+REPORT_FORMATS = ("jsonl", "csv")
+# Write buffer of the report file, records are not flushed one by one
+REPORT_BUFFER_SIZE = 1024 * 1024
+
+
+class ReportWriter:
+    """Streams per-file RemediationResult records to a JSONL or CSV report."""
+
+    def __init__(self, path, report_format=None):
+        """
+        Open the report file.
+        :param path: Path of the report file.
+        :param report_format: 'jsonl' or 'csv', inferred from the file extension by default.
+        """
+        if report_format is None:
+            report_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {report_format}")
+        self.report_format = report_format
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w", buffering=REPORT_BUFFER_SIZE, newline="")
+        if report_format == "csv":
+            self._csv_writer = csv.DictWriter(self._file, fieldnames=REPORT_FIELDS)
+            self._csv_writer.writeheader()
+
+    def write(self, result):
+        """Write one RemediationResult, safe to call from several threads."""
+        record = result.to_record()
+        with self._lock:
+            if self.report_format == "csv":
+                self._csv_writer.writerow(record)
+            else:
+                self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
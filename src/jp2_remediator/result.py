@@ -0,0 +1,72 @@
+from dataclasses import dataclass, field
+
+# TRC tags reported per file, in report column order
+REPORT_TRC_TAGS = ("rTRC", "gTRC", "bTRC", "kTRC")
+
+# Timed stages of remediating a file, in processing order
+STAGES = ("read", "validate", "parse", "patch", "write")
+# Timed S3 transfers of the bucket pipeline, outside the reader
+S3_STAGES = ("download", "upload")
+
+# Columns of a flattened report record
+REPORT_FIELDS = (
+    ["file_path", "action", "modified", "output_path", "is_valid", "error", "bytes_read", "meth"]
+    + [f"{tag}_{key}" for tag in REPORT_TRC_TAGS for key in ("offset", "size", "n")]
+    + [f"{stage}_seconds" for stage in STAGES + S3_STAGES]
+)
+
+
+@dataclass(slots=True)
+class RemediationResult:
+    """Outcome of remediating one JP2 file or object, one instance is created per file."""
+    file_path: str
+    modified: bool = False
+    # Path or S3 URI of the written output, None when nothing was written
+    output_path: str | None = None
+    # jpylyzer validation outcome, None when the file was not validated
+    is_valid: bool | None = None
+    # Reason the file could not be processed
+    error: str | None = None
+    # 'meth' value of the 'colr' box
+    meth: int | None = None
+    # Tag table values per TRC tag name: {"offset": ..., "size": ..., "n": ...}, n is None for 'para' curves
+    trc_tags: dict = field(default_factory=dict)
+    # True when a curv count n != 1 or tag data outside the ICC profile was found, which needs review
+    flagged: bool = False
+    # Bytes read from the file or object, header reads, validation reads and copies included
+    bytes_read: int = 0
+    # Seconds spent per stage in STAGES: read, validate, box parse, TRC patch, write,
+    # and per S3 transfer in S3_STAGES for downloaded and uploaded objects
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def action(self):
+        """Action taken: error, modified, flagged or unchanged."""
+        if self.error is not None:
+            return "error"
+        if self.modified:
+            return "modified"
+        if self.flagged:
+            return "flagged"
+        return "unchanged"
+
+    def to_record(self):
+        """Flatten the result into a report record keyed by REPORT_FIELDS."""
+        record = {
+            "file_path": self.file_path,
+            "action": self.action,
+            "modified": self.modified,
+            "output_path": self.output_path,
+            "is_valid": self.is_valid,
+            "error": self.error,
+            "bytes_read": self.bytes_read,
+            "meth": self.meth,
+        }
+        for tag in REPORT_TRC_TAGS:
+            values = self.trc_tags.get(tag, {})
+            for key in ("offset", "size", "n"):
+                record[f"{tag}_{key}"] = values.get(key)
+        for stage in STAGES + S3_STAGES:
+            seconds = self.timings.get(stage)
+            record[f"{stage}_seconds"] = None if seconds is None else round(seconds, 6)
+        return record
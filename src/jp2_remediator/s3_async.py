@@ -0,0 +1,257 @@
+import asyncio
+import collections
+import contextlib
+from botocore.exceptions import ClientError
+from jp2_remediator import box_parser
+from jp2_remediator import buffer_reader
+from jp2_remediator.box_reader import HEADER_READ_SIZE, VALIDATION_HEADER_ONLY, VALIDATION_NONE, modified_file_path
+from jp2_remediator.result import RemediationResult
+from jp2_remediator.s3_reader import MAX_COPY_PART_SIZE, MIN_PART_SIZE
+from jp2_remediator.throttle import backoff_delay, is_retryable_error, is_throttling_error
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:  # aiobotocore is optional, only needed by the async engine
+    AioConfig = get_session = None
+
+# Validation policies that do not need the whole object
+ASYNC_VALIDATION_POLICIES = (VALIDATION_NONE, VALIDATION_HEADER_ONLY)
+
+
+@contextlib.asynccontextmanager
+async def create_client(max_pool_connections, endpoint_url=None):
+    """
+    Create an aiobotocore S3 client with a shared connection pool.
+    :param max_pool_connections: Size of the connection pool.
+    :param endpoint_url: Optional S3 endpoint, e.g. a local moto server.
+    """
+    if get_session is None:
+        raise ImportError("The async S3 engine requires aiobotocore: pip install aiobotocore")
+    config = AioConfig(max_pool_connections=max_pool_connections)
+    async with get_session().create_client("s3", endpoint_url=endpoint_url, config=config) as client:
+        yield client
+
+
+class AsyncS3Engine:
+    """asyncio S3 engine reading object headers with ranged GETs and writing only modified objects."""
+
+    def __init__(self, client, validation=VALIDATION_NONE, trc_cache=None, concurrency=256, per_host_limit=64,
+                 queue_size=1024, max_attempts=8, backoff_base=0.1, backoff_max=20.0, on_result=None,
+                 checkpoint=None, dry_run=False, limiter=None):
+        """
+        Initialize the engine.
+        :param client: aiobotocore S3 client, see create_client.
+        :param validation: 'none' or 'header-only', full validation would download every object.
+        :param trc_cache: Optional TrcAnalysisCache.
+        :param concurrency: Number of objects processed concurrently.
+        :param per_host_limit: Maximum S3 requests in flight per bucket endpoint.
+        :param queue_size: Maximum number of listed keys waiting to be processed.
+        :param max_attempts: Attempts per request on throttling, server and network errors.
+        :param backoff_base: First backoff delay in seconds, doubled per attempt, with full jitter.
+        :param backoff_max: Maximum backoff delay in seconds.
+        :param on_result: Callable receiving the RemediationResult of every object, failures included.
+        :param checkpoint: Optional CheckpointStore, see S3Pipeline.
+        :param dry_run: Audit object headers without writing modified objects or checkpoint records.
+        :param limiter: Optional TokenBucket shared by all requests, the request rate is not limited without one.
+        """
+        if validation not in ASYNC_VALIDATION_POLICIES:
+            raise ValueError(f"Validation policy not supported by the async engine: {validation}")
+        self.client = client
+        self.validation = validation
+        self.trc_cache = trc_cache
+        self.concurrency = concurrency
+        self.per_host_limit = per_host_limit
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_result = on_result
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self.limiter = limiter
+        self.retries = 0
+        self._host_limits = collections.defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        self.processed = 0
+        self.failed = []
+        self.failed_prefixes = []
+
+    async def run(self, bucket_name, prefix="", objects=None):
+        """
+        Process all JP2 objects under a prefix, or the given objects.
+        :param bucket_name: Name of the S3 bucket.
+        :param prefix: Prefix listed when no objects are given.
+        :param objects: Optional iterable of (key, size or None, ETag or None) tuples, processed instead of listing.
+        :return: List of keys that failed, a prefix that could not be listed is kept in failed_prefixes.
+        """
+        self.processed = 0
+        self.failed = []
+        self.failed_prefixes = []
+        keys = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.create_task(self._worker(bucket_name, keys)) for _ in range(self.concurrency)]
+        try:
+            listing = objects is None
+            objects = self._list(bucket_name, prefix) if listing else self._iterate(objects)
+            try:
+                async for key, size, etag in objects:
+                    if self.checkpoint is None or not self.checkpoint.should_skip(
+                        f"s3://{bucket_name}/{key}", size, etag
+                    ):
+                        await keys.put((key, size, etag))
+            except Exception as e:
+                if not listing:
+                    raise
+                # A listing failure is reported for the prefix, the objects listed so far are still processed
+                print(f"Error listing prefix '{prefix}' of bucket {bucket_name}: {type(e).__name__}: {e}")
+                self.failed_prefixes.append(prefix)
+            for _ in workers:
+                await keys.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        print(f"Processed {self.processed} object(s) from bucket {bucket_name}, {len(self.failed)} failed")
+        if self.failed_prefixes:
+            print(f"Could not list {len(self.failed_prefixes)} prefix(es) of bucket {bucket_name}")
+        return self.failed
+
+    async def _iterate(self, objects):
+        for item in objects:
+            yield item
+
+    async def _list(self, bucket_name, prefix):
+        # Pages are requested through _call, so a retry resumes at the failed page
+        kwargs = {}
+        while True:
+            page = await self._call(bucket_name, "list_objects_v2", Prefix=prefix, **kwargs)
+            for obj in page.get("Contents", []):
+                if obj["Key"].lower().endswith(".jp2"):
+                    yield obj["Key"], obj.get("Size"), obj.get("ETag")
+            if not page.get("IsTruncated") or page.get("NextContinuationToken") is None:
+                return
+            kwargs = {"ContinuationToken": page["NextContinuationToken"]}
+
+    async def _worker(self, bucket_name, keys):
+        while (item := await keys.get()) is not None:
+            key, size, etag = item
+            uri = f"s3://{bucket_name}/{key}"
+            try:
+                result = await self.process_key(bucket_name, key)
+            except Exception as e:
+                print(f"Error processing file: {key} from bucket {bucket_name}: {type(e).__name__}: {e}")
+                self.failed.append(key)
+                result = RemediationResult(uri, error=f"{type(e).__name__}: {e}")
+            else:
+                self.processed += 1
+            if self.checkpoint is not None and not self.dry_run:
+                self.checkpoint.record(uri, size, etag, result)
+            if self.on_result is not None:
+                self.on_result(result)
+
+    async def _call(self, bucket_name, operation, **kwargs):
+        # Calls a client operation within the rate and the bucket endpoint's limit, backing off on transient errors
+        for attempt in range(1, self.max_attempts + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire_async()
+            async with self._host_limits[bucket_name]:
+                try:
+                    response = await getattr(self.client, operation)(Bucket=bucket_name, **kwargs)
+                except Exception as e:
+                    if not is_retryable_error(e):
+                        raise
+                    if self.limiter is not None and isinstance(e, ClientError) and is_throttling_error(e):
+                        self.limiter.throttled()
+                    if attempt == self.max_attempts:
+                        raise
+                else:
+                    if self.limiter is not None:
+                        self.limiter.succeeded()
+                    return response
+            self.retries += 1
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+
+    async def _get_range(self, bucket_name, key, start, size, etag=None):
+        # Ranged GET of up to size bytes, returning the bytes, object size and ETag
+        kwargs = {"IfMatch": etag} if etag is not None else {}
+        response = await self._call(
+            bucket_name, "get_object", Key=key, Range=f"bytes={start}-{start + size - 1}", **kwargs
+        )
+        async with response["Body"] as body:
+            data = await body.read()
+        return data, int(response["ContentRange"].rsplit("/", 1)[1]), response.get("ETag")
+
+    async def read_header(self, bucket_name, key):
+        """
+        Read the leading bytes covering the 'jp2h' box with ranged GETs, growing the range as needed.
+        :return: (header bytes, object size, ETag) tuple.
+        """
+        data, object_size, etag = await self._get_range(bucket_name, key, 0, HEADER_READ_SIZE)
+        needed = box_parser.header_length_needed(data)
+        while needed > len(data) and len(data) < object_size:
+            chunk, _, _ = await self._get_range(
+                bucket_name, key, len(data), max(needed - len(data), HEADER_READ_SIZE), etag
+            )
+            if not chunk:
+                break
+            data += chunk
+            needed = box_parser.header_length_needed(data)
+        return data, object_size, etag
+
+    async def process_key(self, bucket_name, key):
+        """Remediate one object: read its header, patch it and write a modified copy if needed."""
+        header, object_size, etag = await self.read_header(bucket_name, key)
+        result, patches = buffer_reader.remediate(
+            header, f"s3://{bucket_name}/{key}", self.validation, self.trc_cache, self.dry_run
+        )
+        if patches and not self.dry_run:
+            new_key = modified_file_path(key)
+            head = buffer_reader.apply_patches(header, patches)
+            await self.write_object(bucket_name, key, new_key, head, object_size, etag)
+            result.output_path = f"s3://{bucket_name}/{new_key}"
+        return result
+
+    async def write_object(self, bucket_name, key, new_key, head, object_size, etag):
+        """
+        Write new_key as the object key with its leading bytes replaced by head.
+        Reads of the rest of the object are conditional on the ETag of the header read,
+        so an object replaced meanwhile fails instead of being mixed.
+        Only objects within one part are written whole, larger ones are copied server-side past
+        their first part, so concurrent writes hold at most MIN_PART_SIZE bytes each.
+        """
+        if object_size > MIN_PART_SIZE:
+            rest = b""
+            if len(head) < MIN_PART_SIZE:
+                rest, _, _ = await self._get_range(bucket_name, key, len(head), MIN_PART_SIZE - len(head), etag)
+            await self._copy_with_patched_head(bucket_name, key, new_key, head + rest, object_size, etag)
+            return
+        rest = b""
+        if len(head) < object_size:
+            rest, _, _ = await self._get_range(bucket_name, key, len(head), object_size - len(head), etag)
+        await self._call(bucket_name, "put_object", Key=new_key, Body=head + rest)
+
+    async def _copy_with_patched_head(self, bucket_name, source_key, new_key, head, object_size, etag):
+        # Async counterpart of s3_reader.copy_with_patched_head, with conditional part copies
+        upload_id = (await self._call(bucket_name, "create_multipart_upload", Key=new_key))["UploadId"]
+        try:
+            response = await self._call(
+                bucket_name, "upload_part", Key=new_key, PartNumber=1, UploadId=upload_id, Body=head
+            )
+            parts = [{"PartNumber": 1, "ETag": response["ETag"]}]
+            start = len(head)
+            while start < object_size:
+                end = min(start + MAX_COPY_PART_SIZE, object_size) - 1
+                kwargs = {"CopySourceIfMatch": etag} if etag is not None else {}
+                response = await self._call(
+                    bucket_name, "upload_part_copy", Key=new_key, PartNumber=len(parts) + 1, UploadId=upload_id,
+                    CopySource={"Bucket": bucket_name, "Key": source_key}, CopySourceRange=f"bytes={start}-{end}",
+                    **kwargs,
+                )
+                parts.append({"PartNumber": len(parts) + 1, "ETag": response["CopyPartResult"]["ETag"]})
+                start = end + 1
+            await self._call(
+                bucket_name, "complete_multipart_upload", Key=new_key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            await self._call(bucket_name, "abort_multipart_upload", Key=new_key, UploadId=upload_id)
+            raise
@@ -0,0 +1,256 @@
+import os
+import posixpath
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from jp2_remediator import box_parser
+from jp2_remediator.result import RemediationResult
+from jp2_remediator.s3_reader import MIN_PART_SIZE, MULTIPART_COPY_THRESHOLD, copy_with_patched_head
+
+# Marks the end of a stage's input queue
+_DONE = object()
+
+
+class S3Pipeline:
+    """Paginated S3 bucket pipeline with bounded, concurrent list/download/process/upload stages."""
+
+    def __init__(self, s3, process, list_workers=1, download_workers=8, process_workers=4,
+                 upload_workers=8, queue_size=64, scratch_dir=None, process_key=None, on_result=None,
+                 checkpoint=None, dry_run=False):
+        """
+        Initialize the pipeline.
+        :param s3: Shared boto3 S3 client, used from all stages.
+        :param process: Callable taking a local JP2 path, remediating it and returning a RemediationResult.
+        :param list_workers: Number of prefixes listed concurrently.
+        :param download_workers: Number of concurrent downloads.
+        :param process_workers: Number of files processed concurrently.
+        :param upload_workers: Number of concurrent uploads.
+        :param queue_size: Maximum number of objects waiting between two stages.
+        :param scratch_dir: Directory for downloaded files, defaults to the system temp directory.
+        :param process_key: Callable taking a bucket name and key and remediating the object
+            directly in S3, returning a RemediationResult. When set, objects skip the download and upload stages and are
+            handled by download_workers threads.
+        :param on_result: Callable receiving the RemediationResult of every object, failures included.
+        :param checkpoint: Optional CheckpointStore recording the outcome of every object by its
+            S3 URI, size and ETag, and skipping listed objects already processed when resuming.
+        :param dry_run: Only audit objects, their outcomes are not recorded in the checkpoint store,
+            so a later run still processes the objects that would be modified.
+        """
+        self.s3 = s3
+        self.process = process
+        self.list_workers = list_workers
+        self.download_workers = download_workers
+        self.process_workers = process_workers
+        self.upload_workers = upload_workers
+        self.queue_size = queue_size
+        self.scratch_dir = scratch_dir
+        self.process_key = process_key
+        self.on_result = on_result
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        # Listed size and ETag of the objects in flight, recorded with their outcome
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.bucket_name = None
+        self.processed = 0
+        self.failed = []
+        self.failed_prefixes = []
+
+    def run(self, bucket_name, prefixes=("",), objects=None):
+        """
+        Process all JP2 objects under the given prefixes.
+        :param bucket_name: Name of the S3 bucket.
+        :param prefixes: Prefixes listed concurrently.
+        :param objects: Optional iterable of (key, size or None, ETag or None) tuples, processed
+            instead of listing the prefixes. It is consumed lazily, as the pipeline has room.
+        :return: List of keys that failed, prefixes that could not be listed are kept in failed_prefixes.
+        """
+        self.bucket_name = bucket_name
+        self.processed = 0
+        self.failed = []
+        self.failed_prefixes = []
+        prefix_queue = queue.Queue()
+        if objects is not None:
+            # A single feeder takes the place of the listing workers
+            list_workers, list_handler = 1, self._feed
+            prefix_queue.put(objects)
+        else:
+            list_workers, list_handler = self.list_workers, self._list
+            for prefix in prefixes:
+                prefix_queue.put(prefix)
+        key_queue = queue.Queue(maxsize=self.queue_size)
+        download_queue = queue.Queue(maxsize=self.queue_size)
+        upload_queue = queue.Queue(maxsize=self.queue_size)
+
+        if self.process_key is not None:
+            # Objects are read and patched in S3, without scratch files
+            stages = [
+                (list_workers, prefix_queue, list_handler, key_queue, self.download_workers),
+                (self.download_workers, key_queue, self._process_key, None, 0),
+            ]
+        else:
+            stages = [
+                (list_workers, prefix_queue, list_handler, key_queue, self.download_workers),
+                (self.download_workers, key_queue, self._download, download_queue, self.process_workers),
+                (self.process_workers, download_queue, self._process, upload_queue, self.upload_workers),
+                (self.upload_workers, upload_queue, self._upload, None, 0),
+            ]
+        threads = []
+        for worker_count, in_queue, handler, out_queue, downstream_count in stages:
+            # Every stage is closed by one _DONE per worker
+            in_queue_workers = [worker_count]
+            for _ in range(worker_count):
+                thread = threading.Thread(
+                    target=self._run_worker,
+                    args=(in_queue, handler, out_queue, in_queue_workers, downstream_count),
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+        for _ in range(list_workers):
+            prefix_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+        print(f"Processed {self.processed} object(s) from bucket {bucket_name}, {len(self.failed)} failed")
+        if self.failed_prefixes:
+            print(f"Could not list {len(self.failed_prefixes)} prefix(es) of bucket {bucket_name}")
+        if self.checkpoint is not None and self.checkpoint.skipped:
+            print(f"Skipped {self.checkpoint.skipped} object(s) already processed")
+        return self.failed
+
+    def _run_worker(self, in_queue, handler, out_queue, remaining_workers, downstream_count):
+        # Take items until _DONE, the last worker of a stage closes the next stage.
+        # Handlers return an iterable of items for the next stage.
+        while (item := in_queue.get()) is not _DONE:
+            try:
+                for output in handler(item):
+                    out_queue.put(output)
+            except Exception as e:
+                self._fail(item, None, e)
+        with self._lock:
+            remaining_workers[0] -= 1
+            last_worker = remaining_workers[0] == 0
+        if last_worker and out_queue is not None:
+            for _ in range(downstream_count):
+                out_queue.put(_DONE)
+
+    def _uri(self, key):
+        return f"s3://{self.bucket_name}/{key}"
+
+    def _report(self, key, result):
+        if self.checkpoint is not None:
+            with self._lock:
+                size, etag = self._versions.pop(key, (None, None))
+            if not self.dry_run:
+                self.checkpoint.record(self._uri(key), size, etag, result)
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _fail(self, key, local_dir, error):
+        print(f"Error processing file: {key} from bucket {self.bucket_name}: {type(error).__name__}: {error}")
+        with self._lock:
+            self.failed.append(key)
+        if local_dir is not None:
+            shutil.rmtree(local_dir, ignore_errors=True)
+        self._report(key, RemediationResult(self._uri(key), error=f"{type(error).__name__}: {error}"))
+
+    def _list(self, prefix):
+        # Yield every JP2 key under prefix, page by page, so keys flow on before listing ends.
+        # A listing failure is reported for the prefix, it is no object to record or re-run.
+        try:
+            paginator = self.s3.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get("Contents", []):
+                    key = obj["Key"]
+                    if key.lower().endswith(".jp2") and self._accept(key, obj.get("Size"), obj.get("ETag")):
+                        yield key
+        except Exception as e:
+            print(f"Error listing prefix '{prefix}' of bucket {self.bucket_name}: {type(e).__name__}: {e}")
+            with self._lock:
+                self.failed_prefixes.append(prefix)
+
+    def _feed(self, objects):
+        # Yield the keys of given objects, e.g. from a manifest, without listing the bucket
+        for key, size, etag in objects:
+            if self._accept(key, size, etag):
+                yield key
+
+    def _accept(self, key, size, etag):
+        # Check an object against the checkpoint store, remembering its version for the record
+        if self.checkpoint is None:
+            return True
+        if self.checkpoint.should_skip(self._uri(key), size, etag):
+            return False
+        with self._lock:
+            self._versions[key] = (size, etag)
+        return True
+
+    def _process_key(self, key):
+        print(f"Processing file: {key} from bucket {self.bucket_name}")
+        try:
+            result = self.process_key(self.bucket_name, key)
+        except Exception as e:
+            self._fail(key, None, e)
+            return []
+        with self._lock:
+            self.processed += 1
+        self._report(key, result)
+        return []
+
+    def _download(self, key):
+        # Download into a per-object scratch directory, so equal basenames cannot collide
+        local_dir = tempfile.mkdtemp(dir=self.scratch_dir)
+        download_path = os.path.join(local_dir, os.path.basename(key))
+        start = time.perf_counter()
+        try:
+            self.s3.download_file(self.bucket_name, key, download_path)
+        except Exception as e:
+            self._fail(key, local_dir, e)
+            return []
+        return [(key, local_dir, download_path, time.perf_counter() - start)]
+
+    def _process(self, item):
+        key, local_dir, download_path, download_seconds = item
+        print(f"Processing file: {key} from bucket {self.bucket_name}")
+        try:
+            result = self.process(download_path)
+        except Exception as e:
+            self._fail(key, local_dir, e)
+            return []
+        result.timings["download"] = download_seconds
+        return [(key, local_dir, result)]
+
+    def _upload(self, item):
+        # Upload only modified files, large ones as a patched first part plus server-side copies
+        key, local_dir, result = item
+        output_uri = None
+        start = time.perf_counter()
+        try:
+            if result.modified and result.output_path is not None:
+                new_key = posixpath.join(posixpath.dirname(key), os.path.basename(result.output_path))
+                object_size = os.path.getsize(result.output_path)
+                head = b""
+                if object_size >= MULTIPART_COPY_THRESHOLD:
+                    with open(result.output_path, "rb") as file:
+                        head = file.read(MIN_PART_SIZE)
+                if head and box_parser.header_length_needed(head) <= len(head):
+                    # Patches only touch the header boxes, which all lie within head
+                    copy_with_patched_head(self.s3, self.bucket_name, key, new_key, head, object_size)
+                else:
+                    self.s3.upload_file(result.output_path, self.bucket_name, new_key)
+                output_uri = self._uri(new_key)
+                result.timings["upload"] = time.perf_counter() - start
+        except Exception as e:
+            self._fail(key, local_dir, e)
+            return []
+        shutil.rmtree(local_dir, ignore_errors=True)
+        with self._lock:
+            self.processed += 1
+        # Report the object rather than its scratch copy
+        result.file_path = self._uri(key)
+        result.output_path = output_uri
+        self._report(key, result)
+        return []
@@ -0,0 +1,156 @@
+import functools
+import io
+from botocore.exceptions import BotoCoreError, ClientError
+from jp2_remediator import box_parser
+from jp2_remediator.box_reader import BoxReader, HEADER_READ_SIZE, VALIDATION_FULL, modified_file_path
+from jp2_remediator.throttle import RateLimitedClient
+
+# S3 multipart limits: every part but the last is at least 5 MiB, a copied part at most 5 GiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_COPY_PART_SIZE = 5 * 1024 * 1024 * 1024
+# Modified objects at least this large are written with server-side copies of their unchanged bytes
+MULTIPART_COPY_THRESHOLD = 64 * 1024 * 1024
+
+
+def copy_with_patched_head(s3, bucket_name, source_key, new_key, head, object_size):
+    """
+    Create new_key as a copy of source_key whose leading bytes are replaced by head.
+    head is uploaded as the first part of a multipart upload and the rest of the
+    object is copied server-side with UploadPartCopy, so it is never transferred.
+    :param s3: boto3 S3 client.
+    :param bucket_name: Name of the S3 bucket.
+    :param source_key: Key of the original object.
+    :param new_key: Key of the object to create.
+    :param head: Patched leading bytes, at least MIN_PART_SIZE long.
+    :param object_size: Size of the original object.
+    """
+    upload_id = s3.create_multipart_upload(Bucket=bucket_name, Key=new_key)["UploadId"]
+    try:
+        response = s3.upload_part(Bucket=bucket_name, Key=new_key, PartNumber=1, UploadId=upload_id, Body=head)
+        parts = [{"PartNumber": 1, "ETag": response["ETag"]}]
+        start = len(head)
+        while start < object_size:
+            end = min(start + MAX_COPY_PART_SIZE, object_size) - 1
+            response = s3.upload_part_copy(
+                Bucket=bucket_name, Key=new_key, PartNumber=len(parts) + 1, UploadId=upload_id,
+                CopySource={"Bucket": bucket_name, "Key": source_key}, CopySourceRange=f"bytes={start}-{end}",
+            )
+            parts.append({"PartNumber": len(parts) + 1, "ETag": response["CopyPartResult"]["ETag"]})
+            start = end + 1
+        s3.complete_multipart_upload(
+            Bucket=bucket_name, Key=new_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket_name, Key=new_key, UploadId=upload_id)
+        raise
+
+
+class _ConcatReader:
+    """Read-only file object over a patched header followed by a streaming body."""
+
+    def __init__(self, header, body):
+        self._header = io.BytesIO(header)
+        self._body = body
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._header.read() + self._body.read()
+        data = self._header.read(size)
+        if len(data) < size:
+            data += self._body.read(size - len(data))
+        return data
+
+
+class S3BoxReader(BoxReader):
+    """BoxReader that reads the JP2 header of an S3 object with HTTP Range requests."""
+
+    def __init__(self, s3, bucket_name, key, validation=VALIDATION_FULL, trc_cache=None, dry_run=False):
+        """
+        Read the header of an S3 object, growing the range as the box structure requires.
+        :param s3: boto3 S3 client.
+        :param bucket_name: Name of the S3 bucket.
+        :param key: Key of the JP2 object.
+        :param validation: jpylyzer validation policy, full validation downloads the whole object.
+        :param trc_cache: Optional TrcAnalysisCache shared by readers.
+        :param dry_run: Audit the object from its header without writing a modified copy.
+        """
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.key = key
+        self.object_size = None
+        super().__init__(
+            f"s3://{bucket_name}/{key}", header_only=True, validation=validation, trc_cache=trc_cache, dry_run=dry_run
+        )
+
+    def _get_range(self, start, size):
+        # Ranged GET of up to size bytes, empty once the end of the object is reached
+        if self.object_size is not None and start >= self.object_size:
+            return b""
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=self.key, Range=f"bytes={start}-{start + size - 1}")
+        # Content-Range: bytes <start>-<end>/<object size>
+        self.object_size = int(response["ContentRange"].rsplit("/", 1)[1])
+        return response["Body"].read()
+
+    def read_header(self, file_path):
+        # Reads the leading bytes covering the signature, 'ftyp' and 'jp2h' boxes with Range requests.
+        offset = 0
+
+        def read_chunk(size):
+            nonlocal offset
+            chunk = self._get_range(offset, size)
+            offset += len(chunk)
+            return chunk
+
+        try:
+            return box_parser.read_header_bytes(read_chunk, HEADER_READ_SIZE)
+        except (BotoCoreError, ClientError) as e:
+            self.logger.error(f"Error reading object {file_path}: {e}")
+            return None
+
+    def read_file(self, file_path):
+        # Reads the whole object, only needed for full jpylyzer validation.
+        try:
+            return self.s3.get_object(Bucket=self.bucket_name, Key=self.key)["Body"].read()
+        except (BotoCoreError, ClientError) as e:
+            self.logger.error(f"Error reading object {file_path}: {e}")
+            return None
+
+    def write_modified_file(self, new_file_contents):
+        # Writes the patched header and the rest of the object to a new key if changes were made.
+        # Returns the S3 URI of the new object, or None if no changes were made.
+        if new_file_contents == self.file_contents:
+            self.logger.info(f"No modifications needed. No new object created: {self.file_path}")
+            return None
+
+        new_key = modified_file_path(self.key)
+        if self.object_size >= MULTIPART_COPY_THRESHOLD and len(self.file_contents) <= MIN_PART_SIZE:
+            # Upload the first part with the patched header, copy the codestream server-side
+            head = bytes(new_file_contents) + self._get_range(
+                len(self.file_contents), MIN_PART_SIZE - len(self.file_contents)
+            )
+            copy_with_patched_head(self.s3, self.bucket_name, self.key, new_key, head, self.object_size)
+        else:
+            header = bytes(new_file_contents)
+
+            get_object = self.s3.get_object
+            if isinstance(self.s3, RateLimitedClient):
+                # Requests are made once per attempt, the upload is retried as a whole
+                get_object = functools.partial(self.s3.request, self.s3.client.get_object)
+
+            def upload():
+                # Every attempt streams a new body, a failed upload has consumed part of the previous one
+                if len(self.file_contents) < self.object_size:
+                    body = get_object(
+                        Bucket=self.bucket_name, Key=self.key, Range=f"bytes={len(self.file_contents)}-"
+                    )["Body"]
+                else:
+                    body = io.BytesIO()
+                self.s3.upload_fileobj(_ConcatReader(header, body), self.bucket_name, new_key)
+
+            if isinstance(self.s3, RateLimitedClient):
+                self.s3.retry(upload)
+            else:
+                upload()
+        new_uri = f"s3://{self.bucket_name}/{new_key}"
+        self.logger.info(f"New JP2 object created with modifications: {new_uri}")
+        return new_uri
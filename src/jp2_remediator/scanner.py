@@ -0,0 +1,105 @@
+import fnmatch
+import os
+import zlib
+
+# Extensions scanned by default, and all JPEG 2000 family extensions
+DEFAULT_EXTENSIONS = (".jp2",)
+JPEG2000_EXTENSIONS = (".jp2", ".jpx", ".jpf")
+
+
+def parse_shard(text):
+    """
+    Parse a shard specification 'i/N', with shards numbered 0 to N - 1.
+    :return: (index, count) tuple.
+    :raises ValueError: If the specification is malformed or out of range.
+    """
+    index, separator, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Shard must be given as i/N: {text}") from None
+    if not separator or count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard must be given as i/N with 0 <= i < N: {text}")
+    return index, count
+
+
+class DirectoryScanner:
+    """Lazily scans a directory tree with os.scandir, filtering and sharding the files found."""
+
+    def __init__(self, extensions=DEFAULT_EXTENSIONS, include=(), exclude=(), min_size=None, max_size=None,
+                 modified_after=None, modified_before=None, shard=None):
+        """
+        Create a scanner.
+        :param extensions: File extensions to yield, compared case-insensitively.
+        :param include: Globs of which a file must match at least one, if any are given.
+        :param exclude: Globs of files and directories to skip, excluded directories are not descended into.
+            Globs match the path relative to the scanned directory or the file name.
+        :param min_size: Minimum file size in bytes.
+        :param max_size: Maximum file size in bytes.
+        :param modified_after: Only files modified at or after this POSIX timestamp.
+        :param modified_before: Only files modified before this POSIX timestamp.
+        :param shard: Optional (index, count) tuple, yields only the files whose relative path hashes to index,
+            so that count scanners of the same tree get disjoint, deterministic slices.
+        """
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+        self.shard = shard
+        # File sizes and times are only read when a filter needs them
+        self._needs_stat = any(value is not None for value in (min_size, max_size, modified_after, modified_before))
+
+    def _matches(self, patterns, relative_path, name):
+        return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+    def _accepts(self, entry, relative_path):
+        if not entry.name.lower().endswith(self.extensions):
+            return False
+        if self.include and not self._matches(self.include, relative_path, entry.name):
+            return False
+        if self.exclude and self._matches(self.exclude, relative_path, entry.name):
+            return False
+        if self.shard is not None:
+            index, count = self.shard
+            if zlib.crc32(relative_path.encode("utf-8", "surrogateescape")) % count != index:
+                return False
+        if self._needs_stat:
+            # DirEntry caches the stat result for later use, e.g. by a checkpoint store
+            stat = entry.stat()
+            if self.min_size is not None and stat.st_size < self.min_size:
+                return False
+            if self.max_size is not None and stat.st_size > self.max_size:
+                return False
+            if self.modified_after is not None and stat.st_mtime < self.modified_after:
+                return False
+            if self.modified_before is not None and stat.st_mtime >= self.modified_before:
+                return False
+        return True
+
+    def scan(self, directory_path):
+        """
+        Yield an os.DirEntry for every accepted file under directory_path, one directory at a time.
+        Each directory is read completely before its files are yielded, so files written into it
+        meanwhile, such as modified copies, are not yielded. Symbolic links to directories are not followed.
+        """
+        # Directories still to scan, as (path, path relative to directory_path) pairs
+        pending = [(directory_path, "")]
+        while pending:
+            path, relative_dir = pending.pop()
+            try:
+                iterator = os.scandir(path)
+            except OSError as e:
+                print(f"Error scanning directory: {path}: {e}")
+                continue
+            with iterator:
+                entries = list(iterator)
+            for entry in entries:
+                relative_path = f"{relative_dir}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    if not (self.exclude and self._matches(self.exclude, relative_path, entry.name)):
+                        pending.append((entry.path, f"{relative_path}/"))
+                elif entry.is_file() and self._accepts(entry, relative_path):
+                    yield entry
@@ -0,0 +1,39 @@
+import os
+from project_paths import paths
+
+# Sample JP2 file of the unit tests, its ICC profile starts at 73 and its curv TRC tags have n = 2
+SAMPLE_PATH = os.path.join(paths.dir_unit_resources, "sample.jp2")
+# The 'rTRC' curv data is at profile offset 428, its count follows the type signature and reserved bytes
+RTRC_COUNT_POSITION = 73 + 428 + 8
+# 'rTRC' is the eighth tag entry of the sample ICC profile, its size field is at 73 + 132 + 7 * 12 + 8
+SIZE_POSITION = 73 + 132 + 7 * 12 + 8
+
+
+def read_sample():
+    """Return the bytes of the sample JP2 file, flagged for review when remediated."""
+    with open(SAMPLE_PATH, "rb") as file:
+        return file.read()
+
+
+def mis_sized_sample(contents=None):
+    """
+    Return the sample, or contents starting with it, with the 'rTRC' curv count set to 1,
+    so its 16-byte tag size must become 14.
+    """
+    contents = bytearray(read_sample() if contents is None else contents)
+    contents[RTRC_COUNT_POSITION:RTRC_COUNT_POSITION + 4] = (1).to_bytes(4, "big")
+    return bytes(contents)
+
+
+def remediated_sample(contents=None):
+    """Return mis_sized_sample(contents) with the 'rTRC' tag size fixed to 14, as remediation writes it."""
+    contents = mis_sized_sample(contents)
+    return contents[:SIZE_POSITION] + (14).to_bytes(4, "big") + contents[SIZE_POSITION + 4:]
+
+
+def write_file(directory, name, contents):
+    """Write contents to a file in directory and return its path."""
+    file_path = os.path.join(directory, name)
+    with open(file_path, "wb") as file:
+        file.write(contents)
+    return file_path
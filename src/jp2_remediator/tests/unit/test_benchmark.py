@@ -0,0 +1,66 @@
+import json
+import pytest
+from jp2_remediator import benchmark
+from jp2_remediator.result import S3_STAGES, STAGES
+
+
+class TestBenchmark:
+
+    # Test for run_suite on every processing path
+    def test_run_suite(self, tmp_path):
+        results = benchmark.run_suite(8, 4096, scratch_dir=str(tmp_path))
+
+        assert results["config"]["count"] == 8
+        assert [result["path"] for result in results["results"]] == ["file", "directory", "bucket"]
+        for result in results["results"]:
+            assert result["files"] == 8
+            assert result["bytes_read"] == 8 * 4096
+            assert result["actions"] == {"unchanged": 4, "modified": 2, "flagged": 2}
+            assert set(STAGES) <= set(result["stage_seconds"])
+            assert result["files_per_second"] > 0
+            assert result["max_rss_mib"] > 0
+        # The bucket path also times the S3 transfers
+        assert set(results["results"][2]["stage_seconds"]) == set(STAGES + S3_STAGES)
+        # Every corpus is removed after its run
+        assert list(tmp_path.iterdir()) == []
+
+    # Test for the ranged bucket path, which reads only the headers
+    def test_run_benchmark_ranged_bucket(self, tmp_path):
+        benchmark.corpus.generate_corpus(str(tmp_path), 4, 64 * 1024)
+        factory = benchmark.BoxReaderFactory(validation="none")
+
+        result = benchmark.run_benchmark("bucket", str(tmp_path), factory, ranged=True)
+
+        assert result["files"] == 4
+        assert result["bytes_read"] == 4 * 4096
+        # The mis-sized object was streamed back to a new key, the others were left unchanged
+        modified = [path.name for path in tmp_path.iterdir() if "_modified_" in path.name]
+        assert len(modified) == 1 and modified[0].startswith("000002_mis-sized_modified_")
+
+    # Test for an unknown benchmark path
+    def test_run_benchmark_unknown_path(self, tmp_path):
+        with pytest.raises(ValueError):
+            benchmark.run_benchmark("ftp", str(tmp_path), benchmark.BoxReaderFactory())
+
+    # Test for the command line entry point writing JSON results
+    def test_main_output(self, tmp_path):
+        output = tmp_path / "results.json"
+
+        benchmark.main([
+            "--count", "4", "--size", "4096", "--paths", "file", "--startup-runs", "0", "--output", str(output)
+        ])
+
+        results = json.loads(output.read_text())
+        assert results["config"]["variants"] == list(benchmark.corpus.VARIANTS)
+        assert results["results"][0]["files"] == 4
+        assert results["startup"] is None
+
+    # Test for the CLI startup measurement, which must not import S3 or validation dependencies
+    def test_measure_startup(self, tmp_path):
+        startup = benchmark.measure_startup(runs=2, scratch_dir=str(tmp_path))
+
+        assert len(startup["runs"]) == 2
+        assert startup["median_seconds"] > 0
+        assert startup["target_seconds"] == benchmark.STARTUP_TARGET_SECONDS
+        assert startup["eager_imports"] == []
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,126 @@
+import unittest
+import os
+from jp2_remediator import box_parser
+from project_paths import paths
+
+# Define the path to the test data file
+TEST_DATA_PATH = os.path.join(paths.dir_unit_resources, "sample.jp2")
+
+
+def make_box(box_type, contents):
+    # Build a box with a 4-byte LBox
+    return (len(contents) + 8).to_bytes(4, "big") + box_type + contents
+
+
+class TestBoxParser(unittest.TestCase):
+
+    def setUp(self):
+        with open(TEST_DATA_PATH, "rb") as file:
+            self.file_contents = file.read()
+
+    # Test for iter_boxes over the top-level boxes of the sample file
+    def test_iter_boxes_sample_file(self):
+        box_types = [box.box_type for box in box_parser.iter_boxes(self.file_contents)]
+        self.assertEqual(box_types, [b"jP  ", b"ftyp", b"jp2h", b"jp2c"])
+
+    # Test for read_box_header with an XLBox extended length
+    def test_read_box_header_xlbox(self):
+        data = (1).to_bytes(4, "big") + b"jp2c" + (24).to_bytes(8, "big") + b"\x00" * 8
+        box = box_parser.read_box_header(data, 0)
+        self.assertEqual(box, box_parser.Box(b"jp2c", 0, 16, 24))
+        self.assertEqual(box.content_offset, 16)
+        self.assertEqual(box.end, 24)
+
+    # Test for read_box_header with LBox == 0 (box extends to the end)
+    def test_read_box_header_length_zero(self):
+        data = b"\x00" * 4 + b"jp2c" + b"\x00" * 20
+        box = box_parser.read_box_header(data, 0)
+        self.assertEqual(box.length, 28)
+
+    # Test for read_box_header with truncated or malformed headers
+    def test_read_box_header_truncated(self):
+        self.assertIsNone(box_parser.read_box_header(b"\x00\x00\x00", 0))
+        self.assertIsNone(box_parser.read_box_header((1).to_bytes(4, "big") + b"jp2c\x00", 0))
+        self.assertIsNone(box_parser.read_box_header((4).to_bytes(4, "big") + b"free", 0))
+
+    # Test for find_header_boxes in the sample file
+    def test_find_header_boxes_sample_file(self):
+        jp2h_box, children = box_parser.find_header_boxes(self.file_contents)
+        self.assertEqual(jp2h_box.box_type, box_parser.JP2H)
+        self.assertEqual([box.box_type for box in children], [b"ihdr", b"colr", b"res "])
+
+    # Test for find_header_boxes stopping at the codestream
+    def test_find_header_boxes_ignores_codestream(self):
+        data = make_box(b"ftyp", b"jp2 ") + make_box(b"jp2c", make_box(b"jp2h", b""))
+        jp2h_box, children = box_parser.find_header_boxes(data)
+        self.assertIsNone(jp2h_box)
+        self.assertEqual(children, [])
+
+    # Test for parse_icc_tag_table on the sample file ICC profile
+    def test_parse_icc_tag_table_sample_file(self):
+        _, children = box_parser.find_header_boxes(self.file_contents)
+        colr_box = next(box for box in children if box.box_type == box_parser.COLR)
+        profile_offset = colr_box.content_offset + 3
+        entries = box_parser.parse_icc_tag_table(self.file_contents, profile_offset)
+        self.assertEqual(len(entries), 10)
+        rtrc = next(entry for entry in entries if entry.signature == b"rTRC")
+        self.assertEqual((rtrc.offset, rtrc.size), (428, 16))
+        self.assertEqual(self.file_contents[rtrc.entry_position:rtrc.entry_position + 4], b"rTRC")
+
+    # Test for parse_icc_tag_table bounded by the profile size field
+    def test_parse_icc_tag_table_bounded_by_profile_size(self):
+        entry = b"rTRC" + (0).to_bytes(8, "big")
+        profile = (140).to_bytes(4, "big") + b"\x00" * 124 + (2).to_bytes(4, "big") + entry + entry
+        entries = box_parser.parse_icc_tag_table(profile, 0)
+        self.assertEqual(entries, [])
+
+    # Test for parse_icc_tag_table when the buffer is too short
+    def test_parse_icc_tag_table_too_short(self):
+        self.assertEqual(box_parser.parse_icc_tag_table(b"\x00" * 100, 0), [])
+        self.assertEqual(box_parser.parse_icc_tag_table(b"\x00" * 200, -1), [])
+
+    # Test for icc_profile, bounded by the profile size field of the sample file
+    def test_icc_profile(self):
+        profile = box_parser.icc_profile(self.file_contents, 73)
+        self.assertEqual(len(profile), 628)
+        self.assertEqual(profile[36:40], b"acsp")
+        self.assertIsNone(box_parser.icc_profile(self.file_contents[:700], 73))
+        self.assertIsNone(box_parser.icc_profile(b"\x00" * 200, 0))
+
+    # Test for read_tag_data computing the encoded length of 'curv' and 'para' tag data
+    def test_read_tag_data(self):
+        # The sample 'rTRC' curv data at profile offset 428 has n = 2
+        self.assertEqual(box_parser.read_tag_data(self.file_contents, 73 + 428), box_parser.TagData(b"curv", 16, 2))
+        cases = [
+            # (tag data, expected TagData)
+            (b"para" + bytes(4) + (3).to_bytes(2, "big") + bytes(2), box_parser.TagData(b"para", 32, 3)),
+            (b"para" + bytes(4) + (0).to_bytes(2, "big") + bytes(2), box_parser.TagData(b"para", 16, 0)),
+            (b"para" + bytes(4) + (9).to_bytes(2, "big") + bytes(2), box_parser.TagData(b"para", None, 9)),
+            (b"curv" + bytes(4) + (0).to_bytes(4, "big"), box_parser.TagData(b"curv", 12, 0)),
+            (b"XYZ " + bytes(8), box_parser.TagData(b"XYZ ", None, 0)),
+        ]
+        for data, expected in cases:
+            with self.subTest(data=data):
+                self.assertEqual(box_parser.read_tag_data(b"\x00" * 4 + data, 4), expected)
+        self.assertIsNone(box_parser.read_tag_data(b"curv" + bytes(7), 0))
+
+    # Test for header_length_needed on the sample file
+    def test_header_length_needed_sample_file(self):
+        # 'jp2h' starts at 32 and is 695 bytes long
+        self.assertEqual(box_parser.header_length_needed(self.file_contents), 727)
+        self.assertEqual(box_parser.header_length_needed(self.file_contents[:40]), 48)
+        self.assertEqual(box_parser.header_length_needed(self.file_contents[:48]), 727)
+
+    # Test for header_length_needed when more bytes are needed for the next box header
+    def test_header_length_needed_truncated(self):
+        self.assertEqual(box_parser.header_length_needed(self.file_contents[:20]), 28)
+        self.assertEqual(box_parser.header_length_needed(b""), 16)
+
+    # Test for header_length_needed when the codestream comes before any 'jp2h' box
+    def test_header_length_needed_no_jp2h(self):
+        data = make_box(b"ftyp", b"jp2 ") + make_box(b"jp2c", b"\x00" * 16)
+        self.assertEqual(box_parser.header_length_needed(data), 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,20 @@
 import unittest
+import logging
 import os
+import pickle
+import tempfile
 from unittest.mock import patch, mock_open, MagicMock
-from jp2_remediator.box_reader import BoxReader
+from jp2_remediator.box_reader import (
+    BoxReader, HEADER_READ_SIZE, VALIDATION_NONE, VALIDATION_HEADER_ONLY, VALIDATION_FULL_ON_MODIFY,
+    modified_file_path
+)
+from jp2_remediator import box_parser
+from jp2_remediator import corpus
+from jp2_remediator.icc_cache import TrcAnalysisCache
 from jpylyzer import boxvalidator
-from project_paths import paths
+from jp2_remediator.tests import SAMPLE_PATH as TEST_DATA_PATH, SIZE_POSITION, mis_sized_sample, write_file
 import datetime
 
-# Define the path to the test data file
-TEST_DATA_PATH = os.path.join(paths.dir_unit_resources, "sample.jp2")
-
 
 class TestJP2ProcessingWithFile(unittest.TestCase):
 
@@ -36,20 +42,6 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
         validator = self.reader.initialize_validator()
         self.assertIsInstance(validator, boxvalidator.BoxValidator)
 
-    # Test for find_box_position method
-    def test_find_box_position_in_file(self):
-        # Read file content
-        file_contents = self.reader.read_file(TEST_DATA_PATH)
-        if file_contents is None:
-            self.fail("Test file could not be read.")
-
-        # Set the file contents for the reader instance
-        self.reader.file_contents = file_contents
-
-        # Find a known box position in the sample file
-        position = self.reader.find_box_position(b"\x6a\x70\x32\x68")
-        self.assertNotEqual(position, -1)  # Ensure that the box is found
-
     # Test for check_boxes method
     def test_check_boxes_in_file(self):
         # Read file content
@@ -63,6 +55,8 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
         # Call check_boxes
         header_offset_position = self.reader.check_boxes()
         self.assertIsNotNone(header_offset_position)
+        # The first 'colr' box of 'jp2h' is kept for the profile size check
+        self.assertEqual(self.reader.colr_box.box_type, b"\x63\x6f\x6c\x72")
 
     # Test for process_colr_box method
     def test_process_colr_box_in_file(self):
@@ -74,14 +68,12 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
         # Set the file contents for the reader instance
         self.reader.file_contents = file_contents
 
-        # Find the colr box position
-        colr_position = self.reader.find_box_position(b"\x63\x6f\x6c\x72")
-        if colr_position == -1:
-            self.fail("'colr' box not found in the test file.")
+        # Find the colr box
+        self.reader.check_boxes()
 
-        # Process the colr box
-        header_offset_position = self.reader.process_colr_box(colr_position)
-        self.assertIsNotNone(header_offset_position)
+        # Process the colr box, the ICC profile of the sample starts at 73
+        header_offset_position = self.reader.process_colr_box(self.reader.colr_box)
+        self.assertEqual(header_offset_position, 73)
 
     # Test for write_modified_file method
     @patch(
@@ -149,6 +141,12 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
             "'jp2h' not found in the file."
             )
 
+    # Test for modified_file_path keeping the extension of JPEG 2000 family files
+    def test_modified_file_path(self):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d")
+        self.assertEqual(modified_file_path("dir.jp2/a.jpx"), f"dir.jp2/a_modified_{timestamp}.jpx")
+        self.assertEqual(modified_file_path("b.JP2"), f"b_modified_{timestamp}.JP2")
+
     # Test for write_modified_file method when no changes
     @patch("builtins.open", new_callable=mock_open)
     def test_write_modified_file_no_changes(self, mock_file):
@@ -170,17 +168,15 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
 
     # Test for process_colr_box method when meth_value == 1
     def test_process_colr_box_meth_value_1(self):
-        # Create file contents with exactly positioned 'colr' box and meth_value = 1
-        # Ensure 'colr' starts at 100, followed by 4 bytes, and then meth_value at 1
+        # Create file contents with a 'colr' box header at 96 and meth_value = 1
         self.reader.file_contents = (
-            b"\x00" * 100 +  # Padding before 'colr' box
-            b"\x63\x6f\x6c\x72" +  # 'colr' box
-            # b"\x00\x00\x00\x00" +  # Four placeholder bytes - kim why issue
-            b"\x01"  # meth_value set to 1
+            b"\x00" * 96 +  # Padding before 'colr' box
+            (15).to_bytes(4, "big") + b"\x63\x6f\x6c\x72" +  # 'colr' box header
+            b"\x01" + b"\x00" * 6  # meth_value set to 1, prec, approx, EnumCS
         )
-        colr_position = 100
-        header_offset_position = self.reader.process_colr_box(colr_position)
-        expected_position = colr_position + 4 + 7
+        colr_box = box_parser.Box(box_parser.COLR, 96, 8, 15)
+        header_offset_position = self.reader.process_colr_box(colr_box)
+        expected_position = colr_box.content_offset + 7
         # Assert the expected header offset position
         self.assertEqual(header_offset_position, expected_position)
         self.reader.logger.debug.assert_any_call(
@@ -190,14 +186,11 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
     # Test for process_colr_box method with unrecognized meth_value
     def test_process_colr_box_unrecognized_meth_value(self):
         self.reader.file_contents = (
-            b"\x00" * 100 +  # Padding before 'colr' box
-            b"\x63\x6f\x6c\x72" +  # 'colr' box
-            # b"\x00\x00\x00\x00" +  # Four placeholder bytes - kim why issue
-            b"\x03"  # meth_value set to 3
+            b"\x00" * 96 +  # Padding before 'colr' box
+            (11).to_bytes(4, "big") + b"\x63\x6f\x6c\x72" +  # 'colr' box header
+            b"\x03" + b"\x00" * 2  # meth_value set to 3
         )
-        colr_position = 100
-        # print("File Contents:", self.reader.file_contents)  # Debug print
-        header_offset_position = self.reader.process_colr_box(colr_position)
+        header_offset_position = self.reader.process_colr_box(box_parser.Box(box_parser.COLR, 96, 8, 11))
         self.assertIsNone(header_offset_position)
         self.reader.logger.debug.assert_any_call(
             "'meth' value 3 is not recognized (must be 1 or 2)."
@@ -206,64 +199,57 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
     # Test for process_colr_box method when 'colr' box is missing
     def test_process_colr_box_missing(self):
         self.reader.file_contents = b"\x00" * 100
-        colr_position = -1
-        header_offset_position = self.reader.process_colr_box(colr_position)
+        header_offset_position = self.reader.process_colr_box(None)
         self.assertIsNone(header_offset_position)
         self.reader.logger.debug.assert_any_call("'colr' not found in the file.")
 
-    # Test for process_trc_tag method with incomplete trc_tag_entry
-    def test_process_trc_tag_incomplete_entry(self):
-        # Prepare the test data
-        self.reader.file_contents = b"\x00" * 100 + b"\x72\x54\x52\x43" + b"\x00" * 6
-        trc_hex = b"\x72\x54\x52\x43"  # Hex for 'rTRC'
+    # Test for process_all_trc_tags with a tag table truncated before its declared count
+    def test_process_all_trc_tags_truncated_tag_table(self):
+        # Prepare an ICC header declaring one tag, followed by only 6 bytes of the entry
         header_offset_position = 50
-        original_contents = bytearray(self.reader.file_contents)
+        icc_header = (200).to_bytes(4, "big") + b"\x00" * 124 + (1).to_bytes(4, "big")
+        self.reader.file_contents = b"\x00" * header_offset_position + icc_header + b"\x72\x54\x52\x43" + b"\x00" * 2
 
         # Call the method under test
-        new_contents = self.reader.process_trc_tag(trc_hex, "rTRC", original_contents, header_offset_position)
+        new_contents = self.reader.process_all_trc_tags(header_offset_position)
 
-        # Assert that the appropriate debug message was logged
-        expected_message = "Could not extract the full 12-byte 'rTRC' tag entry."
-        self.reader.logger.debug.assert_any_call(expected_message)
+        # Assert that the truncated entry was not treated as a tag and contents are unchanged
+        self.assertEqual(self.reader.result.trc_tags, {})
+        self.assertEqual(new_contents, self.reader.file_contents)
 
-        # Assert that new_contents is unchanged
-        self.assertEqual(new_contents, original_contents)
+    # Test for process_all_trc_tags: 'rTRC' bytes outside the ICC tag table are ignored
+    def test_process_all_trc_tags_ignores_bytes_outside_tag_table(self):
+        trc_hex = b"\x72\x54\x52\x43"  # Hex for 'rTRC'
+        icc_header = (144).to_bytes(4, "big") + b"\x00" * 124 + (0).to_bytes(4, "big")
+        # A stray 'rTRC' entry after the (empty) tag table, as could occur in image data
+        stray_entry = trc_hex + (132).to_bytes(4, "big") + (20).to_bytes(4, "big")
+        self.reader.file_contents = icc_header + stray_entry + b"curv" + b"\x00" * 7 + b"\x01"
 
-    # Test for process_trc_tag: trc_hex not found in new_contents
-    def test_process_trc_tag_trc_hex_not_found(self):
-        # Prepare the test data for when trc_hex is not found
-        trc_hex = b"\x72\x54\x52\x43"  # Hex value not present in new_contents
-        trc_name = "rTRC"
-        new_contents = bytearray(b"\x00" * 100)  # Sample contents without trc_hex
-        header_offset_position = 50
+        result = self.reader.process_all_trc_tags(0)
 
-        # Call process_trc_tag and expect no modifications to new_contents
-        result = self.reader.process_trc_tag(trc_hex, trc_name, new_contents, header_offset_position)
+        self.assertEqual(result, self.reader.file_contents)
+        self.assertEqual(self.reader.result.trc_tags, {})
+        self.reader.logger.warning.assert_not_called()
 
-        # Check that the function returned the original new_contents
-        self.assertEqual(result, new_contents)
+    # Test for process_all_trc_tags: no tag table within the contents
+    def test_process_all_trc_tags_no_tag_table(self):
+        self.reader.file_contents = b"\x00" * 100
 
-        # Verify that the correct debug message was logged
-        self.reader.logger.debug.assert_any_call(f"'{trc_name}' not found in the file.")
+        result = self.reader.process_all_trc_tags(50)
 
-    # Test for process_trc_tag: header_offset_position is None
-    def test_process_trc_tag_header_offset_none(self):
-        # Prepare the test data where header_offset_position is None
-        trc_hex = b"\x72\x54\x52\x43"  # Hex value found in new_contents
-        trc_name = "rTRC"
-        new_contents = bytearray(b"\x00" * 50 + trc_hex + b"\x00" * 50)
-        header_offset_position = None  # Simulate unrecognized meth value
+        self.assertEqual(result, self.reader.file_contents)
+        self.assertEqual(self.reader.result.trc_tags, {})
 
-        # Call process_trc_tag and expect no modifications to new_contents
-        result = self.reader.process_trc_tag(trc_hex, trc_name, new_contents, header_offset_position)
+    # Test for process_all_trc_tags: header_offset_position is None
+    def test_process_all_trc_tags_header_offset_none(self):
+        # Prepare the test data where header_offset_position is None, an unrecognized meth value
+        self.reader.file_contents = b"\x00" * 50 + b"\x72\x54\x52\x43" + b"\x00" * 50
 
-        # Check that the function returned the original new_contents
-        self.assertEqual(result, new_contents)
+        result = self.reader.process_all_trc_tags(None)
 
-        # Verify that the correct debug message was logged
-        self.reader.logger.debug.assert_any_call(
-            f"Cannot calculate 'curv_{trc_name}_position' due to an unrecognized 'meth' value."
-        )
+        # Check that the contents are returned unchanged
+        self.assertEqual(result, self.reader.file_contents)
+        self.assertEqual(self.reader.result.trc_tags, {})
 
     # Test for read_jp2_file method when file_contents is valid
     def test_read_jp2_file(self):
@@ -305,6 +291,16 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
             # Assert that write_modified_file was called with the modified contents
             mock_write_modified_file.assert_called_once_with(b"Modified JP2 content")
 
+    # Test for read_jp2_file method result on the unmodified sample file
+    def test_read_jp2_file_result(self):
+        with patch.object(self.reader, 'write_modified_file', return_value=None):
+            result = self.reader.read_jp2_file()
+        self.assertEqual(result.file_path, TEST_DATA_PATH)
+        self.assertFalse(result.modified)
+        self.assertIsNone(result.output_path)
+        self.assertTrue(result.is_valid)
+        self.assertIsNone(result.error)
+
     # Test for read_jp2_file method when file_contents is None or empty
     def test_read_jp2_file_no_file_contents(self):
         # Set file_contents to None to simulate missing content
@@ -317,7 +313,8 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
                 patch.object(self.reader, 'write_modified_file') as mock_write_modified_file:
 
             # Call the method under test
-            self.reader.read_jp2_file()
+            result = self.reader.read_jp2_file()
+            self.assertEqual(result.error, "File could not be read")
 
             # Assert that the method returns early and dependent methods are not called
             mock_initialize_validator.assert_not_called()
@@ -325,57 +322,50 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
             mock_process_all_trc_tags.assert_not_called()
             mock_write_modified_file.assert_not_called()
 
-    # Test for process_trc_tag: when trc_tag_size != curv_trc_field_length
-    def test_process_trc_tag_size_mismatch(self):
+    # Test for check_tag_entry: when trc_tag_size != curv_trc_field_length
+    def test_check_tag_entry_size_mismatch(self):
         # Prepare test data where trc_tag_size does not match curv_trc_field_length
         trc_hex = b'\x72\x54\x52\x43'  # Hex for 'rTRC'
         trc_name = 'rTRC'
-        trc_position = 10  # Arbitrary position where trc_hex is found in new_contents
+
+        # Start of the ICC profile within new_contents
+        header_offset_position = 5  # Arbitrary valid value
 
         # Set trc_tag_offset and trc_tag_size with values that will cause a mismatch
-        trc_tag_offset = 50  # Arbitrary offset value
+        trc_tag_offset = 144  # Tag data directly after a one-entry tag table
         trc_tag_size = 20    # Set intentionally different from curv_trc_field_length
 
+        # Build the ICC header (128 bytes) with the profile size, then the tag count
+        profile_size = trc_tag_offset + 14
+        icc_header = profile_size.to_bytes(4, 'big') + b'\x00' * 124 + (1).to_bytes(4, 'big')
+
         # Build the trc_tag_entry (12 bytes): signature + offset + size
         trc_tag_entry = trc_hex + trc_tag_offset.to_bytes(4, 'big') + trc_tag_size.to_bytes(4, 'big')
-
-        # Prepare new_contents with the trc_tag_entry at trc_position
-        new_contents = bytearray(b'\x00' * trc_position + trc_tag_entry + b'\x00' * 200)
-
-        # Set header_offset_position to a valid integer
-        header_offset_position = 5  # Arbitrary valid value
+        trc_position = header_offset_position + len(icc_header)  # Position of the tag table entry
 
         # Prepare curv_profile data with curv_trc_gamma_n such that curv_trc_field_length != trc_tag_size
-        curv_trc_gamma_n = 1  # Set gamma_n to 2
-        curv_trc_field_length = curv_trc_gamma_n * 2 + 12  # Calculates to 16
+        curv_trc_gamma_n = 1
+        curv_trc_field_length = curv_trc_gamma_n * 2 + 12  # Calculates to 14
 
-        # Build curv_profile (12 bytes): signature + reserved + gamma_n
+        # Build curv_profile (12 bytes): signature + reserved + gamma_n, plus the 2-byte gamma value
         curv_signature = b'curv'  # Signature 'curv'
         curv_reserved = (0).to_bytes(4, 'big')  # Reserved bytes set to zero
         curv_trc_gamma_n_bytes = curv_trc_gamma_n.to_bytes(4, 'big')
-        curv_profile = curv_signature + curv_reserved + curv_trc_gamma_n_bytes
-
-        # Calculate curv_trc_position based on trc_tag_offset and header_offset_position
-        curv_trc_position = trc_tag_offset + header_offset_position
+        curv_profile = curv_signature + curv_reserved + curv_trc_gamma_n_bytes + b'\x01\x00'
 
-        # Ensure new_contents is large enough to hold the curv_profile at the calculated position
-        required_length = curv_trc_position + len(curv_profile)
-        if len(new_contents) < required_length:
-            new_contents.extend(b'\x00' * (required_length - len(new_contents)))
-
-        # Insert curv_profile into new_contents at curv_trc_position
-        new_contents[curv_trc_position:curv_trc_position + len(curv_profile)] = curv_profile
+        # Prepare new_contents with the ICC profile at header_offset_position
+        new_contents = bytearray(b'\x00' * header_offset_position + icc_header + trc_tag_entry + curv_profile)
 
         # Mock the logger to capture warnings
         self.reader.logger = MagicMock()
 
-        # Call the method under test
-        result_contents = self.reader.process_trc_tag(trc_hex, trc_name, new_contents, header_offset_position)
+        # Call the method under test with the parsed tag table entry
+        [entry] = box_parser.parse_icc_tag_table(new_contents, header_offset_position)
+        patch = self.reader.check_tag_entry(entry, new_contents, header_offset_position, profile_size, 1)
 
-        # Verify that the trc_tag_size in new_contents was updated to curv_trc_field_length
-        updated_trc_tag_size_bytes = result_contents[trc_position + 8: trc_position + 12]
-        updated_trc_tag_size = int.from_bytes(updated_trc_tag_size_bytes, 'big')
-        self.assertEqual(updated_trc_tag_size, curv_trc_field_length)
+        # Verify that the trc_tag_size field is patched to curv_trc_field_length
+        self.assertEqual(patch, (trc_position + 8, curv_trc_field_length.to_bytes(4, 'big')))
+        self.assertEqual(self.reader.result.trc_tags[trc_name], {"offset": 144, "size": 20, "n": 1})
 
         # Verify that the appropriate warning was logged
         expected_warning = f"""'{trc_name}' Tag Size ({trc_tag_size}) does not match 'curv_{trc_name}_field_length' ({
@@ -383,5 +373,403 @@ class TestJP2ProcessingWithFile(unittest.TestCase):
         self.reader.logger.warning.assert_any_call(expected_warning)
 
 
+class TestJP2ReaderLogging(unittest.TestCase):
+
+    # Test that creating many readers does not add logging handlers
+    def test_logger_handlers_registered_once(self):
+        BoxReader(TEST_DATA_PATH, header_only=True)
+        handler_count = len(logging.getLogger("jp2_remediator.box_reader").handlers)
+        for _ in range(5):
+            BoxReader(TEST_DATA_PATH, header_only=True)
+        self.assertEqual(len(logging.getLogger("jp2_remediator.box_reader").handlers), handler_count)
+        self.assertGreater(handler_count, 0)
+
+    # Test that log messages carry the file path through the logger adapter
+    def test_logger_adapter_adds_file_path(self):
+        reader = BoxReader(TEST_DATA_PATH, header_only=True)
+        with self.assertLogs("jp2_remediator.box_reader", level="INFO") as captured:
+            reader.logger.info("message")
+        self.assertEqual(captured.records[0].getMessage(), f"{TEST_DATA_PATH} - message")
+
+    # Test that process_all_trc_tags does not build debug messages when debug logging is disabled
+    def test_process_all_trc_tags_no_debug_messages(self):
+        reader = BoxReader(TEST_DATA_PATH, header_only=True)
+        reader.logger = MagicMock()
+        reader.logger.isEnabledFor.return_value = False
+        reader.process_all_trc_tags(reader.check_boxes())
+        reader.logger.isEnabledFor.assert_called_with(logging.DEBUG)
+        self.assertFalse(any("TRC" in c.args[0] for c in reader.logger.debug.call_args_list))
+
+
+class TestJP2ValidationPolicy(unittest.TestCase):
+
+    def make_reader(self, validation):
+        reader = BoxReader(TEST_DATA_PATH, validation=validation)
+        reader.logger = MagicMock()
+        return reader
+
+    # Test that an unknown validation policy is rejected
+    def test_unknown_validation_policy(self):
+        with self.assertRaises(ValueError):
+            BoxReader(TEST_DATA_PATH, validation="sometimes")
+
+    # Test for validate_header_boxes on the sample file and a corrupted header
+    def test_validate_header_boxes(self):
+        reader = self.make_reader(VALIDATION_HEADER_ONLY)
+        self.assertTrue(reader.validate_header_boxes())
+        # Corrupt the 'ftyp' brand
+        reader.file_contents = reader.file_contents[:20] + b"xxxx" + reader.file_contents[24:]
+        self.assertFalse(reader.validate_header_boxes())
+
+    # Test for read_jp2_file with each non-default validation policy
+    def test_read_jp2_file_validation_policies(self):
+        cases = [
+            # (policy, modified, full validation expected, header validation expected)
+            (VALIDATION_NONE, True, False, False),
+            (VALIDATION_HEADER_ONLY, True, False, True),
+            (VALIDATION_FULL_ON_MODIFY, False, False, False),
+            (VALIDATION_FULL_ON_MODIFY, True, True, False),
+        ]
+        for policy, modified, full_expected, header_expected in cases:
+            with self.subTest(policy=policy, modified=modified):
+                reader = self.make_reader(policy)
+                new_file_contents = reader.file_contents + b" modified" if modified else reader.file_contents
+                with patch.object(reader, 'initialize_validator') as mock_initialize_validator, \
+                    patch.object(reader, 'validator'), \
+                    patch.object(reader, 'validate_header_boxes') as mock_validate_header_boxes, \
+                    patch.object(reader, 'process_all_trc_tags', return_value=new_file_contents), \
+                        patch.object(reader, 'write_modified_file') as mock_write_modified_file:
+                    reader.read_jp2_file()
+
+                    self.assertEqual(mock_initialize_validator.called, full_expected)
+                    self.assertEqual(mock_validate_header_boxes.called, header_expected)
+                    mock_write_modified_file.assert_called_once_with(new_file_contents)
+
+
+class TestJP2HeaderOnlyReads(unittest.TestCase):
+
+    def setUp(self):
+        with open(TEST_DATA_PATH, "rb") as file:
+            self.full_contents = file.read()
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Test that header-only reads stop after the 'jp2h' box
+    def test_read_header_sample_file(self):
+        reader = BoxReader(TEST_DATA_PATH, header_only=True)
+        self.assertEqual(len(reader.file_contents), HEADER_READ_SIZE)
+        self.assertEqual(reader.file_contents, self.full_contents[:HEADER_READ_SIZE])
+        self.assertIsNotNone(reader.check_boxes())
+
+    # Test that the read window grows past large boxes before 'jp2h'
+    def test_read_header_grows_window(self):
+        xml_box = (HEADER_READ_SIZE * 3 + 8).to_bytes(4, "big") + b"xml " + b"\x00" * HEADER_READ_SIZE * 3
+        # Insert the XML box after the signature and 'ftyp' boxes
+        contents = self.full_contents[:32] + xml_box + self.full_contents[32:]
+        file_path = os.path.join(self.temp_dir.name, "xml_first.jp2")
+        with open(file_path, "wb") as file:
+            file.write(contents)
+
+        reader = BoxReader(file_path, header_only=True)
+        header_end = 32 + len(xml_box) + 695
+        self.assertGreaterEqual(len(reader.file_contents), header_end)
+        self.assertLess(len(reader.file_contents), len(contents))
+        self.assertEqual(reader.file_contents, contents[:len(reader.file_contents)])
+
+    # Test for write_modified_file copying the unread remainder of the file
+    def test_write_modified_file_header_only(self):
+        file_path = os.path.join(self.temp_dir.name, "sample.jp2")
+        with open(file_path, "wb") as file:
+            file.write(self.full_contents)
+
+        reader = BoxReader(file_path, header_only=True)
+        new_file_contents = bytearray(reader.file_contents)
+        new_file_contents[0] = 0xFF
+        reader.write_modified_file(new_file_contents)
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d")
+        with open(file_path.replace(".jp2", f"_modified_{timestamp}.jp2"), "rb") as file:
+            written_contents = file.read()
+        self.assertEqual(written_contents, b"\xff" + self.full_contents[1:])
+
+
+class TestJP2InPlacePatching(unittest.TestCase):
+
+    def setUp(self):
+        self.contents = mis_sized_sample()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = write_file(self.temp_dir.name, "sample.jp2", self.contents)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Test that in-place mode patches the tag size without writing a copy
+    def test_in_place_patches_tag_size(self):
+        for header_only in (False, True):
+            with self.subTest(header_only=header_only):
+                reader = BoxReader(self.file_path, header_only=header_only, in_place=True, validation="none")
+                reader.logger = MagicMock()
+                result = reader.read_jp2_file()
+                self.assertTrue(result.modified)
+                self.assertEqual(result.output_path, self.file_path)
+
+                with open(self.file_path, "rb") as file:
+                    patched_contents = file.read()
+                self.assertEqual(patched_contents[SIZE_POSITION:SIZE_POSITION + 4], (14).to_bytes(4, "big"))
+                self.assertEqual(patched_contents[:SIZE_POSITION], self.contents[:SIZE_POSITION])
+                self.assertEqual(patched_contents[SIZE_POSITION + 4:], self.contents[SIZE_POSITION + 4:])
+                self.assertEqual(os.listdir(self.temp_dir.name), ["sample.jp2"])
+
+                # Restore the original for the next iteration
+                with open(self.file_path, "wb") as file:
+                    file.write(self.contents)
+
+
+class TestJP2DryRun(unittest.TestCase):
+
+    def setUp(self):
+        self.contents = mis_sized_sample()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = write_file(self.temp_dir.name, "sample.jp2", self.contents)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Test that a dry run reports the change from the header without writing anything
+    @patch.object(BoxReader, "initialize_validator")
+    def test_dry_run_never_writes(self, mock_initialize_validator):
+        for in_place in (False, True):
+            with self.subTest(in_place=in_place):
+                reader = BoxReader(self.file_path, in_place=in_place, validation="full", dry_run=True)
+                reader.logger = MagicMock()
+                result = reader.read_jp2_file()
+
+                self.assertTrue(result.modified)
+                self.assertEqual(result.action, "modified")
+                self.assertIsNone(result.output_path)
+                self.assertEqual(result.trc_tags["rTRC"], {"offset": 428, "size": 16, "n": 1})
+                # Header-only read and validation, no write stage
+                self.assertEqual(result.bytes_read, HEADER_READ_SIZE)
+                self.assertTrue(result.is_valid)
+                mock_initialize_validator.assert_not_called()
+                self.assertNotIn("write", result.timings)
+                self.assertEqual(os.listdir(self.temp_dir.name), ["sample.jp2"])
+                with open(self.file_path, "rb") as file:
+                    self.assertEqual(file.read(), self.contents)
+                reader.logger.info.assert_any_call(f"Dry run, file would be modified: {self.file_path}")
+
+
+class TestJP2IccTagTable(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def build_jp2(self, tags, profile_size_delta=0, xlbox=False):
+        # Build a JP2 file whose 'colr' box holds an ICC profile with the given
+        # (signature, tag data, declared size, offset or None to follow the previous tag) tags,
+        # the 'colr' box length in an XLBox field if xlbox
+        table_end = 128 + 4 + 12 * len(tags)
+        tag_table = len(tags).to_bytes(4, "big")
+        tag_data = b""
+        for signature, data, size, offset in tags:
+            if offset is None:
+                offset = table_end + len(tag_data)
+                tag_data += data + bytes(-len(data) % 4)
+            tag_table += signature + offset.to_bytes(4, "big") + size.to_bytes(4, "big")
+        profile_size = 128 + len(tag_table) + len(tag_data)
+        header = (profile_size + profile_size_delta).to_bytes(4, "big") + bytes(32) + b"acsp"
+        profile = header + bytes(128 - len(header)) + tag_table + tag_data
+        colr_contents = bytes([2, 0, 0]) + profile
+        if xlbox:
+            colr = (1).to_bytes(4, "big") + b"colr" + (16 + len(colr_contents)).to_bytes(8, "big") + colr_contents
+        else:
+            colr = corpus.make_box(b"colr", colr_contents)
+        jp2h = corpus.make_box(b"jp2h", colr)
+        contents = corpus.make_box(b"jP  ", b"\x0d\x0a\x87\x0a") + corpus.make_box(b"ftyp", b"jp2 ") + jp2h
+        contents += corpus.make_box(b"jp2c", b"\xff\x4f" + bytes(64) + b"\xff\xd9")
+        file_path = os.path.join(self.temp_dir.name, "profile.jp2")
+        with open(file_path, "wb") as file:
+            file.write(contents)
+        # The profile starts after the signature, 'ftyp', 'jp2h' and 'colr' box headers, and meth, prec, approx
+        return file_path, 12 + 12 + 8 + (16 if xlbox else 8) + 3, len(tags)
+
+    def entry_size(self, contents, profile_offset, index):
+        position = profile_offset + 132 + 12 * index + 8
+        return int.from_bytes(contents[position:position + 4], "big")
+
+    # Test that every tag and the profile size are checked and fixed in one pass
+    def test_all_tags_fixed_in_one_pass(self):
+        para = b"para" + bytes(4) + (3).to_bytes(2, "big") + bytes(2) + bytes(20)
+        file_path, profile_offset, _ = self.build_jp2([
+            (b"wtpt", b"XYZ " + bytes(16), 20, None),
+            (b"rTRC", corpus.make_curv(1), 16, None),
+            (b"gTRC", corpus.make_curv(3), 20, None),
+            (b"bTRC", para, 40, None),
+            (b"kTRC", corpus.make_curv(0), 16, None),
+            (b"desc", b"", 100, 4000),
+        ], profile_size_delta=8)
+        reader = BoxReader(file_path, validation="none")
+        reader.logger = MagicMock()
+
+        result = reader.read_jp2_file()
+
+        self.assertTrue(result.modified)
+        self.assertTrue(result.flagged)
+        with open(result.output_path, "rb") as file:
+            contents = file.read()
+        # Profile size back to the 'colr' box, then rTRC 14, gTRC 12 + 2 * 3, bTRC 12 + 4 * 5, kTRC 12
+        self.assertEqual(int.from_bytes(contents[profile_offset:profile_offset + 4], "big"), 304)
+        sizes = [self.entry_size(contents, profile_offset, index) for index in range(6)]
+        self.assertEqual(sizes, [20, 14, 18, 32, 12, 100])
+        self.assertEqual(result.trc_tags, {
+            "rTRC": {"offset": 224, "size": 16, "n": 1},
+            "gTRC": {"offset": 240, "size": 20, "n": 3},
+            "bTRC": {"offset": 260, "size": 40, "n": None},
+            "kTRC": {"offset": 292, "size": 16, "n": 0},
+        })
+        self.assertEqual([finding[0] for finding in reader.findings], [
+            "profile_size", "tag_size", "gamma_n", "tag_size", "tag_size", "gamma_n", "tag_size", "tag_bounds",
+        ])
+        reader.logger.warning.assert_any_call(
+            "'bTRC' Tag Size (40) does not match 'para_bTRC_field_length' (32). Modifying the size..."
+        )
+
+        # A second pass finds nothing left to fix, tags that cannot be fixed stay flagged
+        reader = BoxReader(result.output_path, validation="none")
+        reader.logger = MagicMock()
+        second_result = reader.read_jp2_file()
+        self.assertFalse(second_result.modified)
+        self.assertTrue(second_result.flagged)
+        self.assertEqual([finding[0] for finding in reader.findings], ["gamma_n", "gamma_n", "tag_bounds"])
+
+    # Test that a 'colr' box with an XLBox length is remediated like one with a plain LBox
+    def test_colr_box_with_xlbox(self):
+        for xlbox in (False, True):
+            with self.subTest(xlbox=xlbox):
+                file_path, profile_offset, _ = self.build_jp2([(b"rTRC", corpus.make_curv(1), 16, None)], xlbox=xlbox)
+                reader = BoxReader(file_path, validation="none")
+                reader.logger = MagicMock()
+
+                result = reader.read_jp2_file()
+
+                self.assertEqual(result.meth, 2)
+                self.assertTrue(result.modified)
+                with open(result.output_path, "rb") as file:
+                    self.assertEqual(self.entry_size(file.read(), profile_offset, 0), 14)
+
+    # Test that truncated tag data and unknown parametric functions are flagged, not patched
+    def test_unfixable_tags_flagged(self):
+        para = b"para" + bytes(4) + (9).to_bytes(2, "big") + bytes(2)
+        file_path, _, _ = self.build_jp2([
+            (b"kTRC", para, 12, None),
+            # curv data of 20 entries declared in the last 16 bytes of the profile
+            (b"rTRC", corpus.make_curv(1)[:12] + bytes(4), 16, None),
+        ])
+        with open(file_path, "r+b") as file:
+            contents = bytearray(file.read())
+            position = contents.index(b"curv") + 8
+            contents[position:position + 4] = (20).to_bytes(4, "big")
+            file.seek(0)
+            file.write(contents)
+        reader = BoxReader(file_path, validation="none")
+        reader.logger = MagicMock()
+
+        result = reader.read_jp2_file()
+
+        self.assertFalse(result.modified)
+        self.assertEqual(result.action, "flagged")
+        self.assertEqual(reader.findings, [
+            ["para_function", "kTRC", 9], ["gamma_n", "rTRC", 20], ["tag_bounds", "rTRC", 168, 52, 184],
+        ])
+        # The logger adapter prefixes the file path, the messages do not repeat it
+        reader.logger.warning.assert_any_call("'kTRC' 'para' function type 9 is unknown.")
+        reader.logger.warning.assert_any_call(
+            "'curv_rTRC_gamma_n' value is 20, expected 1. Modification may be required."
+        )
+        reader.logger.warning.assert_any_call(
+            "'rTRC' data at offset 168 (52 bytes) lies outside the ICC profile (184 bytes)."
+        )
+
+
+class TestJP2TrcAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.contents = mis_sized_sample()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_paths = [write_file(self.temp_dir.name, name, self.contents) for name in ("a.jp2", "b.jp2")]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, file_path, trc_cache):
+        reader = BoxReader(file_path, validation="none", trc_cache=trc_cache)
+        reader.logger = MagicMock()
+        result = reader.read_jp2_file()
+        with open(result.output_path, "rb") as file:
+            return reader, result, file.read()
+
+    # Test that files with an identical ICC profile reuse the cached analysis and patches
+    def test_cache_hit_matches_uncached_result(self):
+        _, expected_result, expected_contents = self.read(self.file_paths[0], None)
+        trc_cache = TrcAnalysisCache()
+
+        _, first_result, first_contents = self.read(self.file_paths[0], trc_cache)
+        reader, second_result, second_contents = self.read(self.file_paths[1], trc_cache)
+
+        self.assertEqual((trc_cache.misses, trc_cache.hits), (1, 1))
+        self.assertEqual(first_contents, expected_contents)
+        self.assertEqual(second_contents, expected_contents)
+        self.assertEqual(second_result.trc_tags, expected_result.trc_tags)
+        self.assertEqual(second_result.flagged, expected_result.flagged)
+        # The cached analysis logs the same warnings, without parsing the tag table
+        reader.logger.warning.assert_any_call(
+            "'rTRC' Tag Size (16) does not match 'curv_rTRC_field_length' (14). Modifying the size..."
+        )
+        self.assertEqual(reader.logger.warning.call_count, 3)
+
+    # Test that the cache persisted to disk is shared between cache instances
+    def test_persisted_cache(self):
+        cache_path = os.path.join(self.temp_dir.name, "icc-cache.sqlite")
+        trc_cache = TrcAnalysisCache(path=cache_path)
+        self.read(self.file_paths[0], trc_cache)
+        trc_cache.close()
+
+        # A new process starts with an empty memory cache and reads the file
+        trc_cache = pickle.loads(pickle.dumps(trc_cache))
+        _, result, _ = self.read(self.file_paths[1], trc_cache)
+        trc_cache.close()
+        self.assertEqual((trc_cache.misses, trc_cache.hits), (0, 1))
+        self.assertEqual(result.trc_tags["rTRC"], {"offset": 428, "size": 16, "n": 1})
+
+    # Test that a profile whose size field is corrected from the 'colr' box is patched but not cached
+    def test_profile_size_fixed_not_cached(self):
+        contents = bytearray(self.contents)
+        # Declare a profile size ending before the 'bTRC' curv data at profile offset 460
+        contents[73:77] = (460).to_bytes(4, "big")
+        with open(self.file_paths[0], "wb") as file:
+            file.write(contents)
+        trc_cache = TrcAnalysisCache()
+
+        reader = BoxReader(self.file_paths[0], validation="none", trc_cache=trc_cache)
+        reader.logger = MagicMock()
+        result = reader.read_jp2_file()
+
+        self.assertEqual((trc_cache.misses, trc_cache.hits), (0, 0))
+        self.assertEqual(len(trc_cache._entries), 0)
+        with open(result.output_path, "rb") as file:
+            patched_contents = file.read()
+        # The sample profile fills its 'colr' box, 628 bytes, and the 'rTRC' size is fixed in the same pass
+        self.assertEqual(patched_contents[73:77], (628).to_bytes(4, "big"))
+        self.assertEqual(patched_contents[SIZE_POSITION:SIZE_POSITION + 4], (14).to_bytes(4, "big"))
+        reader.logger.warning.assert_any_call(
+            "ICC profile size (460) does not match the 'colr' box (628). Modifying the size..."
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
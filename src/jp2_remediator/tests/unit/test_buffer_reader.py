@@ -0,0 +1,117 @@
+import unittest
+import io
+from unittest.mock import MagicMock
+from jp2_remediator.box_reader import HEADER_READ_SIZE
+from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.buffer_reader import (
+    BUFFER_NAME, BufferBoxReader, apply_patches, remediate, remediate_bytes, remediate_stream
+)
+from jp2_remediator.tests import SIZE_POSITION, mis_sized_sample, read_sample, remediated_sample
+
+
+class TestBufferBoxReader(unittest.TestCase):
+
+    def setUp(self):
+        self.original = read_sample()
+        self.contents = mis_sized_sample()
+        self.expected = remediated_sample()
+
+    # Test that bytes, bytearrays, memoryviews and file objects give the same patch
+    def test_remediate_sources(self):
+        sources = [self.contents, bytearray(self.contents), memoryview(self.contents), io.BytesIO(self.contents)]
+        for source in sources:
+            with self.subTest(source=type(source).__name__):
+                result, patches = remediate(source, name="upload.jp2")
+
+                self.assertEqual(patches, [(SIZE_POSITION + 3, b"\x10", b"\x0e")])
+                self.assertEqual(result.file_path, "upload.jp2")
+                self.assertTrue(result.modified)
+                self.assertIsNone(result.output_path)
+                self.assertEqual(result.trc_tags["rTRC"], {"offset": 428, "size": 16, "n": 1})
+                self.assertEqual(apply_patches(self.contents, patches), self.expected)
+
+    # Test that only the header boxes are read from a file object, unless the whole file is validated
+    def test_file_object_header_only(self):
+        stream = io.BytesIO(self.contents)
+        remediate(stream, validation="header-only")
+        self.assertEqual(stream.tell(), HEADER_READ_SIZE)
+
+        stream = io.BytesIO(self.contents)
+        result, _ = remediate(stream, validation="full")
+        self.assertEqual(stream.tell(), len(self.contents))
+        self.assertTrue(result.is_valid)
+        self.assertEqual(result.bytes_read, len(self.contents))
+
+    # Test for remediating to patched bytes, and for unchanged, empty and audited buffers
+    def test_remediate_bytes(self):
+        result, patched = remediate_bytes(memoryview(self.contents))
+        self.assertTrue(result.modified)
+        self.assertEqual(patched, self.expected)
+
+        result, patched = remediate_bytes(io.BytesIO(self.original), validation="full-on-modify")
+        self.assertEqual(result.action, "flagged")
+        self.assertIsNone(result.is_valid)
+        self.assertEqual(patched, self.original)
+
+        result, patched = remediate_bytes(b"")
+        self.assertEqual(result.file_path, BUFFER_NAME)
+        self.assertEqual(result.error, "File could not be read")
+        self.assertEqual(patched, b"")
+
+        # Audits validate only the header boxes
+        result, patches = remediate(self.contents, validation="full", dry_run=True)
+        self.assertTrue(result.modified)
+        self.assertTrue(result.is_valid)
+        self.assertEqual(len(patches), 1)
+
+    # Test that patches are only applied to the bytes they were computed for
+    def test_apply_patches_mismatch(self):
+        _, patches = remediate(self.contents)
+        self.assertEqual(apply_patches(self.contents[:1000], patches), self.expected[:1000])
+        with self.assertRaises(ValueError):
+            apply_patches(self.expected, patches)
+
+    # Test that a stream is copied through with only its header patched, in chunks
+    def test_remediate_stream(self):
+        source = MagicMock(wraps=io.BytesIO(self.contents))
+        target = io.BytesIO()
+
+        result = remediate_stream(source, target, name="<stdin>", chunk_size=65536)
+
+        self.assertEqual(target.getvalue(), self.expected)
+        self.assertTrue(result.modified)
+        self.assertTrue(result.is_valid)
+        self.assertEqual(result.bytes_read, len(self.contents))
+        self.assertIn("write", result.timings)
+        # Header read, then fixed-size chunks
+        sizes = [c.args[0] for c in source.read.call_args_list]
+        self.assertEqual(sizes[0], HEADER_READ_SIZE)
+        self.assertEqual(set(sizes[1:]), {65536})
+
+    # Test that streams that cannot be remediated are copied through unchanged
+    def test_remediate_stream_passthrough(self):
+        for contents in (self.original, b"not a JP2 file" * 1000, b""):
+            with self.subTest(length=len(contents)):
+                target = io.BytesIO()
+                result = remediate_stream(io.BytesIO(contents), target, validation="none")
+                self.assertEqual(target.getvalue(), contents)
+                self.assertFalse(result.modified)
+        self.assertEqual(result.error, "File could not be read")
+        with self.assertRaises(ValueError):
+            remediate_stream(io.BytesIO(self.contents), io.BytesIO(), validation="full")
+
+    # Test that the factory configures buffer readers
+    def test_factory(self):
+        reader = BoxReaderFactory(validation="header-only", dry_run=True).get_buffer_reader(self.contents, "a.jp2")
+        reader.logger = MagicMock()
+        self.assertIsInstance(reader, BufferBoxReader)
+        self.assertEqual(reader.validation, "header-only")
+        self.assertTrue(reader.dry_run)
+        result = reader.read_jp2_file()
+        self.assertTrue(result.is_valid)
+        self.assertEqual(len(reader.patches), 1)
+        reader.logger.info.assert_any_call("Dry run, file would be modified: a.jp2")
+
+
+if __name__ == "__main__":
+    unittest.main()
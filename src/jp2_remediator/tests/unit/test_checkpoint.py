@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+from jp2_remediator.checkpoint import CheckpointStore, local_version
+from jp2_remediator.result import RemediationResult
+
+
+class TestCheckpointStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "checkpoint.sqlite")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Test for skipping only unchanged files that were processed without errors
+    def test_should_skip(self):
+        with CheckpointStore(self.path) as store:
+            store.record("s3://bucket/a.jp2", 100, '"etag-a"', RemediationResult("a.jp2", modified=True))
+            store.record("s3://bucket/b.jp2", 100, '"etag-b"', RemediationResult("b.jp2", error="failed"))
+            # Without resume nothing is skipped
+            self.assertFalse(store.should_skip("s3://bucket/a.jp2", 100, '"etag-a"'))
+
+        # Records are persisted and read back by the next run
+        with CheckpointStore(self.path, resume=True) as store:
+            self.assertTrue(store.should_skip("s3://bucket/a.jp2", 100, '"etag-a"'))
+            self.assertFalse(store.should_skip("s3://bucket/a.jp2", 100, '"etag-changed"'))
+            self.assertFalse(store.should_skip("s3://bucket/a.jp2", 101, '"etag-a"'))
+            self.assertFalse(store.should_skip("s3://bucket/b.jp2", 100, '"etag-b"'))
+            self.assertFalse(store.should_skip("s3://bucket/c.jp2", 100, '"etag-c"'))
+            self.assertEqual(store.skipped, 1)
+
+    # Test for local files, recorded with their size and mtime after processing
+    def test_record_local(self):
+        file_path = os.path.join(self.temp_dir.name, "a.jp2")
+        with open(file_path, "wb") as file:
+            file.write(b"jp2")
+
+        with CheckpointStore(self.path, resume=True) as store:
+            store.record_local(RemediationResult(file_path))
+            self.assertTrue(store.should_skip(*local_version(file_path)))
+
+            # A file patched or replaced afterwards is processed again
+            with open(file_path, "ab") as file:
+                file.write(b"changed")
+            self.assertFalse(store.should_skip(*local_version(file_path)))
+
+            # Missing files are recorded without a version and never skipped
+            missing_path = os.path.join(self.temp_dir.name, "missing.jp2")
+            store.record_local(RemediationResult(missing_path, error="File could not be read"))
+            self.assertFalse(store.should_skip(os.path.abspath(missing_path), None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
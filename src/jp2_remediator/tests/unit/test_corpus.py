@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+from jp2_remediator import box_parser, corpus
+from jp2_remediator.box_reader import BoxReader
+
+
+class TestCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, variant):
+        path = os.path.join(self.temp_dir.name, f"{variant}.jp2")
+        with open(path, "wb") as file:
+            file.write(corpus.build_jp2(variant, 8192))
+        return BoxReader(path, validation="header-only").read_jp2_file()
+
+    # Test for the box structure and size of generated files
+    def test_build_jp2_boxes(self):
+        data = corpus.build_jp2(corpus.VARIANT_CORRECT, 8192)
+        self.assertEqual(len(data), 8192)
+        box_types = [box.box_type for box in box_parser.iter_boxes(data)]
+        self.assertEqual(box_types, [b"jP  ", b"ftyp", b"jp2h", b"jp2c"])
+        jp2h_box, children = box_parser.find_header_boxes(data)
+        self.assertEqual([box.box_type for box in children], [b"ihdr", b"colr"])
+
+    # Test for the remediation outcome of every variant
+    def test_variants(self):
+        result = self.read(corpus.VARIANT_METH1)
+        self.assertEqual((result.meth, result.action, result.trc_tags), (1, "unchanged", {}))
+
+        result = self.read(corpus.VARIANT_CORRECT)
+        self.assertEqual((result.meth, result.action), (2, "unchanged"))
+        self.assertEqual(result.trc_tags["rTRC"], {"offset": 200, "size": 14, "n": 1})
+        self.assertTrue(result.is_valid)
+
+        result = self.read(corpus.VARIANT_MIS_SIZED)
+        self.assertEqual(result.action, "modified")
+        self.assertEqual(result.trc_tags["gTRC"]["size"], 16)
+        with open(result.output_path, "rb") as file:
+            modified = file.read()
+        tag_entries = box_parser.parse_icc_tag_table(modified, modified.index(b"mntr") - 12)
+        self.assertEqual([entry.size for entry in tag_entries], [20, 14, 14, 14])
+
+        result = self.read(corpus.VARIANT_N_NOT_1)
+        self.assertEqual(result.action, "flagged")
+        self.assertEqual(result.trc_tags["bTRC"]["n"], 2)
+
+    # Test for generate_corpus cycling through the variants
+    def test_generate_corpus(self):
+        paths = corpus.generate_corpus(self.temp_dir.name, 6, 4096, variants=("meth1", "n-not-1"))
+        self.assertEqual([os.path.basename(path) for path in paths[:3]], [
+            "000000_meth1.jp2", "000001_n-not-1.jp2", "000002_meth1.jp2"
+        ])
+        self.assertTrue(all(os.path.getsize(path) == 4096 for path in paths))
+
+    # Test for an unknown variant
+    def test_unknown_variant(self):
+        with self.assertRaises(ValueError):
+            corpus.build_jp2("meth3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import io
+import os
+import tempfile
+import threading
+from unittest.mock import MagicMock
+from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.buffer_reader import BUFFER_NAME
+from jp2_remediator.engine import RemediationEngine
+from jp2_remediator.mapped_reader import MappedBoxReader
+from jp2_remediator.result import RemediationResult
+from jp2_remediator.tests import mis_sized_sample, read_sample, write_file
+
+
+class TestRemediationEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.flagged_path = write_file(self.temp_dir.name, "flagged.jp2", read_sample())
+        self.fix_path = write_file(self.temp_dir.name, "fix.jp2", mis_sized_sample())
+        self.missing_path = os.path.join(self.temp_dir.name, "missing.jp2")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Test that one reader processes every file, with no state carried over between files
+    def test_reader_reused(self):
+        factories = [
+            BoxReaderFactory(validation="none"),
+            BoxReaderFactory(header_only=True, validation="header-only"),
+            BoxReaderFactory(validation="none", memory_map=True),
+        ]
+        for factory in factories:
+            with self.subTest(factory=factory.__dict__):
+                engine = RemediationEngine(factory)
+
+                fixed = engine.process(self.fix_path)
+                reader = engine._local.reader
+                reader.logger = MagicMock()
+                flagged = engine.process(self.flagged_path)
+                missing = engine.process(self.missing_path)
+
+                self.assertIs(engine._local.reader, reader)
+                self.assertEqual(fixed.action, "modified")
+                self.assertEqual(flagged.action, "flagged")
+                self.assertIsNone(flagged.output_path)
+                self.assertEqual(flagged.trc_tags["rTRC"]["n"], 2)
+                self.assertEqual([finding[0] for finding in reader.findings], [])
+                self.assertEqual(missing.error, "File could not be read")
+                self.assertEqual(missing.trc_tags, {})
+                self.assertEqual(reader.logger.extra.__setitem__.call_args.args, ("file_path", self.missing_path))
+                os.remove(fixed.output_path)
+
+    # Test that a mapped reader releases the map of each file when reused
+    def test_mapped_reader_released(self):
+        engine = RemediationEngine(BoxReaderFactory(validation="none", memory_map=True))
+        engine.process(self.flagged_path)
+        reader = engine._local.reader
+        self.assertIsInstance(reader, MappedBoxReader)
+        reader.load(self.flagged_path)
+        mapped = reader._mmap
+        reader.load(self.fix_path)
+        self.assertTrue(mapped.closed)
+        reader.close()
+
+    # Test that buffers and file objects are remediated in memory, without touching the thread's file reader
+    def test_process_buffer(self):
+        engine = RemediationEngine(BoxReaderFactory(validation="none"))
+        contents = mis_sized_sample()
+
+        for source in (contents, memoryview(contents), io.BytesIO(contents)):
+            with self.subTest(source=type(source).__name__):
+                result = engine.process(source, "upload.jp2")
+                self.assertTrue(result.modified)
+                self.assertEqual(result.file_path, "upload.jp2")
+                self.assertIsNone(result.output_path)
+        result, patches = engine.process_buffer(contents)
+        self.assertEqual(result.file_path, BUFFER_NAME)
+        self.assertEqual(len(patches), 1)
+        self.assertIsNone(getattr(engine._local, "reader", None))
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ["fix.jp2", "flagged.jp2"])
+
+    # Test that every thread gets its own reader
+    def test_reader_per_thread(self):
+        factory = MagicMock()
+        engine = RemediationEngine(factory)
+        engine.process("a.jp2")
+        thread = threading.Thread(target=engine.process, args=("b.jp2",))
+        thread.start()
+        thread.join()
+        engine.process("c.jp2")
+
+        self.assertEqual([c.args for c in factory.get_reader.call_args_list], [("a.jp2",), ("b.jp2",)])
+        factory.get_reader.return_value.load.assert_called_once_with("c.jp2")
+        self.assertEqual(factory.get_reader.return_value.read_jp2_file.call_count, 3)
+
+    # Test that the engine and results have no per-instance dict
+    def test_slots(self):
+        self.assertFalse(hasattr(RemediationEngine(), "__dict__"))
+        self.assertFalse(hasattr(RemediationResult("a.jp2"), "__dict__"))
+        self.assertIsInstance(RemediationEngine().factory, BoxReaderFactory)
+
+
+if __name__ == "__main__":
+    unittest.main()
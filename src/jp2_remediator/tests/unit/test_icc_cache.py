@@ -0,0 +1,45 @@
+import unittest
+import os
+import tempfile
+from jp2_remediator.icc_cache import TrcAnalysisCache
+
+ANALYSIS = {"trc_tags": {"rTRC": {"offset": 428, "size": 16, "n": 1}}, "flagged": False, "patches": [[207, "0e"]]}
+
+
+class TestTrcAnalysisCache(unittest.TestCase):
+
+    # Test for the least recently used analysis being evicted
+    def test_lru_eviction(self):
+        cache = TrcAnalysisCache(maxsize=2)
+        cache.put("a", ANALYSIS)
+        cache.put("b", ANALYSIS)
+        self.assertEqual(cache.get("a"), ANALYSIS)
+        cache.put("c", ANALYSIS)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), ANALYSIS)
+        self.assertEqual(cache.get("c"), ANALYSIS)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    # Test for the key being a hash of the profile bytes
+    def test_key(self):
+        self.assertEqual(TrcAnalysisCache.key(b"profile"), TrcAnalysisCache.key(bytearray(b"profile")))
+        self.assertNotEqual(TrcAnalysisCache.key(b"profile"), TrcAnalysisCache.key(b"profile2"))
+
+    # Test for analyses persisted to disk, read back into a bounded memory cache
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "icc-cache.sqlite")
+            cache = TrcAnalysisCache(path=path)
+            cache.put("a", ANALYSIS)
+            cache.close()
+
+            cache = TrcAnalysisCache(maxsize=1, path=path)
+            self.assertEqual(cache.get("a"), ANALYSIS)
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(list(cache._entries), ["a"])
+            cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
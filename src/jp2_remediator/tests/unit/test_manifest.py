@@ -0,0 +1,64 @@
+import unittest
+import io
+import os
+import tempfile
+from unittest.mock import patch
+from jp2_remediator.manifest import DeadLetterWriter, ManifestEntry, parse_s3_uri, read_manifest
+from jp2_remediator.result import RemediationResult
+
+
+class TestManifest(unittest.TestCase):
+
+    # Test for reading plain and JSONL lines, skipping blanks, comments and malformed lines
+    @patch("builtins.print")
+    def test_read_manifest(self, mock_print):
+        lines = io.StringIO(
+            "images/a.jp2\n"
+            "\n"
+            "# comment\n"
+            '{"path": "s3://bucket/b.jp2", "size": 100, "etag": "\\"abc\\""}\n'
+            '{"key": "c.jp2"}\n'
+            "  s3://bucket/d.jp2  \n"
+        )
+
+        entries = list(read_manifest(lines))
+
+        self.assertEqual(entries, [
+            ManifestEntry("images/a.jp2"),
+            ManifestEntry("s3://bucket/b.jp2", 100, '"abc"'),
+            ManifestEntry("s3://bucket/d.jp2"),
+        ])
+        mock_print.assert_called_once_with("Error reading manifest line 5: KeyError: 'path'")
+
+    # Test that entries are read lazily, line by line
+    def test_read_manifest_lazily(self):
+        lines = iter(["a.jp2\n", "b.jp2\n"])
+        entries = read_manifest(lines)
+        self.assertEqual(next(entries), ManifestEntry("a.jp2"))
+        self.assertEqual(next(lines), "b.jp2\n")
+
+    # Test for parse_s3_uri
+    def test_parse_s3_uri(self):
+        self.assertEqual(parse_s3_uri("s3://bucket/dir/a.jp2"), ("bucket", "dir/a.jp2"))
+        for uri in ["s3://bucket", "s3:///a.jp2", "https://bucket/a.jp2"]:
+            with self.subTest(uri=uri):
+                with self.assertRaises(ValueError):
+                    parse_s3_uri(uri)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+    # Test that the dead-letter manifest is read back as a manifest of the failed files
+    def test_dead_letter_writer(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "failed.jsonl")
+            with DeadLetterWriter(path) as dead_letter:
+                dead_letter.write(RemediationResult("s3://bucket/a.jp2", error="ClientError: SlowDown"))
+                dead_letter.write(RemediationResult("images/b.jp2", error="OSError: unreadable"))
+            self.assertEqual(dead_letter.count, 2)
+
+            with open(path, encoding="utf-8") as file:
+                entries = list(read_manifest(file))
+
+        self.assertEqual(entries, [ManifestEntry("s3://bucket/a.jp2"), ManifestEntry("images/b.jp2")])
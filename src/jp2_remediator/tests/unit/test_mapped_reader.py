@@ -0,0 +1,90 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import MagicMock
+from jp2_remediator.box_reader import BoxReader
+from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.mapped_reader import MappedBoxReader
+from jp2_remediator.tests import SAMPLE_PATH, SIZE_POSITION, mis_sized_sample, write_file
+
+
+class TestMappedBoxReader(unittest.TestCase):
+
+    def setUp(self):
+        self.contents = mis_sized_sample()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = write_file(self.temp_dir.name, "sample.jp2", self.contents)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, reader):
+        reader.logger = MagicMock()
+        result = reader.read_jp2_file()
+        with open(result.output_path, "rb") as file:
+            return result, file.read()
+
+    # Test that the mapped reader writes the same modified copy as BoxReader, from one patch
+    def test_matches_box_reader(self):
+        expected_result, expected_contents = self.read(BoxReader(self.file_path, validation="none"))
+        os.remove(expected_result.output_path)
+        reader = MappedBoxReader(self.file_path, validation="full")
+
+        result, contents = self.read(reader)
+
+        self.assertEqual(contents, expected_contents)
+        self.assertEqual(result.trc_tags, expected_result.trc_tags)
+        self.assertTrue(result.modified)
+        self.assertTrue(result.is_valid)
+        self.assertEqual(reader.patches, [(SIZE_POSITION + 3, b"\x10", b"\x0e")])
+        # The map is released once the file is processed
+        self.assertIsNone(reader._mmap)
+
+    # Test that only the header boxes are copied to be patched
+    def test_editable_contents(self):
+        reader = MappedBoxReader(self.file_path, validation="none")
+        self.assertIsInstance(reader.file_contents, memoryview)
+        self.assertEqual(len(reader.file_contents), len(self.contents))
+        # The 'jp2h' box of the sample ends at byte 727
+        self.assertEqual(reader.editable_contents(), self.contents[:727])
+        reader.close()
+
+    # Test for patching the mapped file in place
+    def test_in_place(self):
+        reader = MappedBoxReader(self.file_path, in_place=True, validation="none")
+        reader.logger = MagicMock()
+
+        result = reader.read_jp2_file()
+
+        self.assertEqual(result.output_path, self.file_path)
+        with open(self.file_path, "rb") as file:
+            patched_contents = file.read()
+        self.assertEqual(patched_contents[SIZE_POSITION:SIZE_POSITION + 4], (14).to_bytes(4, "big"))
+        self.assertEqual(patched_contents[SIZE_POSITION + 4:], self.contents[SIZE_POSITION + 4:])
+        self.assertEqual(os.listdir(self.temp_dir.name), ["sample.jp2"])
+
+    # Test for unchanged, empty and missing files
+    def test_unchanged_and_unreadable_files(self):
+        reader = MappedBoxReader(SAMPLE_PATH, validation="none")
+        reader.logger = MagicMock()
+        result = reader.read_jp2_file()
+        self.assertFalse(result.modified)
+        self.assertIsNone(result.output_path)
+        self.assertEqual(reader.patches, [])
+
+        empty_path = os.path.join(self.temp_dir.name, "empty.jp2")
+        open(empty_path, "wb").close()
+        for file_path in (empty_path, os.path.join(self.temp_dir.name, "missing.jp2")):
+            with self.subTest(file_path=file_path):
+                self.assertEqual(MappedBoxReader(file_path).read_jp2_file().error, "File could not be read")
+
+    # Test that the factory maps files only when whole files are read
+    def test_factory(self):
+        self.assertIsInstance(BoxReaderFactory(memory_map=True).get_reader(self.file_path), MappedBoxReader)
+        for factory in (BoxReaderFactory(), BoxReaderFactory(header_only=True, memory_map=True)):
+            with self.subTest(factory=vars(factory)):
+                self.assertNotIsInstance(factory.get_reader(self.file_path), MappedBoxReader)
+
+
+if __name__ == "__main__":
+    unittest.main()
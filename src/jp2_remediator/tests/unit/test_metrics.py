@@ -0,0 +1,74 @@
+import unittest
+import os
+import tempfile
+import urllib.request
+from jp2_remediator.metrics import Metrics, PROMETHEUS_CONTENT_TYPE
+from jp2_remediator.result import RemediationResult
+
+
+def make_result(action, seconds):
+    result = RemediationResult(f"{action}.jp2", bytes_read=1024 * 1024)
+    if action == "error":
+        result.error = "File could not be read"
+    result.modified = action == "modified"
+    result.flagged = action == "flagged"
+    result.timings = {"read": seconds, "write": seconds * 2}
+    return result
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.001, 0.01, 0.1))
+        for action, seconds in [("modified", 0.0005), ("unchanged", 0.005), ("flagged", 0.05), ("error", 0.5)]:
+            self.metrics.record(make_result(action, seconds))
+
+    # Test for the counters and cumulative histogram buckets in the Prometheus text format
+    def test_render(self):
+        text = self.metrics.render()
+        lines = text.splitlines()
+        self.assertIn('jp2_remediator_files_total{action="modified"} 1', lines)
+        self.assertIn('jp2_remediator_files_total{action="error"} 1', lines)
+        self.assertIn("jp2_remediator_files_flagged_total 1", lines)
+        self.assertIn(f"jp2_remediator_bytes_read_total {4 * 1024 * 1024}", lines)
+        self.assertIn("# TYPE jp2_remediator_stage_seconds histogram", lines)
+        self.assertIn('jp2_remediator_stage_seconds_bucket{stage="read",le="0.001"} 1', lines)
+        self.assertIn('jp2_remediator_stage_seconds_bucket{stage="read",le="0.1"} 3', lines)
+        self.assertIn('jp2_remediator_stage_seconds_bucket{stage="read",le="+Inf"} 4', lines)
+        self.assertIn('jp2_remediator_stage_seconds_count{stage="write"} 4', lines)
+        self.assertIn('jp2_remediator_stage_seconds_count{stage="validate"} 0', lines)
+        self.assertTrue(text.endswith("\n"))
+
+    # Test for the end-of-run summary, listing only observed stages
+    def test_summary(self):
+        summary = self.metrics.summary()
+        self.assertIn(
+            "Run summary: 4 file(s), 1 modified, 1 skipped (unchanged), 1 flagged for review, 1 failed, 4.0 MiB read",
+            summary
+        )
+        self.assertIn("read", summary)
+        self.assertNotIn("validate", summary)
+
+    # Test for writing a Prometheus text file
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "jp2_remediator.prom")
+            self.metrics.write(path)
+            with open(path) as file:
+                self.assertEqual(file.read(), self.metrics.render())
+            self.assertEqual(os.listdir(temp_dir), ["jp2_remediator.prom"])
+
+    # Test for serving the metrics over HTTP
+    def test_serve(self):
+        host, port = self.metrics.serve(0)
+        try:
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+                self.assertEqual(response.headers["Content-Type"], PROMETHEUS_CONTENT_TYPE)
+                self.assertEqual(response.read().decode("utf-8"), self.metrics.render())
+        finally:
+            self.metrics.close()
+        self.assertIsNone(self.metrics._server)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import unittest.mock
+import os
+import tempfile
+from jp2_remediator import patcher
+
+
+class TestPatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, "sample.jp2")
+        with open(self.file_path, "wb") as file:
+            file.write(b"\x00" * 10000)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self):
+        with open(self.file_path, "rb") as file:
+            return file.read()
+
+    # Test for diff_patches collecting contiguous changed ranges
+    def test_diff_patches(self):
+        original = b"\x00" * 10000
+        modified = bytearray(original)
+        modified[10:12] = b"\x01\x02"
+        modified[4095:4097] = b"\x03\x04"  # Range spanning a chunk boundary
+        modified[9999] = 0x05
+        self.assertEqual(patcher.diff_patches(original, modified), [
+            (10, b"\x00\x00", b"\x01\x02"),
+            (4095, b"\x00\x00", b"\x03\x04"),
+            (9999, b"\x00", b"\x05"),
+        ])
+        self.assertEqual(patcher.diff_patches(original, original), [])
+
+    # Test for diff_patches with buffers of different lengths
+    def test_diff_patches_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            patcher.diff_patches(b"\x00", b"\x00\x00")
+
+    # Test for apply_in_place writing only the patched bytes and removing the journal
+    def test_apply_in_place(self):
+        patcher.apply_in_place(self.file_path, [(100, b"\x00\x00", b"\xab\xcd")])
+        contents = self.read()
+        self.assertEqual(contents[100:102], b"\xab\xcd")
+        self.assertEqual(len(contents), 10000)
+        self.assertFalse(os.path.exists(patcher.journal_path_for(self.file_path)))
+
+    # Test for recover_in_place rolling back an interrupted patch
+    def test_recover_in_place_after_interrupted_patch(self):
+        with unittest.mock.patch("jp2_remediator.patcher.os.remove", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                patcher.apply_in_place(self.file_path, [(100, b"\x00\x00", b"\xab\xcd")])
+        self.assertTrue(os.path.exists(patcher.journal_path_for(self.file_path)))
+
+        self.assertTrue(patcher.recover_in_place(self.file_path))
+        self.assertEqual(self.read(), b"\x00" * 10000)
+        self.assertFalse(os.path.exists(patcher.journal_path_for(self.file_path)))
+
+    # Test for recover_in_place with a partially written journal
+    def test_recover_in_place_incomplete_journal(self):
+        with open(patcher.journal_path_for(self.file_path), "w") as journal_file:
+            journal_file.write('{"patches": [{"off')
+        self.assertTrue(patcher.recover_in_place(self.file_path))
+        self.assertEqual(self.read(), b"\x00" * 10000)
+        self.assertFalse(os.path.exists(patcher.journal_path_for(self.file_path)))
+
+    # Test for recover_in_place when there is nothing to recover
+    def test_recover_in_place_no_journal(self):
+        self.assertFalse(patcher.recover_in_place(self.file_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,51 @@
 import unittest
+import os
+import shutil
 import pytest
-from unittest.mock import call, patch, MagicMock
+from unittest.mock import patch, call, AsyncMock, MagicMock
+from botocore.exceptions import ClientError
+from jp2_remediator.box_reader import BoxReader, VALIDATION_FULL, VALIDATION_HEADER_ONLY
+from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.checkpoint import CheckpointStore
+from jp2_remediator.manifest import DeadLetterWriter, ManifestEntry, read_manifest
 from jp2_remediator.processor import Processor
+from jp2_remediator.result import RemediationResult
+from jp2_remediator.s3_reader import MIN_PART_SIZE
+from jp2_remediator.scanner import DirectoryScanner, JPEG2000_EXTENSIONS
+from jp2_remediator.throttle import RateLimitedClient
+from jp2_remediator.tests import SAMPLE_PATH as TEST_DATA_PATH, mis_sized_sample, read_sample
+
+
+class FailingBoxReader(BoxReader):
+    """Reader failing to load files named 'bad*.jp2', also when reused by a worker's engine."""
+
+    def load(self, file_path):
+        if os.path.basename(file_path).startswith("bad"):
+            raise ValueError("unreadable")
+        super().load(file_path)
+
+
+def mock_reader(file_path, read):
+    """Mock reader reused by an engine for every file it loads, returning read(path) for each."""
+    reader = MagicMock(file_path=file_path)
+    reader.load.side_effect = lambda path: setattr(reader, "file_path", path)
+    reader.read_jp2_file.side_effect = lambda: read(reader.file_path)
+    return reader
+
+
+def loaded_paths(factory):
+    """Paths of a mocked factory's reader: the one it was created for, then those it was reused for."""
+    return (
+        [c.args[0] for c in factory.get_reader.call_args_list]
+        + [c.args[0] for c in factory.get_reader.return_value.load.call_args_list]
+    )
+
+
+class FailingBoxReaderFactory(BoxReaderFactory):
+    """Picklable factory whose readers fail for files named 'bad*.jp2'."""
+
+    def get_reader(self, file_path):
+        return FailingBoxReader(file_path, validation=self.validation)
 
 
 class TestProcessor:
@@ -31,30 +75,181 @@ class TestProcessor:
         mock_box_reader_factory.get_reader.return_value.read_jp2_file.assert_called_once()
 
     # Test for process_directory function
-    @patch("os.walk", return_value=[("root", [], ["file1.jp2", "file2.jp2"])])
     @patch("builtins.print")
     def test_process_directory_with_multiple_files(
-        self, mock_print, mock_os_walk, processor, mock_box_reader_factory
+        self, mock_print, processor, mock_box_reader_factory, tmp_path
     ):
-        # Call process_directory with a dummy path
-        processor.process_directory("dummy_path")
+        for name in ["file1.jp2", "file2.jp2", "notes.txt"]:
+            (tmp_path / name).write_bytes(b"jp2")
+
+        # Call process_directory with the directory path
+        processor.process_directory(str(tmp_path))
 
         # Check that each JP2 file in the directory was processed
-        mock_print.assert_any_call("Processing file: root/file1.jp2")
-        mock_print.assert_any_call("Processing file: root/file2.jp2")
+        mock_print.assert_any_call(f"Processing file: {tmp_path / 'file1.jp2'}")
+        mock_print.assert_any_call(f"Processing file: {tmp_path / 'file2.jp2'}")
 
-        # Ensure each BoxReader instance had its read_jp2_file method called
-        assert mock_box_reader_factory.get_reader.call_count == 2
+        # Ensure one BoxReader instance was created and reused for the second file
+        mock_box_reader_factory.get_reader.assert_called_once()
+        assert sorted(loaded_paths(mock_box_reader_factory)) == [
+            str(tmp_path / "file1.jp2"),
+            str(tmp_path / "file2.jp2"),
+        ]
+        assert mock_box_reader_factory.get_reader.return_value.read_jp2_file.call_count == 2
 
-        # Ensure each BoxReader instance was created with the correct file path
-        assert mock_box_reader_factory.get_reader.call_args_list == [
-            call("root/file1.jp2"),
-            call("root/file2.jp2"),
+    # Test for process_directory function with a filtering scanner
+    @patch("builtins.print")
+    def test_process_directory_with_scanner(self, mock_print, processor, mock_box_reader_factory, tmp_path):
+        (tmp_path / "masters").mkdir()
+        for name in ["a.jp2", "b.jpx", "masters/c.jpf", "masters/d.jp2"]:
+            (tmp_path / name).write_bytes(b"jp2")
+        scanner = DirectoryScanner(extensions=JPEG2000_EXTENSIONS, exclude=["d.*"])
+
+        processor.process_directory(str(tmp_path), scanner)
+
+        assert sorted(loaded_paths(mock_box_reader_factory)) == [
+            str(tmp_path / "a.jp2"), str(tmp_path / "b.jpx"), str(tmp_path / "masters" / "c.jpf")
         ]
+
+    # Test for process_buffer function, remediating bytes without touching the filesystem
+    def test_process_buffer(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        contents = mis_sized_sample()
+        report = MagicMock()
+        processor = Processor(BoxReaderFactory(validation="none"), report=report)
+
+        result, patches = processor.process_buffer(memoryview(contents), "upload.jp2")
+
+        assert result.modified
+        assert result.output_path is None
+        assert len(patches) == 1
+        report.write.assert_called_once_with(result)
+        assert list(tmp_path.glob("*.jp2")) == []
+
+    # Test for process_files function without worker processes
+    @patch("builtins.print")
+    def test_process_files_serial(self, mock_print, processor, mock_box_reader_factory):
+        processor.process_files(iter(["file1.jp2", "file2.jp2"]))
+
+        mock_box_reader_factory.get_reader.assert_called_once_with("file1.jp2")
+        mock_box_reader_factory.get_reader.return_value.load.assert_called_once_with("file2.jp2")
         assert mock_box_reader_factory.get_reader.return_value.read_jp2_file.call_count == 2
 
+    # Test that a failing file is recorded without ending a serial run, as in the process pool
+    def test_process_files_serial_failure(self, tmp_path, capfd):
+        for name in ["bad.jp2", "b.jp2"]:
+            shutil.copy(TEST_DATA_PATH, tmp_path / name)
+        report = MagicMock()
+        processor = Processor(FailingBoxReaderFactory(validation="none"), report=report)
+
+        processor.process_files([str(tmp_path / "bad.jp2"), str(tmp_path / "b.jp2")])
+
+        output = capfd.readouterr().out
+        assert f"Error processing file: {tmp_path / 'bad.jp2'}: ValueError: unreadable" in output
+        results = {c.args[0].file_path: c.args[0] for c in report.write.call_args_list}
+        assert results[str(tmp_path / "bad.jp2")].error == "ValueError: unreadable"
+        assert results[str(tmp_path / "b.jp2")].action == "flagged"
+
+    # Test for process_directory function with a process pool
+    def test_process_directory_with_workers(self, tmp_path, capfd):
+        for name in ["a.jp2", "b.JP2", "bad.jp2", "c.txt"]:
+            shutil.copy(TEST_DATA_PATH, tmp_path / name)
+        report = MagicMock()
+        metrics = MagicMock()
+        processor = Processor(
+            FailingBoxReaderFactory(validation="none"), workers=2, chunksize=1, report=report, metrics=metrics
+        )
+
+        processor.process_directory(str(tmp_path))
+
+        output = capfd.readouterr().out
+        assert f"Processing file: {tmp_path / 'a.jp2'}" in output
+        assert f"Processing file: {tmp_path / 'b.JP2'}" in output
+        assert "c.txt" not in output
+        assert f"Error processing file: {tmp_path / 'bad.jp2'}: ValueError: unreadable" in output
+        assert "Processed 3 file(s) with 2 workers, 1 failed" in output
+
+        # Every result is merged back and written to the report in the parent
+        results = {c.args[0].file_path: c.args[0] for c in report.write.call_args_list}
+        assert results[str(tmp_path / "a.jp2")].action == "flagged"
+        assert results[str(tmp_path / "bad.jp2")].error == "ValueError: unreadable"
+        assert len(results) == 3
+        assert metrics.record.call_count == 3
+
+    # Test for a dry run of a directory in worker processes, counting the files that would change
+    def test_process_directory_dry_run(self, tmp_path, capfd):
+        (tmp_path / "flagged.jp2").write_bytes(read_sample())
+        (tmp_path / "fix.jp2").write_bytes(mis_sized_sample())
+        (tmp_path / "bad.jp2").write_bytes(b"")
+        processor = Processor(BoxReaderFactory(dry_run=True), workers=2, chunksize=1)
+
+        processor.process_directory(str(tmp_path))
+
+        assert sorted(os.listdir(tmp_path)) == ["bad.jp2", "fix.jp2", "flagged.jp2"]
+        output = capfd.readouterr().out
+        assert f"Would modify: {tmp_path / 'fix.jp2'}" in output
+        assert "Would modify: " + str(tmp_path / "flagged.jp2") not in output
+        assert processor.audit_summary() == (
+            "Dry run: 3 file(s) audited, 1 would be modified, 1 flagged for review, 0 unchanged, 1 failed"
+        )
+
+    # Test for resuming a directory run from a checkpoint store
+    def test_process_directory_resume(self, tmp_path, capfd):
+        directory = tmp_path / "images"
+        directory.mkdir()
+        for name in ["a.jp2", "b.jp2"]:
+            shutil.copy(TEST_DATA_PATH, directory / name)
+        factory = BoxReaderFactory(in_place=True, validation="none")
+
+        with CheckpointStore(str(tmp_path / "checkpoint.sqlite")) as checkpoint:
+            Processor(factory, checkpoint=checkpoint).process_directory(str(directory))
+        with CheckpointStore(str(tmp_path / "checkpoint.sqlite"), resume=True) as checkpoint:
+            # Only files changed since their checkpoint are processed again
+            os.utime(directory / "b.jp2", ns=(0, 0))
+            Processor(factory, workers=2, checkpoint=checkpoint).process_directory(str(directory))
+
+        output = capfd.readouterr().out
+        assert output.count(f"Processing file: {directory / 'a.jp2'}") == 1
+        assert output.count(f"Processing file: {directory / 'b.jp2'}") == 2
+        assert "Skipped 1 file(s) already processed" in output
+
+    # Test that a file removed between the scan and its checkpoint lookup is reported, not ending the run
+    def test_process_directory_resume_removed_file(self, tmp_path, capfd):
+        for name in ["a.jp2", "b.jp2"]:
+            shutil.copy(TEST_DATA_PATH, tmp_path / name)
+        entries = sorted(os.scandir(tmp_path), key=lambda entry: entry.name)
+        os.remove(tmp_path / "a.jp2")
+        scanner = MagicMock()
+        scanner.scan.return_value = iter(entries)
+        report = MagicMock()
+
+        with CheckpointStore(str(tmp_path / "checkpoint.sqlite"), resume=True) as checkpoint:
+            processor = Processor(BoxReaderFactory(validation="none"), report=report, checkpoint=checkpoint)
+            processor.process_directory(str(tmp_path), scanner)
+
+        results = {c.args[0].file_path: c.args[0] for c in report.write.call_args_list}
+        assert results[str(tmp_path / "a.jp2")].error == "File could not be read"
+        assert results[str(tmp_path / "b.jp2")].action == "flagged"
+
+    # Test that a dry run does not record outcomes, so resuming still fixes the files it audited
+    def test_process_directory_dry_run_then_resume(self, tmp_path, capfd):
+        contents = mis_sized_sample()
+        (tmp_path / "fix.jp2").write_bytes(contents)
+        checkpoint_path = str(tmp_path / "checkpoint.sqlite")
+
+        with CheckpointStore(checkpoint_path) as checkpoint:
+            Processor(BoxReaderFactory(dry_run=True), checkpoint=checkpoint).process_directory(str(tmp_path))
+        with CheckpointStore(checkpoint_path, resume=True) as checkpoint:
+            processor = Processor(BoxReaderFactory(in_place=True, validation="none"), checkpoint=checkpoint)
+            processor.process_directory(str(tmp_path))
+
+        output = capfd.readouterr().out
+        assert output.count(f"Processing file: {tmp_path / 'fix.jp2'}") == 2
+        assert "already processed" not in output
+        assert (tmp_path / "fix.jp2").read_bytes() != contents
+
     # Test for process_s3_bucket function
-    @patch("jp2_remediator.processor.boto3.client")
+    @patch("boto3.client")
     @patch("builtins.print")
     def test_process_s3_bucket(self, mock_print, mock_boto3_client, processor, mock_box_reader_factory):
         # Set up the mock S3 client
@@ -65,61 +260,408 @@ class TestProcessor:
         bucket_name = "test-bucket"
         prefix = "test-prefix"
 
-        # Prepare a fake response for list_objects_v2
-        mock_s3_client.list_objects_v2.return_value = {
-            "Contents": [
-                {"Key": "file1.jp2"},
-                {"Key": "file2.jp2"},
-                {"Key": "file3.txt"},  # Non-JP2 file to test filtering
-            ]
-        }
+        # Prepare fake list_objects_v2 pages, continued by their tokens
+        mock_s3_client.list_objects_v2.side_effect = [
+            # Non-JP2 file to test filtering
+            {"Contents": [{"Key": "file1.jp2"}, {"Key": "file3.txt"}], "IsTruncated": True,
+             "NextContinuationToken": "token-1"},
+            {"Contents": [{"Key": "file2.jp2"}], "IsTruncated": True, "NextContinuationToken": "token-2"},
+            {},
+        ]
 
         # Mock download_file and upload_file methods
         mock_s3_client.download_file.return_value = None
         mock_s3_client.upload_file.return_value = None
 
+        # Readers modify file1.jp2 only
+        read_paths = []
+
+        def read_jp2_file(path):
+            read_paths.append(path)
+            if not path.endswith("file1.jp2"):
+                return RemediationResult(path)
+            output_path = path.replace(".jp2", "_modified_20240101.jp2")
+            with open(output_path, "wb") as file:
+                file.write(b"modified")
+            return RemediationResult(path, modified=True, output_path=output_path)
+        mock_box_reader_factory.get_reader.side_effect = lambda path: mock_reader(path, read_jp2_file)
+
         # Call the method under test
-        processor.process_s3_bucket(bucket_name, prefix)
+        failed = processor.process_s3_bucket(bucket_name, prefix)
+        assert failed == []
 
-        # Verify that list_objects_v2 was called with the correct parameters
-        mock_s3_client.list_objects_v2.assert_called_once_with(Bucket=bucket_name, Prefix=prefix)
+        # Verify that the shared client has a connection pool for the transfer workers
+        assert mock_boto3_client.call_args.kwargs["config"].max_pool_connections == 17
 
-        # Verify that download_file was called for each .jp2 file
-        expected_download_calls = [
-            unittest.mock.call(bucket_name, "file1.jp2", "/tmp/file1.jp2"),
-            unittest.mock.call(bucket_name, "file2.jp2", "/tmp/file2.jp2"),
+        # Verify that every page was listed with the correct parameters
+        assert mock_s3_client.list_objects_v2.call_args_list == [
+            call(Bucket=bucket_name, Prefix=prefix),
+            call(Bucket=bucket_name, Prefix=prefix, ContinuationToken="token-1"),
+            call(Bucket=bucket_name, Prefix=prefix, ContinuationToken="token-2"),
         ]
-        assert mock_s3_client.download_file.call_args_list == expected_download_calls
 
-        # Verify that BoxReader was instantiated with the correct download paths
-        expected_boxreader_calls = [
-            unittest.mock.call("/tmp/file1.jp2"),
-            unittest.mock.call("/tmp/file2.jp2"),
-        ]
-        assert mock_box_reader_factory.get_reader.call_args_list == expected_boxreader_calls
+        # Verify that download_file was called for each .jp2 file
+        download_calls = sorted(c.args for c in mock_s3_client.download_file.call_args_list)
+        assert [c[:2] for c in download_calls] == [(bucket_name, "file1.jp2"), (bucket_name, "file2.jp2")]
+        download_paths = [c[2] for c in download_calls]
+        assert [os.path.basename(path) for path in download_paths] == ["file1.jp2", "file2.jp2"]
+        assert download_paths[0] != download_paths[1]
 
-        # Verify that read_jp2_file was called for each .jp2 file
-        assert mock_box_reader_factory.get_reader.return_value.read_jp2_file.call_count == 2
+        # Verify that the readers read the download paths
+        assert sorted(read_paths) == sorted(download_paths)
 
-        # Verify that upload_file was called for each .jp2 file
-        upload_calls = mock_s3_client.upload_file.call_args_list
-        assert len(upload_calls) == 2
-        for c in upload_calls:
-            args, _ = c
-            local_file_path = args[0]
-            upload_bucket = args[1]
-            upload_key = args[2]
-            # Check that the local file path includes '_modified_' and ends with '.jp2'
-            assert "_modified_" in local_file_path, "'_modified_' should be in local_file_path"
-            assert local_file_path.endswith(".jp2")
-            # Check that the upload is to the correct bucket and key
-            assert upload_bucket == bucket_name
-            assert "_modified_" in upload_key
-            assert upload_key.endswith(".jp2")
+        # Verify that upload_file was called only for the modified file
+        mock_s3_client.upload_file.assert_called_once_with(
+            download_paths[0].replace(".jp2", "_modified_20240101.jp2"), bucket_name, "file1_modified_20240101.jp2"
+        )
+
+        # Verify that the scratch directories were removed
+        assert not any(os.path.exists(os.path.dirname(path)) for path in download_paths)
 
         # Verify that print was called correctly
         expected_print_calls = [
             unittest.mock.call(f"Processing file: file1.jp2 from bucket {bucket_name}"),
             unittest.mock.call(f"Processing file: file2.jp2 from bucket {bucket_name}"),
+            unittest.mock.call(f"Processed 2 object(s) from bucket {bucket_name}, 0 failed"),
         ]
         mock_print.assert_has_calls(expected_print_calls, any_order=True)
+
+    # Test for process_s3_bucket function when single objects fail
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_failures(self, mock_print, mock_boto3_client, processor, mock_box_reader_factory):
+        processor.report = MagicMock()
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        keys = [f"file{i}.jp2" for i in range(20)]
+        mock_s3_client.list_objects_v2.return_value = {"Contents": [{"Key": key} for key in keys]}
+
+        def download_file(bucket, key, path):
+            if key == "file3.jp2":
+                raise OSError("connection reset")
+        mock_s3_client.download_file.side_effect = download_file
+
+        def read_jp2_file(path):
+            if path.endswith("file5.jp2"):
+                raise ValueError("unreadable")
+            output_path = path.replace(".jp2", "_modified.jp2")
+            with open(output_path, "wb") as file:
+                file.write(b"modified")
+            return RemediationResult(path, modified=True, output_path=output_path)
+        mock_box_reader_factory.get_reader.side_effect = lambda path: mock_reader(path, read_jp2_file)
+
+        # Small queues and single workers exercise backpressure between the stages
+        failed = processor.process_s3_bucket(
+            "test-bucket", download_workers=1, process_workers=1, upload_workers=1, queue_size=1
+        )
+
+        assert sorted(failed) == ["file3.jp2", "file5.jp2"]
+        assert mock_s3_client.upload_file.call_count == 18
+
+        # Results are reported with their S3 URIs, failures included
+        results = {c.args[0].file_path: c.args[0] for c in processor.report.write.call_args_list}
+        assert len(results) == 20
+        assert results["s3://test-bucket/file3.jp2"].error == "OSError: connection reset"
+        assert results["s3://test-bucket/file0.jp2"].output_path == "s3://test-bucket/file0_modified.jp2"
+        # Downloads and uploads are timed by the pipeline
+        assert set(results["s3://test-bucket/file0.jp2"].timings) == {"download", "upload"}
+        mock_print.assert_any_call(
+            "Error processing file: file3.jp2 from bucket test-bucket: OSError: connection reset"
+        )
+        mock_print.assert_any_call("Processed 18 object(s) from bucket test-bucket, 2 failed")
+
+    # Test that throttled downloads are retried and objects that still fail go to the dead-letter manifest
+    @patch("jp2_remediator.throttle.backoff_delay", return_value=0)
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_retries(self, mock_print, mock_boto3_client, mock_backoff_delay, processor,
+                                       mock_box_reader_factory, tmp_path):
+        processor.dead_letter = DeadLetterWriter(str(tmp_path / "failed.jsonl"))
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        mock_s3_client.list_objects_v2.return_value = {"Contents": [{"Key": "file1.jp2"}, {"Key": "file2.jp2"}]}
+        slow_down = ClientError({"Error": {"Code": "SlowDown", "Message": "Reduce your request rate"}}, "GetObject")
+        attempts = {"file1.jp2": 0, "file2.jp2": 0}
+
+        def download_file(bucket, key, path):
+            attempts[key] += 1
+            if key == "file2.jp2" or attempts[key] == 1:
+                raise slow_down
+        mock_s3_client.download_file.side_effect = download_file
+        mock_box_reader_factory.get_reader.side_effect = lambda path: MagicMock(
+            read_jp2_file=lambda: RemediationResult(path)
+        )
+
+        failed = processor.process_s3_bucket("test-bucket", max_request_rate=100, max_attempts=3)
+        processor.dead_letter.close()
+
+        assert failed == ["file2.jp2"]
+        assert attempts == {"file1.jp2": 2, "file2.jp2": 3}
+        assert mock_backoff_delay.call_count == 3
+        with open(tmp_path / "failed.jsonl", encoding="utf-8") as file:
+            assert list(read_manifest(file)) == [ManifestEntry("s3://test-bucket/file2.jp2")]
+        mock_print.assert_any_call("Processed 1 object(s) from bucket test-bucket, 1 failed")
+        mock_print.assert_any_call("Retried 3 S3 request(s), 4 throttled")
+
+    # Test that a prefix that cannot be listed is reported as such, not as a failed object to re-run
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_list_failure(self, mock_print, mock_boto3_client, processor, tmp_path):
+        processor.dead_letter = DeadLetterWriter(str(tmp_path / "failed.jsonl"))
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        mock_s3_client.list_objects_v2.side_effect = ClientError(
+            {"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "ListObjectsV2"
+        )
+
+        failed = processor.process_s3_bucket("test-bucket")
+        processor.dead_letter.close()
+
+        assert failed == []
+        assert processor.dead_letter.count == 0
+        mock_print.assert_any_call(
+            "Error listing prefix '' of bucket test-bucket: ClientError: An error occurred (AccessDenied) "
+            "when calling the ListObjectsV2 operation: Access Denied"
+        )
+        mock_print.assert_any_call("Could not list 1 prefix(es) of bucket test-bucket")
+
+    # Test for process_s3_bucket function with a process pool for the processing stage
+    @patch("boto3.client")
+    def test_process_s3_bucket_with_workers(self, mock_boto3_client, capfd):
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        mock_s3_client.list_objects_v2.return_value = {
+            "Contents": [{"Key": "a/file1.jp2"}, {"Key": "b/file1.jp2"}, {"Key": "bad.jp2"}]
+        }
+        mock_s3_client.download_file.side_effect = lambda bucket, key, path: shutil.copy(TEST_DATA_PATH, path)
+        processor = Processor(FailingBoxReaderFactory(validation="none"), workers=2)
+
+        failed = processor.process_s3_bucket("test-bucket")
+
+        assert failed == ["bad.jp2"]
+        assert "Processed 2 object(s) from bucket test-bucket, 1 failed" in capfd.readouterr().out
+
+    # Test for process_s3_bucket function with ranged header reads
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_ranged(self, mock_print, mock_boto3_client, processor, mock_box_reader_factory):
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        mock_s3_client.list_objects_v2.return_value = {"Contents": [{"Key": "file1.jp2"}, {"Key": "file2.jp2"}]}
+
+        failed = processor.process_s3_bucket("test-bucket", ranged=True)
+
+        assert failed == []
+        calls = sorted(c.args[1:] for c in mock_box_reader_factory.get_s3_reader.call_args_list)
+        assert calls == [("test-bucket", "file1.jp2"), ("test-bucket", "file2.jp2")]
+        # Readers share the rate-limited client
+        clients = {c.args[0] for c in mock_box_reader_factory.get_s3_reader.call_args_list}
+        assert len(clients) == 1
+        assert isinstance(clients.pop(), RateLimitedClient)
+        assert mock_box_reader_factory.get_s3_reader.return_value.read_jp2_file.call_count == 2
+        mock_s3_client.download_file.assert_not_called()
+        mock_s3_client.upload_file.assert_not_called()
+        mock_print.assert_any_call("Processed 2 object(s) from bucket test-bucket, 0 failed")
+
+    # Test that a bucket dry run reads headers with Range requests and never downloads or uploads
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_dry_run(self, mock_print, mock_boto3_client, mock_box_reader_factory):
+        mock_box_reader_factory.dry_run = True
+        processor = Processor(mock_box_reader_factory)
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        mock_s3_client.list_objects_v2.return_value = {"Contents": [{"Key": "file1.jp2"}]}
+        mock_box_reader_factory.get_s3_reader.return_value.read_jp2_file.return_value = RemediationResult(
+            "s3://test-bucket/file1.jp2", modified=True
+        )
+
+        failed = processor.process_s3_bucket("test-bucket")
+
+        assert failed == []
+        mock_box_reader_factory.get_reader.assert_not_called()
+        mock_s3_client.download_file.assert_not_called()
+        mock_s3_client.upload_file.assert_not_called()
+        mock_print.assert_any_call("Would modify: s3://test-bucket/file1.jp2")
+        assert processor.audit_summary() == (
+            "Dry run: 1 file(s) audited, 1 would be modified, 0 flagged for review, 0 unchanged, 0 failed"
+        )
+
+    # Test that process_s3_bucket uses a given S3 client instead of creating a boto3 client
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_given_client(self, mock_print, mock_boto3_client, mock_box_reader_factory):
+        mock_s3_client = MagicMock()
+        mock_s3_client.list_objects_v2.return_value = {"Contents": [{"Key": "file1.jp2"}]}
+        mock_box_reader_factory.get_s3_reader.return_value.read_jp2_file.return_value = RemediationResult(
+            "s3://test-bucket/file1.jp2"
+        )
+
+        failed = Processor(mock_box_reader_factory).process_s3_bucket(
+            "test-bucket", ranged=True, s3_client=mock_s3_client
+        )
+
+        assert failed == []
+        mock_boto3_client.assert_not_called()
+        assert mock_box_reader_factory.get_s3_reader.call_args.args[0].client is mock_s3_client
+
+    # Test that an async bucket dry run reduces full validation to header-only, as BoxReader audits do
+    @patch("jp2_remediator.s3_async.AsyncS3Engine")
+    @patch("jp2_remediator.s3_async.create_client")
+    def test_process_s3_bucket_async_dry_run_validation(self, mock_create_client, mock_engine_class,
+                                                        mock_box_reader_factory):
+        mock_create_client.return_value.__aenter__ = AsyncMock()
+        mock_create_client.return_value.__aexit__ = AsyncMock(return_value=False)
+        mock_engine_class.return_value.run = AsyncMock(return_value=[])
+        mock_engine_class.return_value.retries = 0
+        factory = BoxReaderFactory(validation=VALIDATION_FULL, dry_run=True)
+
+        failed = Processor(factory).process_s3_bucket("test-bucket", async_engine=True)
+
+        assert failed == []
+        assert mock_engine_class.call_args.kwargs["validation"] == VALIDATION_HEADER_ONLY
+        assert mock_engine_class.call_args.kwargs["dry_run"] is True
+
+    # Test for process_s3_bucket function resuming from a checkpoint store
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_resume(self, mock_print, mock_boto3_client, mock_box_reader_factory, tmp_path):
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        objects = [
+            {"Key": "file1.jp2", "Size": 100, "ETag": '"etag-1"'},
+            {"Key": "file2.jp2", "Size": 100, "ETag": '"etag-2"'},
+        ]
+        mock_s3_client.list_objects_v2.return_value = {"Contents": objects}
+        mock_box_reader_factory.get_s3_reader.side_effect = lambda s3, bucket, key: MagicMock(
+            read_jp2_file=lambda: RemediationResult(f"s3://{bucket}/{key}")
+        )
+        checkpoint_path = str(tmp_path / "checkpoint.sqlite")
+
+        with CheckpointStore(checkpoint_path) as checkpoint:
+            Processor(mock_box_reader_factory, checkpoint=checkpoint).process_s3_bucket("test-bucket", ranged=True)
+        # file2.jp2 is replaced in the bucket after the first run
+        objects[1]["ETag"] = '"etag-2-changed"'
+        mock_box_reader_factory.get_s3_reader.reset_mock()
+        with CheckpointStore(checkpoint_path, resume=True) as checkpoint:
+            Processor(mock_box_reader_factory, checkpoint=checkpoint).process_s3_bucket("test-bucket", ranged=True)
+
+        calls = [c.args[1:] for c in mock_box_reader_factory.get_s3_reader.call_args_list]
+        assert calls == [("test-bucket", "file2.jp2")]
+        mock_print.assert_any_call("Skipped 1 object(s) already processed")
+
+    # Test that a bucket dry run does not record outcomes, so resuming still processes the objects it audited
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_dry_run_then_resume(self, mock_print, mock_boto3_client, mock_box_reader_factory,
+                                                   tmp_path):
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        mock_s3_client.list_objects_v2.return_value = {
+            "Contents": [{"Key": "file1.jp2", "Size": 100, "ETag": '"etag-1"'}]
+        }
+        mock_box_reader_factory.get_s3_reader.return_value.read_jp2_file.return_value = RemediationResult(
+            "s3://test-bucket/file1.jp2", modified=True
+        )
+        checkpoint_path = str(tmp_path / "checkpoint.sqlite")
+
+        mock_box_reader_factory.dry_run = True
+        with CheckpointStore(checkpoint_path) as checkpoint:
+            Processor(mock_box_reader_factory, checkpoint=checkpoint).process_s3_bucket("test-bucket")
+        mock_box_reader_factory.dry_run = False
+        with CheckpointStore(checkpoint_path, resume=True) as checkpoint:
+            Processor(mock_box_reader_factory, checkpoint=checkpoint).process_s3_bucket("test-bucket", ranged=True)
+            assert checkpoint.skipped == 0
+
+        assert mock_box_reader_factory.get_s3_reader.call_count == 2
+
+    # Test for process_manifest function with local paths
+    @patch("builtins.print")
+    def test_process_manifest_local(self, mock_print, processor, mock_box_reader_factory):
+        processor.report = MagicMock()
+        entries = [ManifestEntry("file1.jp2"), ManifestEntry("s3://bucket/file2.jp2"), ManifestEntry("file3.jpx")]
+
+        processor.process_manifest(iter(entries))
+
+        assert loaded_paths(mock_box_reader_factory) == ["file1.jp2", "file3.jpx"]
+        mock_print.assert_any_call("Error processing file: s3://bucket/file2.jp2: S3 URI in a manifest of local paths")
+        assert processor.report.write.call_count == 3
+
+    # Test for process_manifest function with S3 URIs, fed to the pipeline without listing
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_manifest_s3(self, mock_print, mock_boto3_client, processor, mock_box_reader_factory):
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        entries = [
+            ManifestEntry("s3://bucket-only"),
+            ManifestEntry("s3://test-bucket/a/file1.jpx"),
+            ManifestEntry("s3://other-bucket/file2.jp2"),
+            ManifestEntry("s3://test-bucket/file3.jp2"),
+        ]
+
+        processor.process_manifest(iter(entries), ranged=True)
+
+        mock_s3_client.list_objects_v2.assert_not_called()
+        calls = sorted(c.args[1:] for c in mock_box_reader_factory.get_s3_reader.call_args_list)
+        assert calls == [("test-bucket", "a/file1.jpx"), ("test-bucket", "file3.jp2")]
+        mock_print.assert_any_call("Error processing file: s3://bucket-only: Invalid S3 URI: s3://bucket-only")
+        mock_print.assert_any_call(
+            "Error processing file: s3://other-bucket/file2.jp2: Object outside bucket test-bucket"
+        )
+        mock_print.assert_any_call("Processed 2 object(s) from bucket test-bucket, 0 failed")
+
+    # Test for process_manifest function with an empty manifest or in-place patching of S3 objects
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_manifest_nothing_to_process(self, mock_print, mock_boto3_client):
+        Processor(BoxReaderFactory()).process_manifest(iter([]))
+        mock_print.assert_called_with("No entries to process in the manifest")
+
+        Processor(BoxReaderFactory(in_place=True)).process_manifest(iter([ManifestEntry("s3://bucket/a.jp2")]))
+        mock_print.assert_called_with("In-place patching is not supported for S3 objects")
+        mock_boto3_client.assert_not_called()
+
+    # Test for process_s3_bucket function writing large modified files with server-side copies
+    @patch("jp2_remediator.s3_pipeline.MULTIPART_COPY_THRESHOLD", MIN_PART_SIZE + 1000)
+    @patch("boto3.client")
+    @patch("builtins.print")
+    def test_process_s3_bucket_multipart_copy(self, mock_print, mock_boto3_client, processor,
+                                              mock_box_reader_factory):
+        mock_s3_client = MagicMock()
+        mock_boto3_client.return_value = mock_s3_client
+        mock_s3_client.list_objects_v2.return_value = {"Contents": [{"Key": "batch/big.jp2"}]}
+        mock_s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+        mock_s3_client.upload_part.return_value = {"ETag": "etag-1"}
+        mock_s3_client.upload_part_copy.return_value = {"CopyPartResult": {"ETag": "etag-2"}}
+
+        with open(TEST_DATA_PATH, "rb") as file:
+            header = file.read(1000)
+        # Modified output: patched header followed by a large codestream
+        modified_contents = header[:500] + b"\xff" + header[501:] + b"\x00" * MIN_PART_SIZE
+
+        def get_reader(path):
+            output_path = path.replace(".jp2", "_modified_20240101.jp2")
+            with open(output_path, "wb") as file:
+                file.write(modified_contents)
+            return MagicMock(read_jp2_file=lambda: RemediationResult(path, modified=True, output_path=output_path))
+        mock_box_reader_factory.get_reader.side_effect = get_reader
+
+        failed = processor.process_s3_bucket("test-bucket")
+
+        assert failed == []
+        mock_s3_client.upload_file.assert_not_called()
+        new_key = "batch/big_modified_20240101.jp2"
+        mock_s3_client.upload_part.assert_called_once_with(
+            Bucket="test-bucket", Key=new_key, PartNumber=1, UploadId="upload-1",
+            Body=modified_contents[:MIN_PART_SIZE]
+        )
+        mock_s3_client.upload_part_copy.assert_called_once_with(
+            Bucket="test-bucket", Key=new_key, PartNumber=2, UploadId="upload-1",
+            CopySource={"Bucket": "test-bucket", "Key": "batch/big.jp2"},
+            CopySourceRange=f"bytes={MIN_PART_SIZE}-{len(modified_contents) - 1}",
+        )
+        mock_s3_client.complete_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket", Key=new_key, UploadId="upload-1",
+            MultipartUpload={"Parts": [{"PartNumber": 1, "ETag": "etag-1"}, {"PartNumber": 2, "ETag": "etag-2"}]},
+        )
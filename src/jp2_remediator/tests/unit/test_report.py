@@ -0,0 +1,80 @@
+import unittest
+import csv
+import json
+import os
+import tempfile
+from jp2_remediator.box_reader import BoxReader, HEADER_READ_SIZE
+from jp2_remediator.report import ReportWriter
+from jp2_remediator.result import REPORT_FIELDS, STAGES, RemediationResult
+from project_paths import paths
+
+# Define the path to the test data file
+TEST_DATA_PATH = os.path.join(paths.dir_unit_resources, "sample.jp2")
+
+
+class TestReportWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        reader = BoxReader(TEST_DATA_PATH, header_only=True, validation="header-only")
+        self.result = reader.read_jp2_file()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Test for the record of the sample file, whose curv counts are 2
+    def test_result_record(self):
+        record = self.result.to_record()
+        self.assertEqual(list(record), REPORT_FIELDS)
+        self.assertEqual(record["file_path"], TEST_DATA_PATH)
+        self.assertEqual(record["action"], "flagged")
+        self.assertEqual(record["meth"], 2)
+        self.assertEqual((record["rTRC_offset"], record["rTRC_size"], record["rTRC_n"]), (428, 16, 2))
+        self.assertEqual((record["bTRC_offset"], record["bTRC_size"], record["bTRC_n"]), (460, 16, 2))
+        self.assertTrue(record["is_valid"])
+        self.assertIsNone(record["output_path"])
+        self.assertEqual(record["bytes_read"], HEADER_READ_SIZE)
+        for stage in STAGES:
+            self.assertGreaterEqual(record[f"{stage}_seconds"], 0)
+
+    # Test for the action of results
+    def test_result_action(self):
+        self.assertEqual(RemediationResult("a.jp2").action, "unchanged")
+        self.assertEqual(RemediationResult("a.jp2", modified=True, flagged=True).action, "modified")
+        self.assertEqual(RemediationResult("a.jp2", modified=True, error="failed").action, "error")
+
+    # Test for writing a JSONL report
+    def test_write_jsonl(self):
+        path = os.path.join(self.temp_dir.name, "report.jsonl")
+        with ReportWriter(path) as report:
+            report.write(self.result)
+            report.write(RemediationResult("missing.jp2", error="File could not be read"))
+        self.assertEqual(report.count, 2)
+
+        with open(path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(records[0]["rTRC_n"], 2)
+        self.assertEqual(records[1]["action"], "error")
+        self.assertIsNone(records[1]["meth"])
+
+    # Test for writing a CSV report, inferred from the file extension
+    def test_write_csv(self):
+        path = os.path.join(self.temp_dir.name, "report.csv")
+        with ReportWriter(path) as report:
+            report.write(self.result)
+        self.assertEqual(report.report_format, "csv")
+
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["file_path"], TEST_DATA_PATH)
+        self.assertEqual(rows[0]["gTRC_size"], "16")
+
+    # Test for an unknown report format
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ReportWriter(os.path.join(self.temp_dir.name, "report.xml"), "xml")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,280 @@
+import asyncio
+import contextlib
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from botocore.exceptions import ClientError, EndpointConnectionError
+from jp2_remediator import s3_async
+from jp2_remediator.box_reader_factory import BoxReaderFactory
+from jp2_remediator.processor import Processor
+from jp2_remediator.s3_async import AsyncS3Engine
+from jp2_remediator.s3_reader import MIN_PART_SIZE
+from jp2_remediator.tests import SIZE_POSITION, mis_sized_sample, read_sample
+
+
+class AsyncBody:
+    """Streaming body of an aiobotocore response."""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self):
+        return self.data
+
+
+def throttled(code="SlowDown"):
+    return ClientError({"Error": {"Code": code, "Message": "Please reduce your request rate."}}, "GetObject")
+
+
+def make_client(objects, delay=0):
+    """AsyncMock S3 client serving objects from a dict, with ranged GETs and request bookkeeping."""
+    client = MagicMock()
+    client.in_flight = client.max_in_flight = 0
+
+    async def get_object(Bucket, Key, Range, IfMatch=None):
+        client.in_flight += 1
+        client.max_in_flight = max(client.max_in_flight, client.in_flight)
+        await asyncio.sleep(delay)
+        client.in_flight -= 1
+        data = objects[Key]
+        start, end = (int(value) for value in Range.removeprefix("bytes=").split("-"))
+        end = min(end, len(data) - 1)
+        return {"Body": AsyncBody(data[start:end + 1]), "ContentRange": f"bytes {start}-{end}/{len(data)}",
+                "ETag": '"etag"'}
+    client.get_object = AsyncMock(side_effect=get_object)
+    client.put_object = AsyncMock()
+    client.create_multipart_upload = AsyncMock(return_value={"UploadId": "upload-id"})
+    client.upload_part = AsyncMock(return_value={"ETag": '"part-1"'})
+    client.upload_part_copy = AsyncMock(return_value={"CopyPartResult": {"ETag": '"part-2"'}})
+    client.complete_multipart_upload = AsyncMock()
+    client.abort_multipart_upload = AsyncMock()
+
+    async def list_objects_v2(Bucket, Prefix, ContinuationToken="0"):
+        # Pages of two keys, continued by the index of the next key
+        keys = [key for key in objects if key.startswith(Prefix)]
+        start = int(ContinuationToken)
+        page = {"Contents": [{"Key": key, "Size": len(objects[key]), "ETag": '"etag"'}
+                             for key in keys[start:start + 2]]}
+        if start + 2 < len(keys):
+            page.update(IsTruncated=True, NextContinuationToken=str(start + 2))
+        return page
+    client.list_objects_v2 = AsyncMock(side_effect=list_objects_v2)
+    return client
+
+
+class TestAsyncS3Engine:
+
+    @pytest.fixture
+    def objects(self):
+        return {"unchanged.jp2": read_sample(), "dir/modified.jp2": mis_sized_sample(), "notes.txt": b"text"}
+
+    # Test for listing, reading headers and writing only the modified object
+    def test_run(self, objects):
+        client = make_client(objects)
+        results = []
+        engine = AsyncS3Engine(client, concurrency=4, on_result=results.append)
+
+        failed = asyncio.run(engine.run("test-bucket"))
+
+        assert failed == []
+        assert sorted(result.file_path for result in results) == [
+            "s3://test-bucket/dir/modified.jp2", "s3://test-bucket/unchanged.jp2"
+        ]
+        # Only ranged header reads, plus the rest of the modified object
+        ranges = sorted((c.kwargs["Key"], c.kwargs["Range"]) for c in client.get_object.call_args_list)
+        assert ranges == [
+            ("dir/modified.jp2", "bytes=0-4095"),
+            ("dir/modified.jp2", f"bytes=4096-{len(objects['dir/modified.jp2']) - 1}"),
+            ("unchanged.jp2", "bytes=0-4095"),
+        ]
+        # The rest of the object is read only if it is still the object whose header was read
+        rest = next(c for c in client.get_object.call_args_list if c.kwargs["Range"].startswith("bytes=4096-"))
+        assert rest.kwargs["IfMatch"] == '"etag"'
+
+        client.put_object.assert_called_once()
+        put = client.put_object.call_args.kwargs
+        assert put["Key"].startswith("dir/modified_modified_") and put["Key"].endswith(".jp2")
+        body = put["Body"]
+        assert body[SIZE_POSITION:SIZE_POSITION + 4] == (14).to_bytes(4, "big")
+        assert body[SIZE_POSITION + 4:] == objects["dir/modified.jp2"][SIZE_POSITION + 4:]
+        modified = next(result for result in results if result.modified)
+        assert modified.output_path == f"s3://test-bucket/{put['Key']}"
+
+    # Test for backing off while S3 throttles, and failing other errors immediately
+    @patch("jp2_remediator.s3_async.asyncio.sleep", new_callable=AsyncMock)
+    def test_throttling_backoff(self, mock_sleep, objects):
+        client = make_client({"unchanged.jp2": objects["unchanged.jp2"], "denied.jp2": b""})
+        get_object = client.get_object.side_effect
+        attempts = {"unchanged.jp2": 0}
+
+        async def flaky_get_object(Bucket, Key, **kwargs):
+            if Key == "denied.jp2":
+                raise throttled("AccessDenied")
+            attempts[Key] += 1
+            if attempts[Key] <= 2:
+                raise throttled()
+            return await get_object(Bucket=Bucket, Key=Key, **kwargs)
+        client.get_object.side_effect = flaky_get_object
+        results = []
+        engine = AsyncS3Engine(client, concurrency=1, backoff_base=1.0, on_result=results.append)
+
+        failed = asyncio.run(engine.run("test-bucket"))
+
+        assert failed == ["denied.jp2"]
+        assert attempts["unchanged.jp2"] == 3
+        # Full jitter below 1 and 2 seconds, before the fake client's own sleep
+        delays = [c.args[0] for c in mock_sleep.call_args_list]
+        assert 0 <= delays[0] <= 1 and 0 <= delays[1] <= 2
+        error = next(result for result in results if result.error)
+        assert error.error.startswith("ClientError: An error occurred (AccessDenied)")
+
+    # Test for giving up after max_attempts throttled requests
+    @patch("jp2_remediator.s3_async.asyncio.sleep", new_callable=AsyncMock)
+    def test_throttling_max_attempts(self, mock_sleep, objects):
+        client = make_client({"unchanged.jp2": objects["unchanged.jp2"]})
+        client.get_object.side_effect = throttled()
+        engine = AsyncS3Engine(client, max_attempts=3)
+
+        assert asyncio.run(engine.run("test-bucket")) == ["unchanged.jp2"]
+        assert client.get_object.call_count == 3
+
+    # Test that all requests take tokens from the shared limiter, and that server and network errors are retried
+    @patch("jp2_remediator.s3_async.asyncio.sleep", new_callable=AsyncMock)
+    def test_rate_limit_and_transient_errors(self, mock_sleep, objects):
+        client = make_client({"unchanged.jp2": objects["unchanged.jp2"]})
+        get_object = client.get_object.side_effect
+        errors = [throttled(), throttled("InternalError"), EndpointConnectionError(endpoint_url="http://s3")]
+
+        async def flaky_get_object(**kwargs):
+            if errors:
+                raise errors.pop(0)
+            return await get_object(**kwargs)
+        client.get_object.side_effect = flaky_get_object
+        limiter = MagicMock(acquire_async=AsyncMock())
+        engine = AsyncS3Engine(client, limiter=limiter)
+
+        assert asyncio.run(engine.run("test-bucket")) == []
+
+        assert client.get_object.call_count == 4
+        assert engine.retries == 3
+        # One token per request, including the list page
+        assert limiter.acquire_async.call_count == 5
+        limiter.throttled.assert_called_once()
+        assert limiter.succeeded.call_count == 2
+
+    # Test that a throttled list page is retried from its continuation token
+    @patch("jp2_remediator.s3_async.asyncio.sleep", new_callable=AsyncMock)
+    def test_list_page_retried(self, mock_sleep, objects):
+        client = make_client({f"{i}.jp2": objects["unchanged.jp2"] for i in range(3)})
+        list_objects_v2 = client.list_objects_v2.side_effect
+        errors = [throttled()]
+
+        async def flaky_list_objects_v2(**kwargs):
+            if "ContinuationToken" in kwargs and errors:
+                raise errors.pop(0)
+            return await list_objects_v2(**kwargs)
+        client.list_objects_v2.side_effect = flaky_list_objects_v2
+        engine = AsyncS3Engine(client)
+
+        assert asyncio.run(engine.run("test-bucket")) == []
+
+        assert engine.processed == 3
+        assert engine.retries == 1
+        assert [c.kwargs.get("ContinuationToken") for c in client.list_objects_v2.call_args_list] == [None, "2", "2"]
+
+    # Test that a prefix that cannot be listed is reported as such, not as a failed object
+    @patch("builtins.print")
+    def test_list_failure(self, mock_print, objects):
+        client = make_client(objects)
+        client.list_objects_v2.side_effect = throttled("AccessDenied")
+        results = []
+        engine = AsyncS3Engine(client, on_result=results.append)
+
+        assert asyncio.run(engine.run("test-bucket", "dir/")) == []
+
+        assert engine.failed_prefixes == ["dir/"]
+        assert results == []
+        mock_print.assert_any_call("Could not list 1 prefix(es) of bucket test-bucket")
+
+    # Test that requests in flight stay within the per-host limit
+    def test_per_host_limit(self, objects):
+        client = make_client({f"{i}.jp2": objects["unchanged.jp2"] for i in range(20)}, delay=0.005)
+        engine = AsyncS3Engine(client, concurrency=20, per_host_limit=3)
+
+        asyncio.run(engine.run("test-bucket"))
+
+        assert client.get_object.call_count == 20
+        assert client.max_in_flight == 3
+
+    # Test for given objects and the multipart copy of objects larger than one part
+    def test_run_objects_multipart_copy(self, objects):
+        large = objects["dir/modified.jp2"] + b"\x00" * MIN_PART_SIZE
+        client = make_client({"large.jp2": large})
+        engine = AsyncS3Engine(client)
+
+        failed = asyncio.run(engine.run("test-bucket", objects=iter([("large.jp2", len(large), '"etag"')])))
+
+        assert failed == []
+        client.list_objects_v2.assert_not_called()
+        client.put_object.assert_not_called()
+        head = client.upload_part.call_args.kwargs["Body"]
+        assert len(head) == MIN_PART_SIZE
+        assert head[SIZE_POSITION:SIZE_POSITION + 4] == (14).to_bytes(4, "big")
+        copy = client.upload_part_copy.call_args.kwargs
+        assert copy["CopySourceRange"] == f"bytes={MIN_PART_SIZE}-{len(large) - 1}"
+        assert copy["CopySourceIfMatch"] == '"etag"'
+        client.complete_multipart_upload.assert_called_once()
+
+    # Test that a dry run skips processed objects but records no outcomes, so resuming still writes them
+    def test_dry_run_not_checkpointed(self, objects):
+        client = make_client(objects)
+        checkpoint = MagicMock()
+        checkpoint.should_skip.side_effect = lambda uri, size, etag: uri.endswith("unchanged.jp2")
+        engine = AsyncS3Engine(client, checkpoint=checkpoint, dry_run=True)
+
+        assert asyncio.run(engine.run("test-bucket")) == []
+
+        assert engine.processed == 1
+        checkpoint.record.assert_not_called()
+        client.put_object.assert_not_called()
+
+    # Test for validation policies that would download whole objects
+    def test_full_validation_not_supported(self):
+        with pytest.raises(ValueError):
+            AsyncS3Engine(MagicMock(), validation="full")
+
+    # Test for the error raised when aiobotocore is not installed
+    @patch("jp2_remediator.s3_async.get_session", None)
+    def test_create_client_without_aiobotocore(self):
+        async def create():
+            async with s3_async.create_client(8):
+                pass
+        with pytest.raises(ImportError):
+            asyncio.run(create())
+
+    # Test for process_s3_bucket running the async engine
+    @patch("builtins.print")
+    def test_processor_async_engine(self, mock_print, objects):
+        client = make_client(objects)
+
+        @contextlib.asynccontextmanager
+        async def create_client(max_pool_connections, endpoint_url=None):
+            assert (max_pool_connections, endpoint_url) == (16, "http://127.0.0.1:5000")
+            yield client
+        report = MagicMock()
+        processor = Processor(BoxReaderFactory(validation="header-only"), report=report)
+
+        with patch("jp2_remediator.s3_async.create_client", create_client):
+            failed = processor.process_s3_bucket(
+                "test-bucket", async_engine=True, per_host_limit=16, endpoint_url="http://127.0.0.1:5000"
+            )
+
+        assert failed == []
+        assert report.write.call_count == 2
+        assert all(c.args[0].is_valid for c in report.write.call_args_list)
+        mock_print.assert_any_call("Processed 2 object(s) from bucket test-bucket, 0 failed")
@@ -0,0 +1,199 @@
+import unittest
+import datetime
+import io
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+from jp2_remediator.box_reader import HEADER_READ_SIZE, VALIDATION_NONE, VALIDATION_FULL
+from jp2_remediator.s3_reader import S3BoxReader, MIN_PART_SIZE
+from jp2_remediator.throttle import RateLimitedClient, TokenBucket
+from jp2_remediator.tests import mis_sized_sample, read_sample, remediated_sample
+
+
+def make_s3_client(objects):
+    # Mock S3 client serving get_object (with Range) and upload_fileobj from a dict of objects
+    s3 = MagicMock()
+
+    def get_object(Bucket, Key, Range=None):
+        contents = objects[Key]
+        if Range is None:
+            return {"Body": io.BytesIO(contents)}
+        start, _, end = Range[len("bytes="):].partition("-")
+        end = int(end) if end else len(contents) - 1
+        return {
+            "Body": io.BytesIO(contents[int(start):end + 1]),
+            "ContentRange": f"bytes {start}-{min(end, len(contents) - 1)}/{len(contents)}",
+        }
+
+    def upload_fileobj(fileobj, Bucket, Key):
+        objects[Key] = fileobj.read(100) + fileobj.read()
+
+    s3.get_object.side_effect = get_object
+    s3.upload_fileobj.side_effect = upload_fileobj
+    return s3
+
+
+class TestS3BoxReader(unittest.TestCase):
+
+    def setUp(self):
+        self.contents = read_sample()
+        self.objects = {"batch/sample.jp2": self.contents}
+        self.s3 = make_s3_client(self.objects)
+
+    def make_reader(self, validation=VALIDATION_NONE):
+        reader = S3BoxReader(self.s3, "test-bucket", "batch/sample.jp2", validation=validation)
+        reader.logger = MagicMock()
+        return reader
+
+    # Test that only the header is fetched, with a single Range request
+    def test_read_header_with_range_request(self):
+        reader = self.make_reader()
+        self.assertEqual(reader.file_contents, self.contents[:HEADER_READ_SIZE])
+        self.assertEqual(reader.object_size, len(self.contents))
+        self.s3.get_object.assert_called_once_with(
+            Bucket="test-bucket", Key="batch/sample.jp2", Range=f"bytes=0-{HEADER_READ_SIZE - 1}"
+        )
+
+    # Test that the range grows when 'jp2h' extends past the first window
+    def test_read_header_grows_range(self):
+        xml_box = (HEADER_READ_SIZE + 8).to_bytes(4, "big") + b"xml " + b"\x00" * HEADER_READ_SIZE
+        self.objects["batch/sample.jp2"] = self.contents[:32] + xml_box + self.contents[32:]
+        reader = self.make_reader()
+        self.assertGreaterEqual(len(reader.file_contents), 32 + len(xml_box) + 695)
+        self.assertEqual(self.s3.get_object.call_count, 2)
+
+    # Test that a header covering the whole object stops at the end of the object
+    def test_read_header_small_object(self):
+        self.objects["batch/sample.jp2"] = self.contents[:100]
+        reader = self.make_reader()
+        self.assertEqual(reader.file_contents, self.contents[:100])
+        self.assertEqual(self.s3.get_object.call_count, 1)
+
+    # Test that S3 errors are logged and leave no contents
+    def test_read_header_error(self):
+        self.s3.get_object.side_effect = ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        reader = S3BoxReader(self.s3, "test-bucket", "batch/sample.jp2", validation=VALIDATION_NONE)
+        self.assertIsNone(reader.file_contents)
+
+    # Test that unchanged objects are not uploaded
+    def test_unmodified_object_not_uploaded(self):
+        reader = self.make_reader()
+        result = reader.read_jp2_file()
+        self.assertFalse(result.modified)
+        self.assertIsNone(result.output_path)
+        self.s3.upload_fileobj.assert_not_called()
+
+    # Test that modified objects are uploaded as the patched header plus the streamed remainder
+    def test_modified_object_uploaded(self):
+        self.objects["batch/sample.jp2"] = mis_sized_sample()
+
+        reader = self.make_reader()
+        reader.read_jp2_file()
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d")
+        self.assertEqual(self.objects[f"batch/sample_modified_{timestamp}.jp2"], remediated_sample())
+
+    # Test that a throttled upload is retried with a new body, after the failed attempt read part of its own
+    @patch("jp2_remediator.throttle.time.sleep")
+    def test_modified_object_upload_retried(self, _):
+        self.objects["batch/sample.jp2"] = mis_sized_sample()
+        upload_fileobj = self.s3.upload_fileobj.side_effect
+
+        def throttled_upload(fileobj, Bucket, Key):
+            self.s3.upload_fileobj.side_effect = upload_fileobj
+            fileobj.read(8)
+            raise ClientError({"Error": {"Code": "SlowDown"}, "ResponseMetadata": {"HTTPStatusCode": 503}}, "PutObject")
+
+        self.s3.upload_fileobj.side_effect = throttled_upload
+        limiter = TokenBucket(rate=100)
+        reader = S3BoxReader(RateLimitedClient(self.s3, limiter), "test-bucket", "batch/sample.jp2")
+        reader.logger = MagicMock()
+        reader.read_jp2_file()
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d")
+        self.assertEqual(self.objects[f"batch/sample_modified_{timestamp}.jp2"], remediated_sample())
+        self.assertEqual(self.s3.upload_fileobj.call_count, 2)
+        self.assertEqual(reader.s3.retries, 1)
+        self.assertEqual(limiter.throttle_count, 1)
+
+    # Test that the remainder read within a retried upload is not retried on its own as well
+    @patch("jp2_remediator.throttle.time.sleep")
+    def test_modified_object_upload_attempts(self, _):
+        self.objects["batch/sample.jp2"] = mis_sized_sample()
+        get_object = self.s3.get_object.side_effect
+        remainder_reads = []
+
+        def throttled_remainder(Bucket, Key, Range=None):
+            if Range is not None and not Range.startswith("bytes=0-"):
+                remainder_reads.append(Range)
+                raise ClientError({"Error": {"Code": "SlowDown"}, "ResponseMetadata": {"HTTPStatusCode": 503}},
+                                  "GetObject")
+            return get_object(Bucket=Bucket, Key=Key, Range=Range)
+
+        self.s3.get_object.side_effect = throttled_remainder
+        reader = S3BoxReader(RateLimitedClient(self.s3, max_attempts=3), "test-bucket", "batch/sample.jp2")
+        reader.logger = MagicMock()
+        with self.assertRaises(ClientError):
+            reader.read_jp2_file()
+
+        # One read per upload attempt
+        self.assertEqual(len(remainder_reads), 3)
+        self.s3.upload_fileobj.assert_not_called()
+
+    # Test that large modified objects are written as a patched first part plus server-side copies
+    @patch("jp2_remediator.s3_reader.MAX_COPY_PART_SIZE", MIN_PART_SIZE)
+    @patch("jp2_remediator.s3_reader.MULTIPART_COPY_THRESHOLD", MIN_PART_SIZE)
+    def test_modified_large_object_multipart_copy(self):
+        contents = mis_sized_sample(self.contents + b"\x00" * (MIN_PART_SIZE * 2))
+        self.objects["batch/sample.jp2"] = contents
+        self.s3.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+        self.s3.upload_part.return_value = {"ETag": "etag-1"}
+        self.s3.upload_part_copy.side_effect = [
+            {"CopyPartResult": {"ETag": "etag-2"}}, {"CopyPartResult": {"ETag": "etag-3"}}
+        ]
+
+        reader = self.make_reader()
+        result = reader.read_jp2_file()
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d")
+        new_key = f"batch/sample_modified_{timestamp}.jp2"
+        self.assertTrue(result.modified)
+        self.assertEqual(result.output_path, f"s3://test-bucket/{new_key}")
+        self.s3.upload_fileobj.assert_not_called()
+
+        self.assertEqual(self.s3.upload_part.call_args.kwargs["Body"], remediated_sample(contents)[:MIN_PART_SIZE])
+        copy_ranges = [c.kwargs["CopySourceRange"] for c in self.s3.upload_part_copy.call_args_list]
+        self.assertEqual(copy_ranges, [
+            f"bytes={MIN_PART_SIZE}-{MIN_PART_SIZE * 2 - 1}",
+            f"bytes={MIN_PART_SIZE * 2}-{len(contents) - 1}",
+        ])
+        self.s3.complete_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket", Key=new_key, UploadId="upload-1", MultipartUpload={"Parts": [
+                {"PartNumber": 1, "ETag": "etag-1"},
+                {"PartNumber": 2, "ETag": "etag-2"},
+                {"PartNumber": 3, "ETag": "etag-3"},
+            ]}
+        )
+
+    # Test that a failed server-side copy aborts the multipart upload
+    @patch("jp2_remediator.s3_reader.MULTIPART_COPY_THRESHOLD", MIN_PART_SIZE)
+    def test_multipart_copy_aborted_on_error(self):
+        self.objects["batch/sample.jp2"] = mis_sized_sample(self.contents + b"\x00" * MIN_PART_SIZE)
+        self.s3.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+        self.s3.upload_part_copy.side_effect = ClientError({"Error": {"Code": "SlowDown"}}, "UploadPartCopy")
+
+        reader = self.make_reader()
+        with self.assertRaises(ClientError):
+            reader.read_jp2_file()
+        self.s3.abort_multipart_upload.assert_called_once()
+        self.s3.complete_multipart_upload.assert_not_called()
+
+    # Test that full validation downloads the whole object
+    def test_full_validation_reads_whole_object(self):
+        reader = self.make_reader(VALIDATION_FULL)
+        reader.read_jp2_file()
+        self.s3.get_object.assert_called_with(Bucket="test-bucket", Key="batch/sample.jp2")
+        reader.logger.info.assert_any_call("Is file valid? True")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import tempfile
+from jp2_remediator.scanner import DirectoryScanner, JPEG2000_EXTENSIONS, parse_shard
+
+
+class TestDirectoryScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        files = {
+            "a.jp2": 10, "B.JP2": 20, "c.jpx": 30, "notes.txt": 40,
+            "masters/d.jp2": 50, "masters/e.jpf": 60, "masters/tmp/f.jp2": 70,
+        }
+        for relative_path, size in files.items():
+            path = os.path.join(self.root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"\x00" * size)
+            # Modification times 1000, 2000, ... seconds after the epoch, by size
+            os.utime(path, (size * 100, size * 100))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def scan(self, **kwargs):
+        return sorted(
+            os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+            for entry in DirectoryScanner(**kwargs).scan(self.root)
+        )
+
+    # Test for the default .jp2 extension, compared case-insensitively
+    def test_scan_default_extensions(self):
+        self.assertEqual(self.scan(), ["B.JP2", "a.jp2", "masters/d.jp2", "masters/tmp/f.jp2"])
+
+    # Test for the JPEG 2000 family extensions
+    def test_scan_jpeg2000_extensions(self):
+        self.assertEqual(self.scan(extensions=JPEG2000_EXTENSIONS), [
+            "B.JP2", "a.jp2", "c.jpx", "masters/d.jp2", "masters/e.jpf", "masters/tmp/f.jp2"
+        ])
+
+    # Test for include and exclude globs on relative paths, names and directories
+    def test_scan_globs(self):
+        self.assertEqual(self.scan(include=["masters/*"]), ["masters/d.jp2", "masters/tmp/f.jp2"])
+        self.assertEqual(self.scan(include=["a.*"]), ["a.jp2"])
+        self.assertEqual(self.scan(exclude=["masters/tmp", "B.*"]), ["a.jp2", "masters/d.jp2"])
+
+    # Test for the size and modification time filters
+    def test_scan_size_and_mtime(self):
+        self.assertEqual(self.scan(min_size=20, max_size=50), ["B.JP2", "masters/d.jp2"])
+        self.assertEqual(self.scan(modified_after=2000, modified_before=7000), ["B.JP2", "masters/d.jp2"])
+
+    # Test that shards are disjoint and together cover the tree
+    def test_scan_shards(self):
+        shards = [self.scan(extensions=JPEG2000_EXTENSIONS, shard=(index, 3)) for index in range(3)]
+        self.assertEqual(sorted(sum(shards, [])), self.scan(extensions=JPEG2000_EXTENSIONS))
+        self.assertEqual(len(set(sum(shards, []))), 6)
+        # Shards are deterministic
+        self.assertEqual(shards[1], self.scan(extensions=JPEG2000_EXTENSIONS, shard=(1, 3)))
+
+    # Test that files written into a directory while it is scanned, like modified copies, are not yielded
+    def test_scan_ignores_files_written_during_scan(self):
+        batch = os.path.join(self.root, "batch")
+        os.mkdir(batch)
+        # More entries than one directory read returns, so the listing continues after files are written
+        names = [f"{index:04d}.jp2" for index in range(3000)]
+        for name in names:
+            open(os.path.join(batch, name), "wb").close()
+
+        scanned = []
+        for entry in DirectoryScanner().scan(batch):
+            scanned.append(entry.name)
+            open(os.path.join(batch, f"{entry.name[:-4]}_modified_20240101.jp2"), "wb").close()
+
+        self.assertEqual(sorted(scanned), names)
+
+    # Test for parse_shard
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("0/4"), (0, 4))
+        self.assertEqual(parse_shard("3/4"), (3, 4))
+        for text in ["4/4", "-1/4", "1/0", "1", "a/b"]:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    parse_shard(text)
+
+    # Test for a directory that cannot be scanned
+    def test_scan_missing_directory(self):
+        scanner = DirectoryScanner()
+        self.assertEqual(list(scanner.scan(os.path.join(self.root, "missing"))), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
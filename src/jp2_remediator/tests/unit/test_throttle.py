@@ -0,0 +1,202 @@
+import unittest
+import asyncio
+from unittest.mock import MagicMock, call, patch
+from botocore.exceptions import ClientError, EndpointConnectionError
+from jp2_remediator.throttle import (
+    RECOVERY_STEP, RateLimitedClient, THROTTLE_COOLDOWN, TokenBucket, backoff_delay, is_retryable_error
+)
+
+
+def client_error(code, status=400):
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "GetObject"
+    )
+
+
+class FakeClock:
+    """Replaces time.monotonic and time.sleep, sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestThrottle(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch("jp2_remediator.throttle.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # Test for errors worth retrying: throttling, server and network errors
+    def test_is_retryable_error(self):
+        self.assertTrue(is_retryable_error(client_error("SlowDown", 503)))
+        self.assertTrue(is_retryable_error(client_error("InternalError", 500)))
+        self.assertTrue(is_retryable_error(client_error("Unknown", 502)))
+        self.assertTrue(is_retryable_error(EndpointConnectionError(endpoint_url="https://s3.amazonaws.com")))
+        self.assertFalse(is_retryable_error(client_error("AccessDenied", 403)))
+        self.assertFalse(is_retryable_error(client_error("NoSuchKey", 404)))
+        self.assertFalse(is_retryable_error(ValueError("unreadable")))
+
+    # Test for the full-jitter backoff bounds
+    def test_backoff_delay(self):
+        for attempt, bound in ((1, 0.1), (2, 0.2), (4, 0.8), (20, 20.0)):
+            delays = [backoff_delay(attempt, 0.1, 20.0) for _ in range(100)]
+            self.assertTrue(all(0 <= delay <= bound for delay in delays))
+
+    # Test that the token bucket spends its burst, then waits for tokens at the rate
+    def test_token_bucket_acquire(self):
+        bucket = TokenBucket(rate=10, burst=2)
+
+        for _ in range(4):
+            bucket.acquire()
+
+        self.assertEqual(len(self.clock.sleeps), 2)
+        for wait in self.clock.sleeps:
+            self.assertAlmostEqual(wait, 0.1)
+
+    # Test that async acquires wait in the event loop for the same tokens
+    def test_token_bucket_acquire_async(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        sleeps = []
+
+        async def sleep(seconds):
+            self.clock.sleep(seconds)
+            sleeps.append(seconds)
+
+        async def acquire():
+            for _ in range(4):
+                await bucket.acquire_async()
+
+        with patch("asyncio.sleep", sleep):
+            asyncio.run(acquire())
+
+        self.assertEqual(len(sleeps), 2)
+        for wait in sleeps:
+            self.assertAlmostEqual(wait, 0.1)
+
+    # Test that throttling halves the rate once per cooldown and successes restore it
+    def test_token_bucket_adaptive_rate(self):
+        bucket = TokenBucket(rate=100, min_rate=30)
+
+        bucket.throttled()
+        bucket.throttled()
+        self.assertEqual(bucket.rate, 50)
+        self.clock.now += THROTTLE_COOLDOWN
+        bucket.throttled()
+        self.clock.now += THROTTLE_COOLDOWN
+        bucket.throttled()
+        self.assertEqual(bucket.rate, 30)
+        self.assertEqual(bucket.throttle_count, 4)
+
+        bucket.succeeded()
+        self.assertEqual(bucket.rate, 30 + 100 * RECOVERY_STEP)
+        for _ in range(100):
+            bucket.succeeded()
+        self.assertEqual(bucket.rate, 100)
+
+    # Test that throttled requests are retried with backoff and slow the limiter down
+    def test_client_retries_throttling(self):
+        s3 = MagicMock()
+        s3.download_file.side_effect = [client_error("SlowDown", 503), client_error("SlowDown", 503), None]
+        limiter = TokenBucket(rate=100)
+        client = RateLimitedClient(s3, limiter, backoff_base=1.0)
+
+        client.download_file("bucket", "key.jp2", "/tmp/key.jp2")
+
+        self.assertEqual(s3.download_file.call_count, 3)
+        s3.download_file.assert_called_with("bucket", "key.jp2", "/tmp/key.jp2")
+        self.assertEqual(client.retries, 2)
+        self.assertEqual(limiter.throttle_count, 2)
+        self.assertLess(limiter.rate, 100)
+
+    # Test that permanent errors are not retried and transient ones are raised after max_attempts
+    def test_client_gives_up(self):
+        s3 = MagicMock()
+        s3.upload_file.side_effect = client_error("AccessDenied", 403)
+        s3.get_object.side_effect = client_error("InternalError", 500)
+        client = RateLimitedClient(s3, max_attempts=3)
+
+        with self.assertRaises(ClientError):
+            client.upload_file("/tmp/key.jp2", "bucket", "key.jp2")
+        with self.assertRaises(ClientError):
+            client.get_object(Bucket="bucket", Key="key.jp2")
+
+        self.assertEqual(s3.upload_file.call_count, 1)
+        self.assertEqual(s3.get_object.call_count, 3)
+        self.assertEqual(client.retries, 2)
+
+    # Test that streamed transfers are not retried by the proxy, their file objects are partly consumed
+    def test_client_streaming_not_retried(self):
+        s3 = MagicMock()
+        s3.upload_fileobj.side_effect = client_error("SlowDown", 503)
+        limiter = TokenBucket(rate=100)
+        client = RateLimitedClient(s3, limiter)
+
+        with self.assertRaises(ClientError):
+            client.upload_fileobj(MagicMock(), "bucket", "key.jp2")
+
+        self.assertEqual(s3.upload_fileobj.call_count, 1)
+        self.assertEqual(client.retries, 0)
+        self.assertEqual(limiter.throttle_count, 1)
+
+    # Test that operations are retried as a whole
+    def test_client_retry_operation(self):
+        operation = MagicMock(side_effect=[client_error("InternalError", 500), "done"])
+        client = RateLimitedClient(MagicMock(), max_attempts=3)
+
+        self.assertEqual(client.retry(operation), "done")
+        self.assertEqual(operation.call_count, 2)
+        self.assertEqual(client.retries, 1)
+
+    # Test that list pages take tokens from the shared limiter, following the continuation tokens
+    def test_client_paginator(self):
+        s3 = MagicMock()
+        s3.list_objects_v2.side_effect = [
+            {"Contents": [], "IsTruncated": True, "NextContinuationToken": "token-1"},
+            {"Contents": []},
+        ]
+        limiter = MagicMock()
+        client = RateLimitedClient(s3, limiter)
+
+        pages = list(client.get_paginator("list_objects_v2").paginate(Bucket="bucket", Prefix=""))
+
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(s3.list_objects_v2.call_args_list, [
+            call(Bucket="bucket", Prefix=""), call(Bucket="bucket", Prefix="", ContinuationToken="token-1"),
+        ])
+        # One token per page request
+        self.assertEqual(limiter.acquire.call_count, 2)
+        s3.get_paginator.assert_not_called()
+
+    # Test that a throttled list page is retried where the listing stopped and slows the limiter down
+    def test_client_paginator_retried(self):
+        s3 = MagicMock()
+        s3.list_objects_v2.side_effect = [
+            {"Contents": [{"Key": "a.jp2"}], "IsTruncated": True, "NextContinuationToken": "token-1"},
+            client_error("SlowDown", 503),
+            {"Contents": [{"Key": "b.jp2"}]},
+        ]
+        limiter = TokenBucket(1000)
+        client = RateLimitedClient(s3, limiter)
+
+        pages = list(client.get_paginator("list_objects_v2").paginate(Bucket="bucket", Prefix=""))
+
+        self.assertEqual([page["Contents"][0]["Key"] for page in pages], ["a.jp2", "b.jp2"])
+        self.assertEqual(s3.list_objects_v2.call_args_list[1:], [
+            call(Bucket="bucket", Prefix="", ContinuationToken="token-1")
+        ] * 2)
+        self.assertEqual(limiter.throttle_count, 1)
+        self.assertEqual(client.retries, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
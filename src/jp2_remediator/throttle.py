@@ -0,0 +1,222 @@
+import functools
+import random
+import threading
+import time
+
+# Error codes S3 returns when requests must slow down
+THROTTLING_ERROR_CODES = frozenset({
+    "SlowDown", "Throttling", "ThrottlingException", "RequestLimitExceeded",
+    "TooManyRequestsException", "ServiceUnavailable", "503",
+})
+# Other error codes of transient failures, worth retrying
+TRANSIENT_ERROR_CODES = frozenset({"InternalError", "RequestTimeout", "RequestTimeTooSkewed", "500"})
+# S3 requests per second a single prefix supports for writes, reads support 5,500
+DEFAULT_REQUEST_RATE = 3500.0
+# The request rate is at least halved on throttling, and never lowered below this
+MIN_REQUEST_RATE = 1.0
+# Fraction of the maximum rate regained per successful request
+RECOVERY_STEP = 0.01
+# Throttling signals within this many seconds of a rate decrease are one congestion event
+THROTTLE_COOLDOWN = 1.0
+# Request and response continuation tokens of the paginated operations, see _RateLimitedPaginator
+_PAGE_TOKENS = {"list_objects_v2": ("ContinuationToken", "NextContinuationToken")}
+# Client methods that make no request
+_LOCAL_METHODS = frozenset({"can_paginate", "close", "generate_presigned_url", "get_waiter"})
+# Client methods streaming a file object, which a failed attempt has partly consumed or written
+_STREAMING_METHODS = frozenset({"download_fileobj", "upload_fileobj"})
+
+
+def is_throttling_error(error):
+    """Return True if a ClientError asks the client to slow down."""
+    return error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+def is_retryable_error(error):
+    """Return True if a failed request may succeed when retried: throttling, server and network errors."""
+    # botocore and s3transfer are loaded by the S3 clients whose errors are checked, not by every run
+    from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+    from s3transfer.exceptions import RetriesExceededError
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        return code in THROTTLING_ERROR_CODES or code in TRANSIENT_ERROR_CODES or status >= 500
+    # Network errors of botocore and of the managed transfers behind download_file and upload_file
+    return isinstance(error, (ConnectionError, HTTPClientError, RetriesExceededError))
+
+
+def backoff_delay(attempt, base, maximum):
+    """Full-jitter exponential backoff: a random delay up to base * 2 ** (attempt - 1), capped at maximum."""
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the request rate, with additive increase and
+    multiplicative decrease: throttling halves the rate, successes slowly restore it.
+    """
+
+    def __init__(self, rate=DEFAULT_REQUEST_RATE, burst=None, min_rate=MIN_REQUEST_RATE):
+        """
+        Create a full token bucket.
+        :param rate: Maximum requests per second.
+        :param burst: Maximum tokens saved up while idle, one second of requests by default.
+        :param min_rate: Lowest rate throttling reduces the rate to.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.throttle_count = 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._decreased = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self):
+        # Take one token if available, else return the seconds until one is
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Take one token, waiting until one is available."""
+        while wait := self._take():
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Take one token, waiting in the event loop until one is available."""
+        # asyncio is only imported by the async engine's runs
+        import asyncio
+        while wait := self._take():
+            await asyncio.sleep(wait)
+
+    def throttled(self):
+        """Halve the rate after S3 throttled a request, once per cooldown period."""
+        with self._lock:
+            now = time.monotonic()
+            self.throttle_count += 1
+            if self._decreased is not None and now - self._decreased < THROTTLE_COOLDOWN:
+                return
+            self._refill(now)
+            self._decreased = now
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Requests already granted count against the lower rate
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        """Regain part of the maximum rate after a successful request."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+
+class _RateLimitedPaginator:
+    """
+    Paginator requesting each page through the client, within its rate limit and with its retries,
+    so a retry resumes at the failed page.
+    """
+
+    def __init__(self, client, operation_name):
+        self._client = client
+        self._operation_name = operation_name
+
+    def paginate(self, **kwargs):
+        input_token, output_token = _PAGE_TOKENS[self._operation_name]
+        method = getattr(self._client.client, self._operation_name)
+        token = None
+        while True:
+            page = self._client.call(method, **kwargs, **({input_token: token} if token is not None else {}))
+            yield page
+            token = page.get(output_token)
+            if not page.get("IsTruncated") or token is None:
+                return
+
+
+class RateLimitedClient:
+    """
+    Proxy of a boto3 S3 client, shared by all pipeline stages, whose requests take a token
+    from one TokenBucket and are retried with jittered exponential backoff on transient errors.
+    """
+
+    def __init__(self, client, limiter=None, max_attempts=8, backoff_base=0.1, backoff_max=20.0):
+        """
+        Wrap a boto3 client.
+        :param client: boto3 S3 client.
+        :param limiter: Optional TokenBucket, the request rate is not limited without one.
+        :param max_attempts: Attempts per request, the last error is raised.
+        :param backoff_base: First backoff delay in seconds, doubled per attempt, with full jitter.
+        :param backoff_max: Maximum backoff delay in seconds.
+        """
+        self.client = client
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name == "get_paginator":
+            return self._get_paginator
+        attribute = getattr(self.client, name)
+        if not callable(attribute) or name in _LOCAL_METHODS:
+            return attribute
+        if name in _STREAMING_METHODS:
+            # Not retried here, a retry would resume a stream where the failed attempt stopped, see retry
+            return functools.partial(self.request, attribute)
+        return functools.partial(self.call, attribute)
+
+    def _get_paginator(self, operation_name):
+        if operation_name not in _PAGE_TOKENS:
+            raise ValueError(f"Pagination not supported by RateLimitedClient: {operation_name}")
+        return _RateLimitedPaginator(self, operation_name)
+
+    def call(self, method, *args, **kwargs):
+        """Call a client method within the rate limit, retrying transient errors."""
+        return self.retry(functools.partial(self.request, method, *args, **kwargs))
+
+    def retry(self, operation):
+        """
+        Run an operation, retrying transient errors with backoff. Operations making their
+        requests through this client, e.g. a streamed upload that opens a new body per attempt,
+        are retried as a whole.
+        :param operation: Callable taking no arguments.
+        :return: Return value of the operation.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return operation()
+            except Exception as e:
+                if not is_retryable_error(e) or attempt == self.max_attempts:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+
+    def request(self, method, *args, **kwargs):
+        """
+        Make one request within the rate limit, without retries, e.g. within an operation
+        retried as a whole, see retry. Throttling slows the limiter down.
+        :param method: Method of the wrapped client.
+        :return: Response of the request.
+        """
+        if self.limiter is None:
+            return method(*args, **kwargs)
+        self.limiter.acquire()
+        try:
+            response = method(*args, **kwargs)
+        except Exception as e:
+            from botocore.exceptions import ClientError
+            if isinstance(e, ClientError) and is_throttling_error(e):
+                self.limiter.throttled()
+            raise
+        self.limiter.succeeded()
+        return response